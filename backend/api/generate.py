@@ -1,12 +1,19 @@
 """
 API routes for image generation.
 """
-from fastapi import APIRouter, HTTPException
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from backend.models.config import Config
 from backend.models.schemas import (
+    BatchGenerationRequest,
     ImageGenerationRequest,
-    TaskResponse
+    TaskResponse,
+    TaskStatus
 )
-from backend.services.task_manager import get_task_manager
+from backend.services.task_manager import QueueFullError, get_task_manager
 
 router = APIRouter()
 
@@ -35,13 +42,56 @@ async def create_generation_task(request: ImageGenerationRequest):
             batch_size=request.batch_size,
             gpu_id=request.gpu_id,
             guidance_scale=request.guidance_scale,
-            max_concurrent_tasks=request.max_concurrent_tasks
+            output=request.output
         )
         return {"task_id": task_id}
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
 
+@router.post("/generate/batch", response_model=dict)
+async def create_batch_generation_task(request: BatchGenerationRequest):
+    """
+    Create a batch job rendering many prompts, or a prompt x seed grid.
+
+    The job is tracked like any other task; its results list grows as
+    images finish and all images are recorded in history when it ends.
+
+    Args:
+        request: Batch generation parameters
+
+    Returns:
+        dict: Task ID for tracking and number of images to render
+    """
+    try:
+        task_manager = get_task_manager()
+        task_id = await task_manager.create_batch_task(
+            prompts=request.prompts,
+            seeds=request.seeds,
+            images_per_prompt=request.images_per_prompt,
+            negative_prompt=request.negative_prompt,
+            height=request.height,
+            width=request.width,
+            num_inference_steps=request.num_inference_steps,
+            use_gpu=request.use_gpu,
+            gpu_id=request.gpu_id,
+            guidance_scale=request.guidance_scale,
+            output=request.output
+        )
+        task = await task_manager.get_task(task_id)
+        return {"task_id": task_id, "total_images": task.total_images}
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create batch task: {str(e)}")
+
+
 @router.get("/generate/{task_id}", response_model=TaskResponse)
 async def get_task_status(task_id: str):
     """
@@ -59,4 +109,59 @@ async def get_task_status(task_id: str):
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    return task
\ No newline at end of file
+    return task
+
+
+@router.get("/generate/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Stream the status of a generation task as Server-Sent Events.
+
+    Every update is sent as a "progress" event whose data is the
+    TaskResponse JSON. The stream ends after the completed or failed update.
+
+    Args:
+        task_id: Task ID
+        request: Incoming request, used to detect client disconnects
+
+    Returns:
+        StreamingResponse: text/event-stream of task updates
+    """
+    task_manager = get_task_manager()
+    task = await task_manager.get_task(task_id)
+
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    finished = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+    # Snapshot and subscribe together so no update falls in between
+    current = task.model_copy(deep=True)
+    queue = task_manager.subscribe(task_id)
+
+    async def event_stream():
+        try:
+            # Send the current state first so late subscribers are in sync
+            yield f"event: progress\ndata: {current.model_dump_json()}\n\n"
+            if current.status in finished:
+                return
+
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=Config.TASK_EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"event: progress\ndata: {update.model_dump_json()}\n\n"
+                if update.status in finished:
+                    return
+        finally:
+            task_manager.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,93 +1,143 @@
 """
 API routes for image history and download.
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from typing import Optional
-import json
-from pathlib import Path
+import mimetypes
 
 from backend.models.config import Config
-from backend.models.schemas import HistoryResponse, ImageInfo
+from backend.models.schemas import (
+    BulkDeleteRequest,
+    DeleteJobResponse,
+    ExportRequest,
+    HistoryFilter,
+    HistoryImage,
+    HistoryResponse,
+    RetentionStatusResponse,
+)
+from backend.services.deletion import get_deletion_manager
+from backend.services.exporter import stream_zip
+from backend.services.history_store import decode_cursor, encode_cursor, get_history_store
+from backend.services.image_store import download_name, get_image_store
+from backend.services.result_cache import get_result_cache
+from backend.services.retention import get_retention_engine
+from backend.services.thumbnails import get_thumbnail_cache
+from backend.utils.http_cache import address_etag, send_file
 
 router = APIRouter()
 
+# Not every platform registry knows WebP
+mimetypes.add_type("image/webp", ".webp")
+
 
 @router.get("/history", response_model=HistoryResponse)
-async def get_history(page: int = 1, page_size: int = 20):
+async def get_history(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    steps: Optional[int] = None,
+    seed: Optional[int] = None,
+    use_gpu: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+):
     """
     Get image generation history.
 
+    Pass the next_cursor of a response as cursor to get the following page;
+    cursor pages cost the same at any depth, unlike page numbers.
+
     Args:
-        page: Page number (1-indexed)
+        page: Page number (1-indexed), ignored when a cursor is given
         page_size: Number of items per page
+        cursor: next_cursor of the previous page
+        q: Words that must all appear in the prompt
+        width: Only images of this width
+        height: Only images of this height
+        steps: Only images rendered with this many inference steps
+        seed: Only images rendered with this seed
+        use_gpu: Only images rendered on a GPU (true) or the CPU (false)
+        created_after: Only images created at or after this time
+        created_before: Only images created before this time
 
     Returns:
         HistoryResponse: Paginated list of images
     """
     try:
-        # Read history file
-        with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        images = history.get('images', [])
-
-        # Sort by created_at (newest first)
-        images.sort(key=lambda x: x['created_at'], reverse=True)
-
-        # Pagination
-        total = len(images)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_images = images[start_idx:end_idx]
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filters = HistoryFilter(
+        q=q,
+        width=width,
+        height=height,
+        num_inference_steps=steps,
+        seed=seed,
+        use_gpu=use_gpu,
+        created_after=created_after,
+        created_before=created_before
+    )
 
-        # Convert to ImageInfo objects
-        image_infos = [ImageInfo(**img) for img in paginated_images]
+    try:
+        store = get_history_store()
+        offset = 0 if position else (page - 1) * page_size
+        image_infos = store.query(filters, limit=page_size, cursor=position, offset=offset)
+        thumbnails = get_thumbnail_cache()
 
         return HistoryResponse(
-            images=image_infos,
-            total=total,
+            images=[
+                HistoryImage(**image.model_dump(), thumbnail_urls=thumbnails.urls(image.id))
+                for image in image_infos
+            ],
+            total=store.count(filters),
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            next_cursor=encode_cursor(image_infos[-1]) if len(image_infos) == page_size else None
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read history: {str(e)}")
 
 
 @router.get("/download/{image_id}")
-async def download_image(image_id: str):
+async def download_image(image_id: str, request: Request):
     """
     Download an image by ID.
 
+    Supports conditional and Range requests; the file never changes, so
+    clients may cache it for good.
+
     Args:
         image_id: Image ID
+        request: Incoming request
 
     Returns:
-        FileResponse: Image file
+        Response: Image file, 304 or partial content
     """
     try:
-        # Find image in history
-        with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        images = history.get('images', [])
-        image = next((img for img in images if img['id'] == image_id), None)
+        image = get_history_store().get(image_id)
 
         if image is None:
             raise HTTPException(status_code=404, detail="Image not found")
 
         # Get file path
-        filename = image['filename']
-        image_path = Config.IMAGES_DIR / filename
+        image_path = get_image_store().path(image.filename)
 
         if not image_path.exists():
             raise HTTPException(status_code=404, detail="Image file not found")
 
         # Return file
-        return FileResponse(
-            path=str(image_path),
-            media_type="image/png",
-            filename=filename
+        return await send_file(
+            request,
+            str(image_path),
+            media_type=mimetypes.guess_type(image.filename)[0] or "application/octet-stream",
+            filename=download_name(image),
+            etag=address_etag(image.filename)
         )
     except HTTPException:
         raise
@@ -95,43 +145,67 @@ async def download_image(image_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to download image: {str(e)}")
 
 
-@router.delete("/images/{image_id}")
-async def delete_image(image_id: str):
+@router.get("/thumbnails/{image_id}")
+async def get_thumbnail(image_id: str, request: Request, size: int = Query(Config.THUMBNAIL_SIZES[0])):
     """
-    Delete an image by ID.
+    Get a WebP thumbnail of an image, rendering it on first request.
 
     Args:
         image_id: Image ID
+        request: Incoming request
+        size: Thumbnail size in pixels, one of Config.THUMBNAIL_SIZES
 
     Returns:
-        dict: Deletion result
+        Response: Thumbnail file or 304
     """
-    try:
-        import os
-
-        # Read history file
-        with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+    thumbnails = get_thumbnail_cache()
+    if size not in thumbnails.sizes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"size must be one of {', '.join(map(str, thumbnails.sizes))}"
+        )
 
-        images = history.get('images', [])
-        image = next((img for img in images if img['id'] == image_id), None)
+    try:
+        image = get_history_store().get(image_id)
 
         if image is None:
             raise HTTPException(status_code=404, detail="Image not found")
 
-        # Delete image file
-        filename = image['filename']
-        image_path = Config.IMAGES_DIR / filename
+        if not get_image_store().path(image.filename).exists():
+            raise HTTPException(status_code=404, detail="Image file not found")
+
+        thumbnail_path = await thumbnails.get(image, size)
+        if not thumbnail_path.exists():
+            raise HTTPException(status_code=500, detail="Failed to render thumbnail")
+
+        return await send_file(request, str(thumbnail_path), media_type="image/webp")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get thumbnail: {str(e)}")
+
+
+@router.delete("/images/{image_id}")
+async def delete_image(image_id: str):
+    """
+    Delete an image by ID.
+
+    Args:
+        image_id: Image ID
 
-        if image_path.exists():
-            os.remove(image_path)
+    Returns:
+        dict: Deletion result
+    """
+    try:
+        deleted = get_history_store().delete([image_id])
 
-        # Remove from history
-        history['images'] = [img for img in images if img['id'] != image_id]
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Image not found")
 
-        # Write back
-        with open(Config.HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False, default=str)
+        # Delete image file unless other records share it
+        get_image_store().release(deleted)
+        get_thumbnail_cache().remove([image_id])
+        get_result_cache().discard(deleted)
 
         return {"message": "Image deleted successfully", "image_id": image_id}
 
@@ -141,6 +215,57 @@ async def delete_image(image_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete image: {str(e)}")
 
 
+@router.post("/history/delete", response_model=DeleteJobResponse, status_code=202)
+async def bulk_delete_images(request: BulkDeleteRequest):
+    """
+    Delete many images at once.
+
+    The records are deleted in a single write before the response is sent;
+    the files are removed in the background. Poll the returned job for
+    progress.
+
+    Args:
+        request: Images to delete, by ID or by filters. Deleting the whole
+            history must be asked for with all.
+
+    Returns:
+        DeleteJobResponse: Status of the delete job
+    """
+    if request.ids is not None:
+        if request.all:
+            raise HTTPException(status_code=400, detail="ids and all cannot be combined")
+        filters = None
+    elif request.filters is not None and request.filters.model_dump(exclude_none=True):
+        filters = request.filters
+    elif request.all:
+        filters = HistoryFilter()
+    else:
+        # An empty filter matches every image, which must not happen by accident
+        raise HTTPException(status_code=400, detail="Either ids, a filter or all is required")
+
+    try:
+        return await get_deletion_manager().delete(request.ids, filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete images: {str(e)}")
+
+
+@router.get("/history/delete/{job_id}", response_model=DeleteJobResponse)
+async def get_bulk_delete_status(job_id: str):
+    """
+    Get the progress of a bulk delete.
+
+    Args:
+        job_id: Job ID returned by POST /history/delete
+
+    Returns:
+        DeleteJobResponse: Status of the delete job
+    """
+    job = get_deletion_manager().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Delete job not found")
+    return job
+
+
 @router.get("/images/latest")
 async def get_latest_image():
     """
@@ -150,21 +275,16 @@ async def get_latest_image():
         dict: Latest image info
     """
     try:
-        # Read history file
-        with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        images = history.get('images', [])
+        image = get_history_store().latest()
 
-        if not images:
+        if image is None:
             raise HTTPException(status_code=404, detail="No images found")
 
-        # Sort by created_at (newest first)
-        images.sort(key=lambda x: x['created_at'], reverse=True)
-        latest_image = images[0]
+        latest_image = image.model_dump(mode="json")
 
-        # Add download URL
-        latest_image['download_url'] = f"/api/download/{latest_image['id']}"
+        # Add download and thumbnail URLs
+        latest_image['download_url'] = f"/api/download/{image.id}"
+        latest_image['thumbnail_urls'] = get_thumbnail_cache().urls(image.id)
 
         return latest_image
     except HTTPException:
@@ -173,64 +293,74 @@ async def get_latest_image():
         raise HTTPException(status_code=500, detail=f"Failed to get latest image: {str(e)}")
 
 
+@router.post("/history/export")
+async def export_history(request: ExportRequest):
+    """
+    Download images as a ZIP archive.
+
+    The archive is streamed from disk as it is built. Images are stored
+    without recompression.
+
+    Args:
+        request: Images to export, by ID or by filters (all history when neither is given)
+
+    Returns:
+        StreamingResponse: ZIP archive
+    """
+    try:
+        store = get_history_store()
+        if request.ids is not None:
+            images = store.get_many(list(dict.fromkeys(request.ids)))
+        else:
+            images = store.query(request.filters, limit=Config.MAX_EXPORT_IMAGES + 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read history: {str(e)}")
+
+    if not images:
+        raise HTTPException(status_code=404, detail="No images found")
+    if len(images) > Config.MAX_EXPORT_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {Config.MAX_EXPORT_IMAGES} images can be exported at once, narrow the selection"
+        )
+
+    archive_name = f"zimage_{datetime.now():%Y%m%d_%H%M%S}.zip"
+    return StreamingResponse(
+        stream_zip(images, include_manifest=request.include_manifest),
+        media_type="application/zip",
+        headers={"content-disposition": f'attachment; filename="{archive_name}"'}
+    )
+
+
 @router.post("/history/cleanup")
 async def cleanup_history():
     """
     Manually trigger cleanup of old history records and image files.
 
+    Runs a retention sweep right away instead of waiting for the scheduled one.
+
     Returns:
-        dict: Cleanup result with deleted count
+        dict: Cleanup result with deleted count and the sweep report
     """
     try:
-        import os
-        from datetime import timedelta
-
-        # Read history file
-        with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        images = history.get('images', [])
-
-        # Sort by created_at (oldest first)
-        images.sort(key=lambda x: x['created_at'])
-
-        # Calculate cutoff date
-        cutoff_date = datetime.now() - timedelta(days=Config.MAX_HISTORY_DAYS)
-
-        # Keep only recent images within limits
-        kept_images = []
-        deleted_images = []
-
-        for img in images:
-            img_date = datetime.fromisoformat(img['created_at'])
-            should_keep = (
-                img_date >= cutoff_date and
-                len(kept_images) < Config.MAX_HISTORY_IMAGES
-            )
-
-            if should_keep:
-                kept_images.append(img)
-            else:
-                deleted_images.append(img)
-                # Delete corresponding image file
-                try:
-                    image_path = Config.IMAGES_DIR / img['filename']
-                    if image_path.exists():
-                        os.remove(image_path)
-                except Exception as e:
-                    print(f"Error deleting image file {img['filename']}: {e}")
-
-        # Update history
-        history['images'] = kept_images
-
-        # Write back
-        with open(Config.HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False, default=str)
+        report = await get_retention_engine().sweep("manual")
 
         return {
             "message": "Cleanup completed",
-            "deleted_count": len(deleted_images),
-            "remaining_count": len(kept_images)
+            "deleted_count": report.deleted_records,
+            "remaining_count": report.remaining_records,
+            "report": report
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to cleanup history: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to cleanup history: {str(e)}")
+
+
+@router.get("/history/retention", response_model=RetentionStatusResponse)
+async def get_retention_status():
+    """
+    Get the history retention policy and what the last sweep reclaimed.
+
+    Returns:
+        RetentionStatusResponse: Retention limits and sweep counters
+    """
+    return get_retention_engine().get_status()
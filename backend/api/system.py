@@ -1,11 +1,20 @@
 """
 API routes for system monitoring.
 """
-from fastapi import APIRouter
-from datetime import datetime
+from fastapi import APIRouter, Query
+from typing import List, Optional
+import asyncio
 
-from backend.models.schemas import SystemStatusResponse
+from backend.models.schemas import (
+    CacheStatsResponse, DeviceStatus, MetricsHistoryResponse, StartupStatusResponse, SystemStatusResponse
+)
+from backend.services.device_pool import get_device_pool
+from backend.services.generator import get_generator
 from backend.services.monitor import get_monitor
+from backend.services.preloader import get_preloader
+from backend.services.prompt_cache import get_prompt_cache
+from backend.services.result_cache import get_result_cache
+from backend.utils.http_cache import get_transfer_stats
 
 router = APIRouter()
 
@@ -13,17 +22,68 @@ router = APIRouter()
 @router.get("/system/status", response_model=SystemStatusResponse)
 async def get_system_status():
     """
-    Get current system status.
+    Get current system status, as of the latest background sample.
 
     Returns:
         SystemStatusResponse: System resource information
     """
     monitor = get_monitor()
+    status = monitor.latest()
+    if status is None:
+        # No sample yet, measure off the event loop
+        status = await asyncio.get_running_loop().run_in_executor(None, monitor.sample)
+    return status
 
-    return SystemStatusResponse(
-        cpu=monitor.get_cpu_info(),
-        memory=monitor.get_memory_info(),
-        gpu=monitor.get_gpu_info(),
-        disk=monitor.get_disk_info(),
-        timestamp=datetime.now()
-    )
\ No newline at end of file
+
+@router.get("/system/status/history", response_model=MetricsHistoryResponse)
+async def get_system_status_history(
+    seconds: Optional[float] = Query(None, gt=0, description="Only return the samples of this many last seconds")
+):
+    """
+    Get the recent system usage time series.
+
+    Args:
+        seconds: Length of the returned window, the whole buffer when omitted
+
+    Returns:
+        MetricsHistoryResponse: Samples, oldest first
+    """
+    monitor = get_monitor()
+    return MetricsHistoryResponse(interval_seconds=monitor.interval, samples=monitor.history(seconds))
+
+
+@router.get("/system/devices", response_model=List[DeviceStatus])
+async def get_device_status():
+    """
+    Get queue depth and utilization of every generation device.
+
+    Returns:
+        List[DeviceStatus]: Status of each device in the pool
+    """
+    return get_device_pool().get_status(get_generator().loaded_devices())
+
+
+@router.get("/system/startup", response_model=StartupStatusResponse)
+async def get_startup_status():
+    """
+    Get the model preload state and cold-start phase timings.
+
+    Returns:
+        StartupStatusResponse: Preload state and timings
+    """
+    return get_preloader().get_status()
+
+
+@router.get("/system/cache", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """
+    Get cache hit/miss counters and memory usage.
+
+    Returns:
+        CacheStatsResponse: Statistics of each cache
+    """
+    return CacheStatsResponse(
+        prompt_embeddings=get_prompt_cache().get_stats(),
+        results=get_result_cache().get_stats(),
+        http=get_transfer_stats().get_stats()
+    )
@@ -3,13 +3,15 @@ FastAPI application entry point for Z-Image backend.
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 from backend.models.config import Config
+from backend.utils.http_cache import ImmutableStaticFiles
 
 
 # Configure logging to reduce redundant INFO logs
@@ -67,10 +69,35 @@ async def lifespan(app: FastAPI):
     # Startup
     logging.info("Starting Z-Image backend...")
     print("Starting Z-Image backend...")
+    # Open (and migrate or load) the history before the first request
+    from backend.services.history_store import get_history_store
+    get_history_store()
+    # Move flat image files to content-addressed storage and count their references
+    from backend.services.image_store import get_image_store
+    await asyncio.get_running_loop().run_in_executor(None, get_image_store().open)
+    # Index the saved images for the result cache
+    from backend.services.result_cache import get_result_cache
+    await get_result_cache().load()
+    # Preload in the background so /health can report progress meanwhile
+    from backend.services.preloader import get_preloader
+    preload_job = asyncio.ensure_future(get_preloader().run())
+    # Enforce the history retention limits in the background
+    from backend.services.retention import get_retention_engine
+    retention_job = asyncio.ensure_future(get_retention_engine().run())
+    # Sample system usage in the background so status requests return at once
+    from backend.services.monitor import get_monitor
+    get_monitor().start()
     yield
+    preload_job.cancel()
+    retention_job.cancel()
+    get_monitor().stop()
     # Shutdown
     logging.info("Shutting down Z-Image backend...")
     print("Shutting down Z-Image backend...")
+    from backend.services.encoder import get_encoder
+    from backend.services.history_store import close_history_store
+    get_encoder().shutdown()
+    close_history_store()
 
 
 # Create FastAPI application
@@ -90,15 +117,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for images
-app.mount("/static/images", StaticFiles(directory=str(Config.IMAGES_DIR)), name="images")
+# Mount static files for images, cached by clients as immutable
+app.mount(
+    "/static/images",
+    ImmutableStaticFiles(directory=str(Config.IMAGES_DIR), content_addressed=True),
+    name="images"
+)
 
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": "Z-Image API"}
+    """Health check endpoint, 503 until the configured model preload has finished."""
+    from backend.services.preloader import get_preloader
+    startup = get_preloader().get_status()
+    content = {
+        "status": "healthy" if startup.ready else startup.state,
+        "service": "Z-Image API",
+        "startup": startup.model_dump(mode="json")
+    }
+    return JSONResponse(content=content, status_code=200 if startup.ready else 503)
+
+
+# Prometheus metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Generation latency histograms, task counters and queue and VRAM gauges in the Prometheus text format."""
+    from backend.services.metrics import CONTENT_TYPE, get_metrics
+    return Response(content=get_metrics().render(), media_type=CONTENT_TYPE)
 
 
 # Include API routes
@@ -117,7 +163,8 @@ async def root():
         "message": "Z-Image API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "metrics": "/metrics"
     }
 
 
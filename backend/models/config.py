@@ -12,7 +12,13 @@ class Config:
     BASE_DIR = Path(__file__).parent.parent.parent.absolute()
     DATA_DIR = BASE_DIR / "data"
     IMAGES_DIR = DATA_DIR / "images"
+    # Staging of encoded images, outside the served images tree and on the same filesystem
+    INCOMING_DIR = DATA_DIR / "incoming"
+    THUMBNAILS_DIR = DATA_DIR / "thumbnails"
+    TRACES_DIR = DATA_DIR / "traces"
     HISTORY_FILE = DATA_DIR / "history.json"
+    HISTORY_DB = DATA_DIR / "history.db"
+    HISTORY_JOURNAL = DATA_DIR / "history.journal"
     LOGS_DIR = BASE_DIR / "backend" / "logs"
 
     # Model settings
@@ -22,6 +28,35 @@ class Config:
     DEFAULT_NUM_INFERENCE_STEPS = 9
     DEFAULT_GUIDANCE_SCALE = 0.0
     DEFAULT_SEED = 42
+    PROMPT_MAX_SEQUENCE_LENGTH = 512  # Text encoder max tokens
+
+    # Generator backend: "zimage" (the model), "tiny" (the Z-Image pipeline with
+    # miniature random weights, needs no model weights) or "synthetic" (placeholder
+    # images after a simulated latency, needs neither torch nor diffusers), the
+    # last two for load tests
+    GENERATOR_BACKEND = os.getenv("GENERATOR_BACKEND", "zimage").lower()
+    TINY_TOKENIZER = os.getenv("TINY_TOKENIZER", "")  # Tokenizer of the tiny backend, empty for the one of MODEL_NAME
+    SYNTHETIC_LOAD_MS = float(os.getenv("SYNTHETIC_LOAD_MS", "0"))  # Simulated replica load time
+    SYNTHETIC_STEP_MS = float(os.getenv("SYNTHETIC_STEP_MS", "50"))  # Simulated time per step and 1024x1024 image
+    SYNTHETIC_JITTER = float(os.getenv("SYNTHETIC_JITTER", "0.1"))  # Sigma of the log-normal latency spread
+    SYNTHETIC_FAILURE_RATE = float(os.getenv("SYNTHETIC_FAILURE_RATE", "0"))  # Fraction of batches that fail
+
+    # Startup settings
+    # PRELOAD_MODE: "off" loads each replica on its first request, "load" loads
+    # every replica at startup, "warmup" also renders WARMUP_SHAPES (e.g.
+    # "1024x1024,768x1344") with WARMUP_STEPS steps. /health reports 503 until done.
+    PRELOAD_MODE = os.getenv("PRELOAD_MODE", "off").lower()
+    WARMUP_SHAPES = os.getenv("WARMUP_SHAPES", "1024x1024")
+    WARMUP_STEPS = int(os.getenv("WARMUP_STEPS", "2"))
+    TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() in ("1", "true", "yes")  # Compile the transformer
+    TORCH_COMPILE_MODE = os.getenv("TORCH_COMPILE_MODE", "max-autotune-no-cudagraphs")
+
+    # Prompt embedding cache, 0 disables a tier
+    PROMPT_CACHE_DEVICE_MB = int(os.getenv("PROMPT_CACHE_DEVICE_MB", "256"))
+    PROMPT_CACHE_CPU_MB = int(os.getenv("PROMPT_CACHE_CPU_MB", "1024"))
+
+    # Reuse saved images for fully seeded requests with identical parameters
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
 
     # API settings
     API_PREFIX = "/api"
@@ -29,10 +64,66 @@ class Config:
 
     # Task settings
     TASK_TIMEOUT = 600  # 10 minutes
+    TASK_EVENT_QUEUE_SIZE = 16  # Updates buffered per progress stream subscriber
+    TASK_EVENT_KEEPALIVE = 15  # Seconds between keep-alive comments on idle progress streams
+
+    # Micro-batching settings
+    # Pending tasks with the same resolution, steps and guidance are merged into
+    # one pipeline call. The scheduler waits up to BATCH_WINDOW_MS after the
+    # oldest pending task arrived for compatible tasks to join its batch.
+    BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "50"))
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "4"))  # Images per pipeline call
+
+    # Worker pool settings
+    # Batches in flight per device. A replica renders one batch at a time, extra
+    # workers only prepare the next batch and report progress while it runs
+    GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "1"))
+    MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "1000"))  # Queued images before new tasks are rejected
+    MAX_BATCH_JOB_IMAGES = int(os.getenv("MAX_BATCH_JOB_IMAGES", "1000"))  # Images per batch job
+    ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))  # Processes encoding images to disk
+
+    # Thumbnail settings
+    # WebP thumbnails fitting in a square of each size are rendered after every
+    # save, and on first request for images saved before.
+    THUMBNAIL_SIZES = [int(size) for size in os.getenv("THUMBNAIL_SIZES", "256,512").split(",") if size.strip()]
+    THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+    # CPU inference settings
+    CPU_THREADS = int(os.getenv("CPU_THREADS", "0"))  # Intra-op threads, 0 for the PyTorch default
+    CPU_INTEROP_THREADS = int(os.getenv("CPU_INTEROP_THREADS", "0"))  # Inter-op threads, 0 for the PyTorch default
+    # auto (bfloat16 when the CPU supports it natively, float32 otherwise), float32,
+    # bfloat16 (autocast) or int8 (dynamically quantized linear layers)
+    CPU_PRECISION = os.getenv("CPU_PRECISION", "auto").lower()
+    CPU_CHANNELS_LAST = os.getenv("CPU_CHANNELS_LAST", "true").lower() in ("1", "true", "yes")  # NHWC VAE
+
+    # Device pool settings
+    GPU_DEVICES = os.getenv("GPU_DEVICES", "")  # Comma-separated GPU ids to serve from, empty for all visible GPUs
+    DEVICE_UTILIZATION_WINDOW = 60  # Seconds of history used for device utilization
+
+    # Generation tracing settings
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # Fraction of batches dumped as Chrome trace files
+    TRACE_CUDA_SYNC = os.getenv("TRACE_CUDA_SYNC", "true").lower() in ("1", "true", "yes")  # Synchronize CUDA at stage boundaries
+    TRACE_TORCH_PROFILER = os.getenv("TRACE_TORCH_PROFILER", "false").lower() in ("1", "true", "yes")  # Also run torch.profiler on sampled batches
+    TRACE_MAX_FILES = 100  # Trace files kept, oldest removed first
+
+    # System monitor settings
+    GPU_TELEMETRY = os.getenv("GPU_TELEMETRY", "auto").lower()  # auto, nvml, torch or off
+    METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "2"))  # Seconds between system usage samples
+    METRICS_HISTORY_SIZE = int(os.getenv("METRICS_HISTORY_SIZE", "900"))  # Samples kept for the usage time series
+
+    # History storage: "sqlite" (history.json is imported once on first start),
+    # "journal" (in memory, history.json snapshot plus an append-only journal) or "json"
+    HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "sqlite").lower()
+    HISTORY_COMPACT_INTERVAL = int(os.getenv("HISTORY_COMPACT_INTERVAL", "300"))  # Seconds between journal compactions
+    HISTORY_COMPACT_ENTRIES = int(os.getenv("HISTORY_COMPACT_ENTRIES", "1000"))  # Journal entries that trigger a compaction
 
-    # History cleanup settings
-    MAX_HISTORY_IMAGES = 500  # Maximum number of images to keep in history
-    MAX_HISTORY_DAYS = 30  # Maximum number of days to keep history
+    # History retention settings, enforced by a background job
+    MAX_HISTORY_IMAGES = int(os.getenv("MAX_HISTORY_IMAGES", "500"))  # Maximum number of images to keep in history
+    MAX_HISTORY_DAYS = int(os.getenv("MAX_HISTORY_DAYS", "30"))  # Maximum number of days to keep history
+    MAX_HISTORY_GB = float(os.getenv("MAX_HISTORY_GB", "0"))  # Maximum disk space of history images, 0 for no limit
+    RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "300"))  # Seconds between retention sweeps
+    RETENTION_BATCH_SIZE = 200  # Records deleted per store write during a sweep
+    MAX_EXPORT_IMAGES = int(os.getenv("MAX_EXPORT_IMAGES", "1000"))  # Images per ZIP export
 
     # Ensure directories exist
     @classmethod
@@ -40,9 +131,8 @@ class Config:
         """Create necessary directories if they don't exist."""
         cls.DATA_DIR.mkdir(parents=True, exist_ok=True)
         cls.IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        cls.THUMBNAILS_DIR.mkdir(parents=True, exist_ok=True)
         cls.LOGS_DIR.mkdir(parents=True, exist_ok=True)
-        if not cls.HISTORY_FILE.exists():
-            cls.HISTORY_FILE.write_text('{"images": []}', encoding='utf-8')
 
 
 # Initialize directories on import
@@ -2,7 +2,7 @@
 Pydantic schemas for API request/response models.
 """
 from datetime import datetime
-from typing import Optional, List
+from typing import Annotated, Dict, Optional, List
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -15,6 +15,21 @@ class TaskStatus(str, Enum):
     FAILED = "failed"
 
 
+class ImageFormat(str, Enum):
+    """Output image format enumeration."""
+    PNG = "png"
+    WEBP = "webp"
+    JPEG = "jpeg"
+
+
+class OutputOptions(BaseModel):
+    """Output format and compression settings of generated images."""
+    output_format: ImageFormat = Field(ImageFormat.PNG, description="File format of the saved images")
+    png_compress_level: int = Field(6, description="PNG zlib compression level (0=fastest, 9=smallest)", ge=0, le=9)
+    quality: int = Field(90, description="JPEG/lossy WebP quality, or lossless WebP effort", ge=1, le=100)
+    webp_lossless: bool = Field(True, description="Save WebP losslessly")
+
+
 class ImageGenerationRequest(BaseModel):
     """Request model for image generation."""
     prompt: str = Field(..., description="Text prompt for image generation", min_length=1)
@@ -25,15 +40,51 @@ class ImageGenerationRequest(BaseModel):
     use_gpu: bool = Field(True, description="Whether to use GPU for generation")
     seed: Optional[int] = Field(None, description="Random seed for reproducibility")
     batch_size: int = Field(1, description="Number of images to generate", ge=1, le=8)
-    gpu_id: int = Field(0, description="GPU device ID", ge=0, le=7)
+    gpu_id: Optional[int] = Field(None, description="GPU device ID, omit to use the least-loaded GPU", ge=0, le=7)
     guidance_scale: float = Field(0.0, description="Guidance scale for CFG", ge=0.0, le=20.0)
-    max_concurrent_tasks: int = Field(1, description="Maximum concurrent tasks", ge=1, le=4, default=1)
+    output: OutputOptions = Field(default_factory=OutputOptions, description="Output format and compression")
+    max_concurrent_tasks: int = Field(
+        1,
+        description="Deprecated and ignored, concurrency is set by the server's GENERATION_WORKERS",
+        ge=1,
+        le=4
+    )
+
+
+class BatchGenerationRequest(BaseModel):
+    """Request model for a batch generation job."""
+    prompts: List[Annotated[str, Field(min_length=1)]] = Field(
+        ..., description="Text prompts to render", min_length=1
+    )
+    seeds: Optional[List[int]] = Field(
+        None, description="Render every prompt once per seed (prompt x seed grid)", min_length=1
+    )
+    images_per_prompt: int = Field(1, description="Images per prompt when no seeds are given", ge=1, le=8)
+    negative_prompt: Optional[str] = Field(None, description="Negative prompt shared by all prompts")
+    height: int = Field(1024, description="Image height in pixels", ge=256, le=2048)
+    width: int = Field(1024, description="Image width in pixels", ge=256, le=2048)
+    num_inference_steps: int = Field(9, description="Number of inference steps", ge=1, le=50)
+    use_gpu: bool = Field(True, description="Whether to use GPU for generation")
+    gpu_id: Optional[int] = Field(None, description="GPU device ID, omit to spread over the least-loaded GPUs", ge=0, le=7)
+    guidance_scale: float = Field(0.0, description="Guidance scale for CFG", ge=0.0, le=20.0)
+    output: OutputOptions = Field(default_factory=OutputOptions, description="Output format and compression")
+
+
+class StageTimings(BaseModel):
+    """Time spent in each stage of rendering and saving an image, in ms."""
+    queue_wait_ms: Optional[float] = None
+    text_encode_ms: Optional[float] = None
+    denoise_ms: Optional[float] = None
+    step_ms: List[float] = Field(default_factory=list, description="Duration of every denoising step")
+    vae_decode_ms: Optional[float] = None
+    save_ms: Optional[float] = None
+    trace_id: Optional[str] = Field(None, description="ID of the Chrome trace file written for the render (traces/<id>.json), if sampled")
 
 
 class ImageInfo(BaseModel):
     """Image information model."""
     id: str
-    filename: str
+    filename: str = Field(..., description="Path of the file relative to the images directory")
     prompt: str
     negative_prompt: Optional[str] = None
     width: int
@@ -41,9 +92,17 @@ class ImageInfo(BaseModel):
     num_inference_steps: int
     use_gpu: bool
     seed: Optional[int] = None
+    guidance_scale: Optional[float] = None
     size_bytes: int
+    format: ImageFormat = ImageFormat.PNG
     created_at: datetime
     generation_time_ms: Optional[float] = None
+    encode_time_ms: Optional[float] = None
+    quality: Optional[int] = Field(None, description="JPEG/lossy WebP quality the file was encoded at")
+    webp_lossless: Optional[bool] = None
+    model: Optional[str] = Field(None, description="Model the image was rendered with")
+    precision: Optional[str] = Field(None, description="Precision of the replica that rendered the image")
+    stages: Optional[StageTimings] = None
 
 
 class TaskResponse(BaseModel):
@@ -54,16 +113,91 @@ class TaskResponse(BaseModel):
     total_steps: int = Field(9, description="Total number of steps")
     current_step: int = Field(0, description="Current step number")
     message: str = Field("", description="Status message")
+    queue_position: Optional[int] = Field(None, description="1-based position in the queue while pending")
+    device: Optional[str] = Field(None, description="Device the task is dispatched to")
+    total_images: int = Field(1, description="Number of images the task renders")
     result: Optional[ImageInfo] = None
+    stages: Optional[StageTimings] = Field(None, description="Stage timings of the first image")
+    results: List[ImageInfo] = Field(default_factory=list, description="Every image rendered so far")
     error: Optional[str] = None
 
 
+class HistoryFilter(BaseModel):
+    """Filters of a history query, unset fields match every image."""
+    q: Optional[str] = Field(None, description="Words that must all appear in the prompt")
+    width: Optional[int] = None
+    height: Optional[int] = None
+    num_inference_steps: Optional[int] = None
+    seed: Optional[int] = None
+    use_gpu: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+class HistoryImage(ImageInfo):
+    """Image information with the URLs of its thumbnails."""
+    thumbnail_urls: Dict[int, str] = Field(default_factory=dict, description="Thumbnail URL by size in pixels")
+
+
 class HistoryResponse(BaseModel):
     """Response model for image history."""
-    images: List[ImageInfo]
+    images: List[HistoryImage]
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, None on the last page")
+
+
+class ExportRequest(BaseModel):
+    """Request model for a ZIP export of history images."""
+    ids: Optional[List[str]] = Field(None, description="Images to export in this order, instead of filters")
+    filters: Optional[HistoryFilter] = Field(None, description="Export the matching images, newest first")
+    include_manifest: bool = Field(True, description="Add a manifest.json with the record of every image")
+
+
+class BulkDeleteRequest(BaseModel):
+    """Request model for deleting many history images at once."""
+    ids: Optional[List[str]] = Field(None, description="Images to delete, instead of filters")
+    filters: Optional[HistoryFilter] = Field(None, description="Delete the matching images, at least one filter must be set")
+    all: bool = Field(False, description="Delete the whole history, required when no filter is set")
+
+
+class DeleteJobResponse(BaseModel):
+    """Progress of a bulk delete."""
+    job_id: str
+    status: TaskStatus = Field(..., description="processing while files are removed, then completed or failed")
+    deleted_records: int
+    processed: int = Field(0, description="Deleted records whose files have been handled")
+    files_removed: int = 0
+    bytes_freed: int = 0
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class RetentionReport(BaseModel):
+    """Result of one history retention sweep."""
+    trigger: str = Field(..., description="scheduled, usage or manual")
+    started_at: datetime
+    duration_ms: float
+    deleted_records: int
+    deleted_files: int
+    reclaimed_bytes: int
+    remaining_records: int
+    remaining_bytes: int
+
+
+class RetentionStatusResponse(BaseModel):
+    """Response model for the history retention policy and its last sweep."""
+    max_images: int
+    max_days: int
+    max_bytes: int = Field(..., description="Disk budget of history images, 0 for no limit")
+    interval_seconds: int
+    running: bool
+    sweeps: int
+    total_deleted_records: int
+    total_reclaimed_bytes: int
+    last_sweep: Optional[RetentionReport] = None
 
 
 class CPUInfo(BaseModel):
@@ -84,11 +218,15 @@ class MemoryInfo(BaseModel):
 class GPUInfo(BaseModel):
     """GPU information."""
     available: bool
+    index: Optional[int] = Field(None, description="Device index, in nvidia-smi order with NVML")
     name: Optional[str] = None
     memory_total_gb: Optional[float] = None
     memory_used_gb: Optional[float] = None
     usage_percent: Optional[float] = None
     temperature: Optional[float] = None
+    process_allocated_gb: Optional[float] = Field(None, description="Memory allocated by tensors of this process")
+    process_reserved_gb: Optional[float] = Field(None, description="Memory held by the caching allocator of this process")
+    process_peak_gb: Optional[float] = Field(None, description="Peak memory allocated by tensors of this process")
 
 
 class DiskInfo(BaseModel):
@@ -100,10 +238,101 @@ class DiskInfo(BaseModel):
     usage_percent: float
 
 
+class DeviceStatus(BaseModel):
+    """Generation device queue and utilization."""
+    device: str
+    gpu_id: Optional[int] = None
+    queued_tasks: int
+    queued_images: int
+    active_batches: int
+    completed_images: int
+    utilization_percent: float
+    replica_loaded: bool
+
+
+class PromptCacheStats(BaseModel):
+    """Prompt embedding cache counters and memory usage."""
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    device_entries: int
+    device_bytes: int
+    device_budget_bytes: int
+    cpu_entries: int
+    cpu_bytes: int
+    cpu_budget_bytes: int
+
+
+class ResultCacheStats(BaseModel):
+    """Deterministic result cache counters."""
+    enabled: bool
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    shared_renders: int = Field(0, description="Requests that joined an identical in-flight render")
+
+
+class HttpCacheStats(BaseModel):
+    """Image file transfer counters."""
+    requests: int
+    not_modified: int = Field(..., description="Requests answered with 304 Not Modified")
+    partial: int = Field(..., description="Requests answered with 206 Partial Content")
+    bytes_sent: int
+    bytes_saved: int = Field(..., description="File bytes not sent thanks to 304 and range responses")
+    not_modified_rate: float
+
+
+class CacheStatsResponse(BaseModel):
+    """Response model for cache statistics."""
+    prompt_embeddings: PromptCacheStats
+    results: ResultCacheStats
+    http: HttpCacheStats
+
+
+class StartupPhase(BaseModel):
+    """Duration of one cold-start phase."""
+    device: str
+    phase: str
+    duration_ms: float
+
+
+class StartupStatusResponse(BaseModel):
+    """Response model for model preload status."""
+    backend: str = Field(..., description="Generator backend: zimage, tiny or synthetic")
+    mode: str
+    state: str = Field(..., description="disabled, pending, loading, warming_up, ready or failed")
+    ready: bool
+    torch_compile: bool
+    phases: List[StartupPhase] = Field(default_factory=list)
+    total_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
 class SystemStatusResponse(BaseModel):
     """Response model for system status."""
     cpu: CPUInfo
     memory: MemoryInfo
-    gpu: Optional[GPUInfo] = None
+    gpu: Optional[GPUInfo] = Field(None, description="First GPU, kept for older clients")
+    gpus: List[GPUInfo] = Field(default_factory=list, description="Every GPU")
     disk: DiskInfo
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+
+class MetricsSample(BaseModel):
+    """One sample of the system usage time series."""
+    timestamp: datetime
+    cpu_percent: float
+    memory_percent: float
+    memory_used_gb: float
+    gpu_percent: Optional[float] = None
+    gpu_memory_used_gb: Optional[float] = None
+    gpu_temperature: Optional[float] = None
+    disk_percent: float
+
+
+class MetricsHistoryResponse(BaseModel):
+    """Response model for the recent system usage time series."""
+    interval_seconds: float
+    samples: List[MetricsSample]
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+CPU inference profile.
+Thread, precision and memory-layout settings applied to the CPU replica.
+"""
+from contextlib import nullcontext
+from typing import ContextManager
+import logging
+
+import torch
+
+from backend.models.config import Config
+
+logger = logging.getLogger(__name__)
+
+CPU_PRECISIONS = ("auto", "float32", "bfloat16", "int8")
+
+
+def bf16_supported() -> bool:
+    """Whether the CPU has native bfloat16 matmul support (AVX512-BF16/AMX)."""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except Exception:
+        return False
+
+
+def resolve_precision(precision: str) -> str:
+    """
+    Resolve the configured CPU precision.
+
+    Args:
+        precision: One of CPU_PRECISIONS
+
+    Returns:
+        str: float32, bfloat16 or int8
+    """
+    if precision not in CPU_PRECISIONS:
+        raise ValueError(f"CPU_PRECISION must be one of {', '.join(CPU_PRECISIONS)}, got {precision!r}")
+    if precision == "auto":
+        return "bfloat16" if bf16_supported() else "float32"
+    if precision == "bfloat16" and not bf16_supported():
+        logger.warning("CPU has no native bfloat16 support, autocast will be slow")
+    return precision
+
+
+def configure_threads():
+    """Apply Config.CPU_THREADS and Config.CPU_INTEROP_THREADS to this process."""
+    if Config.CPU_THREADS > 0:
+        torch.set_num_threads(Config.CPU_THREADS)
+    if Config.CPU_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(Config.CPU_INTEROP_THREADS)
+        except RuntimeError as e:
+            # Only allowed before the first inter-op parallel work
+            logger.warning(f"Could not set inter-op threads: {e}")
+    logger.info(
+        f"CPU threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op"
+    )
+
+
+def optimize_pipeline(pipeline, precision: str):
+    """
+    Prepare a float32 pipeline loaded on the CPU for inference.
+
+    Args:
+        pipeline: Pipeline replica on the CPU
+        precision: Resolved precision (float32, bfloat16 or int8)
+    """
+    if Config.CPU_CHANNELS_LAST:
+        # The VAE decoder is convolutional and runs faster on NHWC with oneDNN
+        pipeline.vae.to(memory_format=torch.channels_last)
+
+    if precision == "int8":
+        # Weights of linear layers are stored as int8, activations are quantized per call
+        for name in ("transformer", "text_encoder"):
+            module = getattr(pipeline, name)
+            torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def inference_context(device: str, precision: str) -> ContextManager:
+    """
+    Get the context a pipeline call on a device runs in.
+
+    Args:
+        device: Torch device string
+        precision: Resolved CPU precision
+
+    Returns:
+        ContextManager: bfloat16 autocast on the CPU when enabled, a no-op otherwise
+    """
+    if device == "cpu" and precision == "bfloat16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return nullcontext()
@@ -0,0 +1,132 @@
+"""
+Bulk deletion of history images.
+Deletes the records of many images in one store write and removes their
+files and thumbnails afterwards in the background.
+"""
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+import logging
+
+from backend.models.schemas import DeleteJobResponse, HistoryFilter, ImageInfo, TaskStatus
+from backend.services.history_store import get_history_store
+from backend.services.image_store import get_image_store
+from backend.services.result_cache import get_result_cache
+from backend.services.thumbnails import get_thumbnail_cache
+
+logger = logging.getLogger(__name__)
+
+
+class DeletionManager:
+    """Runs bulk deletes and tracks the removal of their files.
+
+    A delete returns as soon as the records are gone; files are removed in
+    batches in a worker thread. Files left behind by a shutdown are no
+    longer referenced and are cleaned up by the image store at startup.
+    """
+
+    def __init__(self, batch_size: int, max_jobs: int):
+        """
+        Initialize the manager.
+
+        Args:
+            batch_size: Images whose files are removed per worker call
+            max_jobs: Number of jobs whose status is kept
+        """
+        self.batch_size = batch_size
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, DeleteJobResponse]" = OrderedDict()
+        # Keeps running removals from being garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def delete(
+        self,
+        image_ids: Optional[List[str]] = None,
+        filters: Optional[HistoryFilter] = None
+    ) -> DeleteJobResponse:
+        """
+        Delete image records and start removing their files.
+
+        Args:
+            image_ids: IDs of the images to delete, unknown IDs are ignored
+            filters: Delete the matching images instead, an empty filter matches all
+
+        Returns:
+            DeleteJobResponse: Status of the new job
+        """
+        loop = asyncio.get_running_loop()
+        deleted = await loop.run_in_executor(None, self._delete_records, image_ids, filters)
+        get_result_cache().discard(deleted)
+
+        job = DeleteJobResponse(
+            job_id=str(uuid.uuid4()),
+            status=TaskStatus.PROCESSING if deleted else TaskStatus.COMPLETED,
+            deleted_records=len(deleted),
+            created_at=datetime.now(),
+            finished_at=None if deleted else datetime.now()
+        )
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+        if deleted:
+            task = asyncio.ensure_future(self._remove_files(job, deleted))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return job.model_copy()
+
+    @staticmethod
+    def _delete_records(
+        image_ids: Optional[List[str]],
+        filters: Optional[HistoryFilter]
+    ) -> List[ImageInfo]:
+        """Resolve the images to delete and delete their records. Runs in a worker thread."""
+        store = get_history_store()
+        if image_ids is None:
+            matching = store.query(filters, limit=max(store.count(filters), 1))
+            image_ids = [image.id for image in matching]
+        return store.delete(image_ids)
+
+    async def _remove_files(self, job: DeleteJobResponse, images: List[ImageInfo]):
+        """Remove the files of deleted images batch by batch, updating the job."""
+        loop = asyncio.get_running_loop()
+        try:
+            for idx in range(0, len(images), self.batch_size):
+                batch = images[idx:idx + self.batch_size]
+                files, freed = await loop.run_in_executor(None, self._remove_batch, batch)
+                job.processed += len(batch)
+                job.files_removed += files
+                job.bytes_freed += freed
+            job.status = TaskStatus.COMPLETED
+            logger.info(
+                f"Bulk delete {job.job_id} removed {job.files_removed} file(s) of "
+                f"{job.deleted_records} record(s), {job.bytes_freed / 1024 / 1024:.1f}MB"
+            )
+        except Exception as e:
+            logger.error(f"Bulk delete {job.job_id} failed: {e}")
+            job.status = TaskStatus.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+
+    @staticmethod
+    def _remove_batch(images: List[ImageInfo]) -> Tuple[int, int]:
+        """Remove the thumbnails and unshared files of images. Runs in a worker thread."""
+        get_thumbnail_cache().remove(image.id for image in images)
+        return get_image_store().release(images)
+
+    def get_job(self, job_id: str) -> Optional[DeleteJobResponse]:
+        """Get the status of a bulk delete, None if it is unknown."""
+        job = self._jobs.get(job_id)
+        return job.model_copy() if job is not None else None
+
+
+# Global singleton instance
+_deletion_manager = DeletionManager(batch_size=100, max_jobs=100)
+
+
+def get_deletion_manager() -> DeletionManager:
+    """Get the global deletion manager instance."""
+    return _deletion_manager
@@ -0,0 +1,176 @@
+"""
+Device pool for dispatching generation batches across GPUs.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import DeviceStatus
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceSlot:
+    """A device with its own task queue and pipeline replica."""
+
+    def __init__(self, device: str, gpu_id: Optional[int] = None):
+        """
+        Initialize a device slot.
+
+        Args:
+            device: Torch device string ("cuda:0", "cpu", ...)
+            gpu_id: CUDA device index, None for the CPU
+        """
+        self.device = device
+        self.gpu_id = gpu_id
+        self.pending: Deque = deque()
+        self.pending_event = asyncio.Event()
+        self.dispatch_lock = asyncio.Lock()
+        self.active_batches = 0
+        self.active_images = 0
+        self.completed_images = 0
+        # (start, end) of recent batches, used to compute utilization
+        self._busy_intervals: Deque[Tuple[float, float]] = deque()
+        self._busy_since: Optional[float] = None
+
+    @property
+    def load(self) -> int:
+        """Queued plus running images, used for least-loaded dispatch."""
+        return sum(task.batch_size for task in self.pending) + self.active_images
+
+    def batch_started(self, num_images: int):
+        """Record that a batch of images started rendering on this device."""
+        if self.active_batches == 0:
+            self._busy_since = time.monotonic()
+        self.active_batches += 1
+        self.active_images += num_images
+
+    def batch_finished(self, num_images: int, completed: bool):
+        """Record that a batch of images finished rendering on this device."""
+        self.active_batches -= 1
+        self.active_images -= num_images
+        if completed:
+            self.completed_images += num_images
+        if self.active_batches == 0 and self._busy_since is not None:
+            self._busy_intervals.append((self._busy_since, time.monotonic()))
+            self._busy_since = None
+
+    def utilization(self) -> float:
+        """Fraction of the last Config.DEVICE_UTILIZATION_WINDOW seconds spent rendering."""
+        now = time.monotonic()
+        window_start = now - Config.DEVICE_UTILIZATION_WINDOW
+
+        while self._busy_intervals and self._busy_intervals[0][1] < window_start:
+            self._busy_intervals.popleft()
+
+        busy = sum(end - max(start, window_start) for start, end in self._busy_intervals)
+        if self._busy_since is not None:
+            busy += now - max(self._busy_since, window_start)
+        return min(busy / Config.DEVICE_UTILIZATION_WINDOW, 1.0)
+
+
+class DevicePool:
+    """Pool of devices that generation tasks are dispatched to."""
+
+    def __init__(self):
+        """Initialize the pool from the visible CUDA devices."""
+        self.gpu_slots: List[DeviceSlot] = [
+            DeviceSlot(f"cuda:{gpu_id}", gpu_id) for gpu_id in self._visible_gpu_ids()
+        ]
+        self.cpu_slot = DeviceSlot("cpu")
+        logger.info(f"Device pool initialized with {len(self.gpu_slots)} GPU(s)")
+
+    @staticmethod
+    def _visible_gpu_ids() -> List[int]:
+        """Get the GPU ids to serve from, honouring Config.GPU_DEVICES."""
+        try:
+            import torch
+        except ImportError:
+            # Only the synthetic generator runs without torch, on the CPU slot
+            return []
+        if not torch.cuda.is_available():
+            return []
+
+        count = torch.cuda.device_count()
+        if not Config.GPU_DEVICES:
+            return list(range(count))
+
+        gpu_ids = [int(gpu_id) for gpu_id in Config.GPU_DEVICES.split(",") if gpu_id.strip()]
+        for gpu_id in gpu_ids:
+            if gpu_id >= count:
+                raise ValueError(f"GPU_DEVICES lists cuda:{gpu_id} but only {count} GPU(s) are visible")
+        return gpu_ids
+
+    @property
+    def slots(self) -> List[DeviceSlot]:
+        """All device slots, GPUs first."""
+        return self.gpu_slots + [self.cpu_slot]
+
+    def select(
+        self,
+        use_gpu: bool = True,
+        gpu_id: Optional[int] = None,
+        assigned: Optional[Dict[str, int]] = None
+    ) -> DeviceSlot:
+        """
+        Select the device a task should run on.
+
+        Args:
+            use_gpu: Whether the task wants a GPU
+            gpu_id: Pin the task to this GPU, None for the least-loaded one
+            assigned: Images by device assigned but not queued yet, counted as load
+
+        Returns:
+            DeviceSlot: Selected device
+
+        Raises:
+            ValueError: If the pinned GPU is not part of the pool
+        """
+        if not use_gpu or not self.gpu_slots:
+            return self.cpu_slot
+
+        if gpu_id is not None:
+            for slot in self.gpu_slots:
+                if slot.gpu_id == gpu_id:
+                    return slot
+            served = ", ".join(str(slot.gpu_id) for slot in self.gpu_slots)
+            raise ValueError(f"GPU {gpu_id} is not available (serving GPUs: {served})")
+
+        assigned = assigned or {}
+        return min(self.gpu_slots, key=lambda slot: slot.load + assigned.get(slot.device, 0))
+
+    def get_status(self, loaded_devices: List[str]) -> List[DeviceStatus]:
+        """
+        Get queue depth and utilization of every device.
+
+        Args:
+            loaded_devices: Devices with a loaded pipeline replica
+
+        Returns:
+            List[DeviceStatus]: Status of each device
+        """
+        return [
+            DeviceStatus(
+                device=slot.device,
+                gpu_id=slot.gpu_id,
+                queued_tasks=len(slot.pending),
+                queued_images=sum(task.batch_size for task in slot.pending),
+                active_batches=slot.active_batches,
+                completed_images=slot.completed_images,
+                utilization_percent=slot.utilization() * 100,
+                replica_loaded=slot.device in loaded_devices
+            )
+            for slot in self.slots
+        ]
+
+
+# Global singleton instance
+_device_pool = DevicePool()
+
+
+def get_device_pool() -> DevicePool:
+    """Get the global device pool instance."""
+    return _device_pool
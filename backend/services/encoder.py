@@ -0,0 +1,148 @@
+"""
+Image encoding service.
+Compresses rendered images and writes them to disk in a process pool,
+so encoding overlaps with the next inference instead of blocking it.
+"""
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from backend.models.config import Config
+from backend.models.schemas import ImageFormat, OutputOptions
+from backend.services.image_store import get_image_store
+
+FILE_EXTENSIONS = {
+    ImageFormat.PNG: "png",
+    ImageFormat.WEBP: "webp",
+    ImageFormat.JPEG: "jpg",
+}
+
+
+def encode_image(image, path: str, options: OutputOptions) -> Tuple[str, int, float]:
+    """
+    Encode an image and write it to disk.
+
+    Runs in a worker process. The file is hashed as it is encoded, so it
+    can be committed to the image store under its content address.
+
+    Args:
+        image: PIL image to encode
+        path: Destination file path
+        options: Output format and compression settings
+
+    Returns:
+        Tuple[str, int, float]: Hex SHA-256 of the file, bytes written and encode time in milliseconds
+    """
+    start_time = time.perf_counter()
+    buffer = io.BytesIO()
+
+    if options.output_format == ImageFormat.PNG:
+        image.save(buffer, format="PNG", compress_level=options.png_compress_level)
+    elif options.output_format == ImageFormat.WEBP:
+        image.save(buffer, format="WEBP", lossless=options.webp_lossless, quality=options.quality)
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=options.quality)
+
+    data = buffer.getbuffer()
+    digest = hashlib.sha256(data).hexdigest()
+    with open(path, "wb") as f:
+        f.write(data)
+    encode_time = (time.perf_counter() - start_time) * 1000  # Convert to ms
+    return digest, len(data), encode_time
+
+
+def save_image(image, options: OutputOptions) -> Tuple[str, int, float]:
+    """
+    Encode an image in this process and commit it to the image store.
+
+    Args:
+        image: PIL image to encode
+        options: Output format and compression settings
+
+    Returns:
+        Tuple[str, int, float]: File name, bytes on disk and encode time in ms
+    """
+    extension = FILE_EXTENSIONS[options.output_format]
+    image_store = get_image_store()
+    incoming = image_store.incoming_path(extension)
+    digest, size_bytes, encode_time = encode_image(image, str(incoming), options)
+    return image_store.commit(incoming, digest, extension), size_bytes, encode_time
+
+
+class ImageEncoder:
+    """Process pool that encodes and saves rendered images."""
+
+    def __init__(self, max_workers: int):
+        """
+        Initialize the encoder.
+
+        Args:
+            max_workers: Number of encoding processes
+        """
+        self._max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the process pool on first use."""
+        if self._executor is None:
+            # spawn keeps CUDA state of the parent out of the workers
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def save(self, image, options: OutputOptions, image_id: Optional[str] = None) -> Tuple[str, str, int, float]:
+        """
+        Encode and save an image without blocking the event loop.
+
+        Args:
+            image: PIL image to encode
+            options: Output format and compression settings
+            image_id: Image ID, generated when omitted
+
+        Returns:
+            Tuple[str, str, int, float]: Image ID, file name, bytes on disk and encode time in ms
+        """
+        image_id = image_id or str(uuid.uuid4())
+        extension = FILE_EXTENSIONS[options.output_format]
+        image_store = get_image_store()
+        incoming = image_store.incoming_path(extension)
+
+        digest, size_bytes, encode_time = await self.run(encode_image, image, str(incoming), options)
+        filename = image_store.commit(incoming, digest, extension)
+        return image_id, filename, size_bytes, encode_time
+
+    async def run(self, func: Callable, *args):
+        """
+        Run a picklable function in the encoding processes.
+
+        Args:
+            func: Module-level function
+            *args: Arguments of the function
+
+        Returns:
+            The function result
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def shutdown(self):
+        """Stop the encoding processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global singleton instance
+_encoder = ImageEncoder(max_workers=Config.ENCODE_WORKERS)
+
+
+def get_encoder() -> ImageEncoder:
+    """Get the global image encoder instance."""
+    return _encoder
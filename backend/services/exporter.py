@@ -0,0 +1,98 @@
+"""
+History export.
+Streams saved images as a ZIP archive straight from disk, without
+temporary files and without holding whole images in memory.
+"""
+from datetime import datetime
+from typing import Iterator, List
+import json
+import logging
+import os
+import zipfile
+
+from backend.models.schemas import ImageInfo
+from backend.services.image_store import download_name, get_image_store
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "manifest.json"
+
+
+class _ChunkSink:
+    """Write-only, unseekable file that hands out what was written since the last drain.
+
+    zipfile falls back to data descriptors after each entry when it cannot
+    seek back to fill in the local header.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(images: List[ImageInfo], include_manifest: bool = True) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive of images.
+
+    Entries are stored rather than deflated, since the images are already
+    compressed. Images whose file is missing are skipped and listed in the
+    manifest.
+
+    Args:
+        images: Records of the images to export, in archive order
+        include_manifest: Whether to add a manifest.json with the record of every image
+
+    Yields:
+        bytes: Consecutive parts of the archive
+    """
+    image_store = get_image_store()
+    sink = _ChunkSink()
+    exported = []
+    missing = []
+    total_bytes = 0
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for image in images:
+            try:
+                f = open(image_store.path(image.filename), "rb")
+            except FileNotFoundError:
+                missing.append(image.id)
+                continue
+
+            with f:
+                info = zipfile.ZipInfo(download_name(image), date_time=image.created_at.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                # A known size lets zipfile decide on ZIP64 up front
+                info.file_size = os.fstat(f.fileno()).st_size
+                with archive.open(info, "w") as entry:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        entry.write(chunk)
+                        total_bytes += len(chunk)
+                        yield sink.drain()
+
+            exported.append({**image.model_dump(mode="json"), "archive_name": info.filename})
+            yield sink.drain()
+
+        if include_manifest:
+            manifest = {
+                "exported_at": datetime.now().isoformat(),
+                "count": len(exported),
+                "images": exported,
+                "missing": missing,
+            }
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    yield sink.drain()
+    logger.info(f"Exported {len(exported)} image(s), {total_bytes / 1024 / 1024:.1f}MB")
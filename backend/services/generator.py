@@ -1,103 +1,170 @@
 """
-Image generation service for Z-Image.
-Wraps the Z-Image Pipeline for async task execution.
+Image generation service.
+Defines the generator backend interface and selects the backend: Z-Image,
+or a miniature or synthetic generator for load tests. Backends are imported
+on selection, so the synthetic one runs without torch or diffusers.
 """
-import torch
-from diffusers import ZImagePipeline
-from pathlib import Path
+from PIL import Image
+from dataclasses import dataclass
 import time
-from typing import Optional, Callable
+import random
+from typing import Optional, Callable, Dict, List, Tuple
 from datetime import datetime
 import uuid
-import json
+import logging
 
 from backend.models.config import Config
-from backend.models.schemas import ImageInfo
-
-
-class ImageGenerator:
-    """Singleton class for Z-Image model loading and inference."""
-
-    _instance = None
-    _model_loaded = False
-    _pipeline: Optional[ZImagePipeline] = None
-    _device: str = "cpu"
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self):
-        """Initialize the generator (singleton pattern)."""
-        if not self._model_loaded:
-            pass  # Lazy loading
-
-    def _load_model(self, use_gpu: bool = True, progress_callback: Optional[Callable[[str, int], None]] = None):
-        """Load the Z-Image model if not already loaded."""
-        if self._model_loaded and self._pipeline is not None:
-            # Check if we need to switch device
-            target_device = "cuda" if use_gpu and torch.cuda.is_available() else "cpu"
-            if self._device != target_device:
-                progress_callback(f"Switching to {target_device}...", 5) if progress_callback else None
-                target_dtype = torch.bfloat16 if target_device == "cuda" else torch.float32
-                self._pipeline.to(target_device, dtype=target_dtype)
-                self._device = target_device
-            return
+from backend.models.schemas import ImageInfo, OutputOptions, StageTimings, StartupPhase
+from backend.services import tracing
+from backend.services.encoder import save_image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RenderedImage:
+    """An image produced by the pipeline that has not been saved yet."""
+    image: Image.Image
+    prompt: str
+    negative_prompt: Optional[str]
+    seed: int
+    width: int
+    height: int
+    num_inference_steps: int
+    guidance_scale: float
+    use_gpu: bool
+    generation_time_ms: float
+    stages: Optional[StageTimings] = None
+    model: Optional[str] = None
+    precision: Optional[str] = None
+
+    def to_image_info(
+        self,
+        image_id: str,
+        filename: str,
+        size_bytes: int,
+        encode_time_ms: float,
+        output: OutputOptions,
+        stages: Optional[StageTimings] = None
+    ) -> ImageInfo:
+        """Describe the image once it has been saved, with stages replacing the render stages when given."""
+        return ImageInfo(
+            id=image_id,
+            filename=filename,
+            prompt=self.prompt,
+            negative_prompt=self.negative_prompt,
+            width=self.width,
+            height=self.height,
+            num_inference_steps=self.num_inference_steps,
+            use_gpu=self.use_gpu,
+            seed=self.seed,
+            guidance_scale=self.guidance_scale,
+            size_bytes=size_bytes,
+            format=output.output_format,
+            created_at=datetime.now(),
+            generation_time_ms=self.generation_time_ms,
+            encode_time_ms=encode_time_ms,
+            quality=output.quality,
+            webp_lossless=output.webp_lossless,
+            model=self.model,
+            precision=self.precision,
+            stages=stages or self.stages
+        )
+
+
+class GeneratorBackend:
+    """Interface of an image generation backend.
+
+    The task manager renders batches with generate_batch and encodes them
+    itself; generate renders and saves in one call. A backend keeps one
+    replica per device, loaded on first use or by the preloader. Subclasses
+    keep the phases of their replica loads in _load_timings.
+    """
+
+    name = "none"
+    # Identifies the weights images are rendered with, part of the result cache key
+    model_name = "none"
+    _load_timings: List[StartupPhase]
+
+    @staticmethod
+    def resolve_device(use_gpu: bool = True, gpu_id: int = 0) -> str:
+        """Get the torch device string for a request, the CPU without torch or CUDA."""
+        try:
+            import torch
+        except ImportError:
+            return "cpu"
+        if use_gpu and torch.cuda.is_available():
+            return f"cuda:{gpu_id}"
+        return "cpu"
+
+    def loaded_devices(self) -> List[str]:
+        """Get the devices that have a loaded replica."""
+        raise NotImplementedError
+
+    def load_timings(self) -> List[StartupPhase]:
+        """Get the duration of every phase of the replica loads so far."""
+        return list(self._load_timings)
+
+    def _record_phase(self, device: str, phase: str, start_time: float) -> float:
+        """Record a load phase that started at start_time and return the current time."""
+        now = time.perf_counter()
+        self._load_timings.append(
+            StartupPhase(device=device, phase=phase, duration_ms=(now - start_time) * 1000)
+        )
+        logger.info(f"{phase} on {device} took {now - start_time:.2f}s")
+        return now
+
+    def load(self, device: str):
+        """
+        Load the replica of a device ahead of its first request.
 
-        if progress_callback:
-            progress_callback("Loading Z-Image model...", 0)
+        Args:
+            device: Torch device string
+        """
+        raise NotImplementedError
 
-        # Determine device
-        use_cuda = use_gpu and torch.cuda.is_available()
-        self._device = "cuda" if use_cuda else "cpu"
-        dtype = torch.bfloat16 if use_cuda else torch.float32
+    def unload(self, device: str):
+        """
+        Drop the replica of a device, it is loaded again on next use.
 
-        # Load pipeline
-        try:
-            self._pipeline = ZImagePipeline.from_pretrained(
-                Config.MODEL_NAME,
-                torch_dtype=dtype,
-                low_cpu_mem_usage=False,
-                local_files_only=True,  # 使用本地已下载的模型，避免网络检查
-            )
+        Args:
+            device: Torch device string
+        """
+        raise NotImplementedError
 
-            if progress_callback:
-                progress_callback(f"Model loaded on {self._device}", 10)
-
-            # Move to device with correct dtype
-            self._pipeline.to(self._device, dtype=dtype)
-
-            # 启用性能优化
-            if use_cuda:
-                # 尝试使用 Flash Attention，如果不可用则使用 native 后端
-                try:
-                    self._pipeline.transformer.set_attention_backend("flash")
-                    if progress_callback:
-                        progress_callback("Flash Attention enabled", 15)
-                except Exception as e:
-                    # Flash Attention 不可用，使用 native 后端（PyTorch 原生优化）
-                    try:
-                        self._pipeline.transformer.set_attention_backend("native")
-                        if progress_callback:
-                            progress_callback("Native attention enabled", 15)
-                    except Exception as e2:
-                        if progress_callback:
-                            progress_callback(f"Attention backend not available: {str(e2)}", 15)
-
-                # 启用内存优化
-                self._pipeline.enable_attention_slicing()
-                if progress_callback:
-                    progress_callback("Attention slicing enabled", 18)
-
-            self._model_loaded = True
-            if progress_callback:
-                progress_callback("Model ready", 20)
+    def memory_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Get the allocated and reserved bytes of every CUDA device with a loaded replica."""
+        return {}
 
-        except Exception as e:
-            if progress_callback:
-                progress_callback(f"Model loading failed: {str(e)}", 0)
-            raise RuntimeError(f"Failed to load model: {str(e)}")
+    def precision(self, device: str) -> Optional[str]:
+        """Get the precision the replica of a device runs at, None if not loaded."""
+        return None
+
+    def target_precision(self, device: str) -> str:
+        """Get the precision the replica of a device runs at, or will run at once loaded."""
+        return self.precision(device) or "none"
+
+    def warmup(self, device: str, height: int, width: int, num_inference_steps: int):
+        """
+        Render a throwaway image so kernels are compiled and autotuned before real traffic.
+
+        Args:
+            device: Torch device string
+            height: Image height in pixels
+            width: Image width in pixels
+            num_inference_steps: Number of inference steps
+        """
+        start_time = time.perf_counter()
+        self.generate_batch(
+            prompts=["warmup"],
+            negative_prompts=[None],
+            seeds=[0],
+            height=height,
+            width=width,
+            num_inference_steps=num_inference_steps,
+            device=device
+        )
+        self._record_phase(device, f"warmup {width}x{height}", start_time)
 
     def generate(
         self,
@@ -111,10 +178,14 @@ class ImageGenerator:
         batch_size: int = 1,
         gpu_id: int = 0,
         guidance_scale: float = 0.0,
-        progress_callback: Optional[Callable[[str, int], None]] = None
-    ) -> ImageInfo:
+        progress_callback: Optional[Callable[..., None]] = None,
+        output: Optional[OutputOptions] = None
+    ) -> List[ImageInfo]:
         """
-        Generate an image from the given prompt.
+        Generate images from the given prompt and save them.
+
+        Images are encoded on the calling thread; the task manager uses
+        generate_batch and encodes in the encoder process pool instead.
 
         Args:
             prompt: Text prompt for image generation
@@ -127,112 +198,111 @@ class ImageGenerator:
             batch_size: Number of images to generate
             gpu_id: GPU device ID
             guidance_scale: Guidance scale for CFG
-            progress_callback: Callback function for progress updates (message, progress_percent)
+            progress_callback: Callback function for progress updates (message, progress_percent[, current_step])
+            output: Output format and compression settings
 
         Returns:
-            ImageInfo: Information about the generated image
+            List[ImageInfo]: Information about every generated image
         """
-        # Load model if not loaded
-        self._load_model(use_gpu, progress_callback)
+        output = output or OutputOptions()
 
-        # Set GPU device if specified
-        if use_gpu and torch.cuda.is_available():
-            device = f"cuda:{gpu_id}"
-            if progress_callback:
-                progress_callback(f"Using GPU device: {device}", 25)
-        else:
-            device = self._device
-
-        if progress_callback:
-            progress_callback("Starting image generation...", 30)
-
-        # Generate seed if not provided
+        # Each image of the batch gets its own consecutive seed
         if seed is None:
-            seed = torch.randint(0, 2**32, (1,), device=device).item()
-
-        # Adjust height/width for CPU mode to speed up
-        if self._device == "cpu":
-            height = min(height, 512)
-            width = min(width, 512)
-            if progress_callback:
-                progress_callback(f"Adjusted resolution for CPU: {width}x{height}", 35)
-
-        # Create generator
-        generator = torch.Generator(device).manual_seed(seed)
-
-        # Start timing
-        start_time = time.time()
-
-        # Generate image(s)
-        try:
-            result = self._pipeline(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                height=height,
-                width=width,
-                num_inference_steps=num_inference_steps,
-                guidance_scale=guidance_scale,
-                generator=generator,
-                num_images_per_prompt=batch_size,
-            ).images
-
-            # Calculate generation time
-            generation_time = (time.time() - start_time) * 1000  # Convert to ms
-
-            if progress_callback:
-                progress_callback(f"{len(result)} image(s) generated successfully", 90)
-
-        except Exception as e:
-            if progress_callback:
-                progress_callback(f"Generation failed: {str(e)}", 0)
-            raise RuntimeError(f"Failed to generate image: {str(e)}")
-
-        # Save images - return the first one for compatibility
-        # For now, we save all images but only return the first one
-        # In the future, we can update the API to return multiple images
+            seed = random.randrange(2**32)
+        trace = tracing.new_trace(self.resolve_device(use_gpu, gpu_id))
+        rendered_images = self.generate_batch(
+            prompts=[prompt] * batch_size,
+            negative_prompts=[negative_prompt] * batch_size,
+            seeds=[(seed + idx) % 2**32 for idx in range(batch_size)],
+            height=height,
+            width=width,
+            num_inference_steps=num_inference_steps,
+            use_gpu=use_gpu,
+            gpu_id=gpu_id,
+            guidance_scale=guidance_scale,
+            progress_callback=progress_callback,
+            trace=trace
+        )
+
+        # Save images
         image_info_list = []
-        for idx, image in enumerate(result):
-            image_id = str(uuid.uuid4())
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{timestamp}_{image_id}.png"
-            image_path = Config.IMAGES_DIR / filename
-
+        for idx, rendered in enumerate(rendered_images):
             if progress_callback:
-                progress_callback(f"Saving image {idx + 1}/{len(result)}...", 90 + idx * 5 // len(result))
-
-            image.save(image_path)
-
-            # Get file size
-            size_bytes = image_path.stat().st_size
-
-            # Create image info
-            image_info = ImageInfo(
-                id=image_id,
-                filename=filename,
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                width=width,
-                height=height,
-                num_inference_steps=num_inference_steps,
-                use_gpu=use_gpu,
-                seed=seed,
-                size_bytes=size_bytes,
-                created_at=datetime.now(),
-                generation_time_ms=generation_time
-            )
-            image_info_list.append(image_info)
+                progress_callback(f"Saving image {idx + 1}/{len(rendered_images)}...", 90 + idx * 5 // len(rendered_images))
 
+            image_id = str(uuid.uuid4())
+            save_start = time.perf_counter()
+            filename, size_bytes, encode_time = save_image(rendered.image, output)
+            save_end = time.perf_counter()
+            trace.add("save", save_start, save_end, image_id=image_id)
+            stages = rendered.stages.model_copy(update={"save_ms": (save_end - save_start) * 1000})
+            image_info_list.append(rendered.to_image_info(image_id, filename, size_bytes, encode_time, output, stages))
+
+        if trace.sampled:
+            trace.dump(Config.TRACES_DIR)
         if progress_callback:
             progress_callback("Complete", 100)
 
-        # Return the first image for now (API needs to be updated to support multiple images)
-        return image_info_list[0] if image_info_list else None
+        return image_info_list
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[Optional[int]],
+        height: int = 1024,
+        width: int = 1024,
+        num_inference_steps: int = 9,
+        use_gpu: bool = True,
+        gpu_id: int = 0,
+        guidance_scale: float = 0.0,
+        progress_callback: Optional[Callable[..., None]] = None,
+        device: Optional[str] = None,
+        trace: Optional[tracing.Trace] = None
+    ) -> List[RenderedImage]:
+        """Generate one image per prompt in a single call, without saving."""
+        raise NotImplementedError
+
+
+GENERATOR_BACKENDS = ("zimage", "tiny", "synthetic")
+
+
+def create_generator(kind: Optional[str] = None) -> GeneratorBackend:
+    """
+    Create the generator backend.
+
+    Args:
+        kind: One of GENERATOR_BACKENDS, Config.GENERATOR_BACKEND when omitted
+
+    Returns:
+        GeneratorBackend: The backend
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    kind = (kind or Config.GENERATOR_BACKEND).lower()
+    if kind == "zimage":
+        from backend.services.zimage_generator import ImageGenerator
+        return ImageGenerator()
+    if kind == "tiny":
+        from backend.services.zimage_generator import TinyImageGenerator
+        return TinyImageGenerator()
+    if kind == "synthetic":
+        from backend.services.synthetic_generator import SyntheticGenerator
+        return SyntheticGenerator(
+            load_ms=Config.SYNTHETIC_LOAD_MS,
+            step_ms=Config.SYNTHETIC_STEP_MS,
+            jitter=Config.SYNTHETIC_JITTER,
+            failure_rate=Config.SYNTHETIC_FAILURE_RATE
+        )
+    raise ValueError(f"GENERATOR_BACKEND must be one of {', '.join(GENERATOR_BACKENDS)}, got {kind!r}")
 
 
 # Global singleton instance
-_generator = ImageGenerator()
+_generator = create_generator()
+logger.info(f"Generator backend: {_generator.name}")
 
 
-def get_generator() -> ImageGenerator:
+def get_generator() -> GeneratorBackend:
     """Get the global generator instance."""
     return _generator
\ No newline at end of file
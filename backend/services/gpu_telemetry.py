@@ -0,0 +1,206 @@
+"""
+GPU telemetry.
+Reads the state of every GPU in process, through NVML when its bindings
+are installed and through torch.cuda otherwise, without spawning
+nvidia-smi.
+"""
+import sys
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import GPUInfo
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+def _process_memory() -> Dict[int, Tuple[float, float, float]]:
+    """
+    Get the caching allocator memory of this process by CUDA device index.
+
+    torch is only used when something else imported it and CUDA is already
+    initialized, so monitoring never creates CUDA contexts of its own.
+
+    Returns:
+        Dict[int, Tuple[float, float, float]]: Allocated, reserved and peak allocated GB
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return {}
+    memory = {}
+    for index in range(torch.cuda.device_count()):
+        stats = torch.cuda.memory_stats(index)
+        memory[index] = (
+            stats.get("allocated_bytes.all.current", 0) / GB,
+            stats.get("reserved_bytes.all.current", 0) / GB,
+            stats.get("allocated_bytes.all.peak", 0) / GB,
+        )
+    return memory
+
+
+def _cuda_uuids() -> Dict[str, int]:
+    """Get the CUDA device index of every GPU visible to torch, by UUID."""
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return {}
+    uuids = {}
+    for index in range(torch.cuda.device_count()):
+        uuid = getattr(torch.cuda.get_device_properties(index), "uuid", None)
+        if uuid is not None:
+            uuids[str(uuid)] = index
+    return uuids
+
+
+class GPUProvider:
+    """Source of GPU telemetry. Provides no devices, as on a machine without GPUs."""
+
+    name = "none"
+
+    def devices(self) -> List[GPUInfo]:
+        """Get the state of every GPU."""
+        return []
+
+    def close(self):
+        """Release the resources of the provider."""
+
+
+class NVMLProvider(GPUProvider):
+    """GPU telemetry from NVML, with device handles opened once.
+
+    Devices are reported in NVML order, which is the PCI bus order of
+    nvidia-smi; the allocator memory of this process is matched to them by
+    UUID since the CUDA order can differ.
+    """
+
+    name = "nvml"
+
+    def __init__(self):
+        """
+        Initialize NVML and open a handle per device.
+
+        Raises:
+            ImportError: If the NVML bindings are not installed
+            Exception: If NVML cannot be initialized, e.g. without a driver
+        """
+        import pynvml
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self._handles = [pynvml.nvmlDeviceGetHandleByIndex(idx) for idx in range(pynvml.nvmlDeviceGetCount())]
+        self._names = [self._decode(pynvml.nvmlDeviceGetName(handle)) for handle in self._handles]
+        self._uuids = [self._decode(pynvml.nvmlDeviceGetUUID(handle)) for handle in self._handles]
+
+    @staticmethod
+    def _decode(value) -> str:
+        """Older bindings return bytes."""
+        return value.decode() if isinstance(value, bytes) else value
+
+    def devices(self) -> List[GPUInfo]:
+        nvml = self._nvml
+        process_memory = _process_memory()
+        cuda_indices = _cuda_uuids()
+
+        devices = []
+        for idx, handle in enumerate(self._handles):
+            memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+            try:
+                usage = float(nvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+            except nvml.NVMLError:
+                usage = None
+            try:
+                temperature = float(nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU))
+            except nvml.NVMLError:
+                temperature = None
+
+            cuda_index = cuda_indices.get(self._uuids[idx].removeprefix("GPU-"))
+            allocated, reserved, peak = process_memory.get(cuda_index, (None, None, None))
+            devices.append(GPUInfo(
+                available=True,
+                index=idx,
+                name=self._names[idx],
+                memory_total_gb=memory.total / GB,
+                memory_used_gb=memory.used / GB,
+                usage_percent=usage,
+                temperature=temperature,
+                process_allocated_gb=allocated,
+                process_reserved_gb=reserved,
+                process_peak_gb=peak
+            ))
+        return devices
+
+    def close(self):
+        try:
+            self._nvml.nvmlShutdown()
+        except Exception as e:
+            logger.debug(f"Error shutting down NVML: {e}")
+
+
+class TorchCudaProvider(GPUProvider):
+    """GPU telemetry from torch.cuda, for machines without the NVML bindings.
+
+    Only memory is known: the total of each device and what the caching
+    allocator of this process holds. Utilization and temperature are not
+    reported.
+    """
+
+    name = "torch"
+
+    def __init__(self):
+        """
+        Read the properties of every CUDA device.
+
+        Raises:
+            RuntimeError: If CUDA is not available
+        """
+        import torch
+        if not torch.cuda.is_available():
+            raise RuntimeError("CUDA is not available")
+        self._properties = [torch.cuda.get_device_properties(idx) for idx in range(torch.cuda.device_count())]
+
+    def devices(self) -> List[GPUInfo]:
+        process_memory = _process_memory()
+        devices = []
+        for idx, properties in enumerate(self._properties):
+            allocated, reserved, peak = process_memory.get(idx, (None, None, None))
+            devices.append(GPUInfo(
+                available=True,
+                index=idx,
+                name=properties.name,
+                memory_total_gb=properties.total_memory / GB,
+                memory_used_gb=reserved,
+                process_allocated_gb=allocated,
+                process_reserved_gb=reserved,
+                process_peak_gb=peak
+            ))
+        return devices
+
+
+def create_gpu_provider(kind: Optional[str] = None) -> GPUProvider:
+    """
+    Create the GPU telemetry provider.
+
+    Args:
+        kind: "nvml", "torch", "off" or "auto" (NVML, then torch.cuda, then
+            none), Config.GPU_TELEMETRY when omitted
+
+    Returns:
+        GPUProvider: The first provider that could be initialized
+    """
+    kind = (kind or Config.GPU_TELEMETRY).lower()
+    if kind == "off":
+        return GPUProvider()
+
+    candidates = {"nvml": [NVMLProvider], "torch": [TorchCudaProvider]}.get(kind, [NVMLProvider, TorchCudaProvider])
+    for candidate in candidates:
+        try:
+            provider = candidate()
+            logger.info(f"GPU telemetry from {provider.name}, {len(provider.devices())} device(s)")
+            return provider
+        except ImportError:
+            logger.debug(f"{candidate.name} bindings not installed, skipping")
+        except Exception as e:
+            logger.debug(f"{candidate.name} GPU telemetry unavailable: {e}")
+
+    logger.info("No GPU telemetry available")
+    return GPUProvider()
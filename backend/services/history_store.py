@@ -0,0 +1,804 @@
+"""
+Image history storage.
+Pluggable backends for the records of generated images: the original
+history.json file, an indexed SQLite database and an in-memory index
+persisted as a journal.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import base64
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from backend.models.config import Config
+from backend.models.schemas import HistoryFilter, ImageInfo
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BACKENDS = ("json", "sqlite", "journal")
+
+# (created_at sort key, id) of the last image of a page; the next page starts right after it
+Cursor = Tuple[str, str]
+
+# Latin words and digits are tokens, every other letter (CJK) is a token of its own
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^\W\da-z_]")
+
+
+def _sort_key(created_at: datetime) -> str:
+    """Format a timestamp so that string order is chronological order."""
+    if created_at.tzinfo is not None:
+        # Records are stored in naive local time
+        created_at = created_at.astimezone().replace(tzinfo=None)
+    return created_at.isoformat(sep=" ", timespec="microseconds")
+
+
+def _entry(image: ImageInfo) -> Cursor:
+    """Get the position of an image in newest-first order."""
+    return _sort_key(image.created_at), image.id
+
+
+def encode_cursor(image: ImageInfo) -> str:
+    """Build the cursor of the page that follows an image."""
+    raw = "|".join(_entry(image))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Parse a cursor built by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode('utf-8')
+        created_at, image_id = raw.split("|", 1)
+        datetime.fromisoformat(created_at)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, image_id
+
+
+def _search_terms(filters: Optional[HistoryFilter]) -> List[str]:
+    """Get the lowercase words of a prompt search."""
+    if filters is None or not filters.q:
+        return []
+    return filters.q.lower().split()
+
+
+def _has_filters(filters: Optional[HistoryFilter]) -> bool:
+    """Whether a filter restricts anything."""
+    return filters is not None and any(value is not None for value in filters.model_dump().values())
+
+
+def matches(image: ImageInfo, filters: Optional[HistoryFilter]) -> bool:
+    """Check an image against every set filter."""
+    if filters is None:
+        return True
+    for field in ("width", "height", "num_inference_steps", "seed", "use_gpu"):
+        value = getattr(filters, field)
+        if value is not None and getattr(image, field) != value:
+            return False
+    if filters.created_after is not None and _sort_key(image.created_at) < _sort_key(filters.created_after):
+        return False
+    if filters.created_before is not None and _sort_key(image.created_at) >= _sort_key(filters.created_before):
+        return False
+    prompt = image.prompt.lower()
+    return all(term in prompt for term in _search_terms(filters))
+
+
+class HistoryStore(ABC):
+    """Storage of image records, newest first in every listing."""
+
+    @abstractmethod
+    def add(self, images: List[ImageInfo]):
+        """Add image records in a single write, replacing records with the same ID."""
+
+    @abstractmethod
+    def get(self, image_id: str) -> Optional[ImageInfo]:
+        """Get an image record by ID, None if it does not exist."""
+
+    def get_many(self, image_ids: List[str]) -> List[ImageInfo]:
+        """Get the image records of several IDs in the given order, skipping unknown IDs."""
+        return [image for image in map(self.get, image_ids) if image is not None]
+
+    @abstractmethod
+    def query(
+        self,
+        filters: Optional[HistoryFilter] = None,
+        limit: int = 20,
+        cursor: Optional[Cursor] = None,
+        offset: int = 0
+    ) -> List[ImageInfo]:
+        """
+        Get a page of the image records that match the filters, newest first.
+
+        Args:
+            filters: Filters the records must match
+            limit: Maximum number of records
+            cursor: Only return records after this position (keyset pagination)
+            offset: Records to skip, for page-number pagination
+
+        Returns:
+            List[ImageInfo]: Matching records
+        """
+
+    @abstractmethod
+    def count(self, filters: Optional[HistoryFilter] = None) -> int:
+        """Get the number of image records that match the filters."""
+
+    @abstractmethod
+    def all_images(self) -> List[ImageInfo]:
+        """Get every image record, oldest first."""
+
+    @abstractmethod
+    def total_bytes(self) -> int:
+        """Get the summed size of the image files of the records, a file shared by several records counted once."""
+
+    @abstractmethod
+    def expired(self, cutoff: datetime, keep: int, max_bytes: int = 0) -> List[ImageInfo]:
+        """
+        Get the records that fall outside the retention limits.
+
+        Records expire oldest first, so the result is always the oldest part
+        of the history.
+
+        Args:
+            cutoff: Records created before this are expired
+            keep: Only the newest `keep` records are kept
+            max_bytes: Only the newest records whose files add up to at most this are kept, 0 for no limit;
+                a file shared by several records is counted once
+
+        Returns:
+            List[ImageInfo]: Expired records, oldest first
+        """
+
+    @abstractmethod
+    def delete(self, image_ids: List[str]) -> List[ImageInfo]:
+        """Delete image records and return the ones that existed."""
+
+    def list_images(self, offset: int = 0, limit: int = 20) -> List[ImageInfo]:
+        """Get a page of image records, newest first."""
+        return self.query(limit=limit, offset=offset)
+
+    def latest(self) -> Optional[ImageInfo]:
+        """Get the newest image record."""
+        images = self.list_images(0, 1)
+        return images[0] if images else None
+
+    def close(self):
+        """Release the resources of the store."""
+
+
+class JSONHistoryStore(HistoryStore):
+    """History kept in a single JSON file, rewritten on every change."""
+
+    def __init__(self, path: Path):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the history file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if not self.path.exists():
+            self.path.write_text('{"images": []}', encoding='utf-8')
+
+    def _read(self) -> List[dict]:
+        """Read every record of the file."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('images', [])
+
+    def _write(self, records: List[dict]):
+        """Replace the file with the given records."""
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"images": records}, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _images(self) -> List[ImageInfo]:
+        """Read every record, newest first."""
+        images = [ImageInfo(**record) for record in self._read()]
+        images.sort(key=_entry, reverse=True)
+        return images
+
+    def add(self, images: List[ImageInfo]):
+        ids = {image.id for image in images}
+        with self._lock:
+            records = [record for record in self._read() if record['id'] not in ids]
+            records.extend(image.model_dump(mode="json") for image in images)
+            self._write(records)
+
+    def get(self, image_id: str) -> Optional[ImageInfo]:
+        record = next((record for record in self._read() if record['id'] == image_id), None)
+        return ImageInfo(**record) if record is not None else None
+
+    def get_many(self, image_ids: List[str]) -> List[ImageInfo]:
+        records = {record['id']: record for record in self._read()}
+        return [ImageInfo(**records[image_id]) for image_id in image_ids if image_id in records]
+
+    def query(
+        self,
+        filters: Optional[HistoryFilter] = None,
+        limit: int = 20,
+        cursor: Optional[Cursor] = None,
+        offset: int = 0
+    ) -> List[ImageInfo]:
+        images = [
+            image for image in self._images()
+            if matches(image, filters) and (cursor is None or _entry(image) < cursor)
+        ]
+        return images[offset:offset + limit]
+
+    def count(self, filters: Optional[HistoryFilter] = None) -> int:
+        if not _has_filters(filters):
+            return len(self._read())
+        return sum(matches(image, filters) for image in self._images())
+
+    def all_images(self) -> List[ImageInfo]:
+        return self._images()[::-1]
+
+    def total_bytes(self) -> int:
+        sizes = {record.get('filename'): record.get('size_bytes', 0) for record in self._read()}
+        return sum(sizes.values())
+
+    def expired(self, cutoff: datetime, keep: int, max_bytes: int = 0) -> List[ImageInfo]:
+        expired = []
+        newer_bytes = 0
+        newer_files = set()
+        for idx, image in enumerate(self._images()):
+            if image.filename not in newer_files:
+                newer_files.add(image.filename)
+                newer_bytes += image.size_bytes
+            if idx >= keep or image.created_at < cutoff or (max_bytes > 0 and newer_bytes > max_bytes):
+                expired.append(image)
+        return expired[::-1]
+
+    def delete(self, image_ids: List[str]) -> List[ImageInfo]:
+        ids = set(image_ids)
+        with self._lock:
+            records = self._read()
+            deleted = [ImageInfo(**record) for record in records if record['id'] in ids]
+            if deleted:
+                self._write([record for record in records if record['id'] not in ids])
+        return deleted
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History kept in an SQLite database in WAL mode.
+
+    Records are stored as JSON next to an id primary key and a (created_at, id)
+    index, so lookups and keyset pages do not scale with history size. Prompts
+    are indexed in an FTS5 trigram table kept in sync by triggers; search
+    words shorter than a trigram, or SQLite builds without the trigram
+    tokenizer, fall back to a LIKE scan.
+
+    The FTS table refers to images by rowid, so the database must not be
+    VACUUMed (which may renumber rowids of a table with a TEXT primary key).
+    """
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the database file
+            legacy_json: history.json to import once when the database is empty
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "id TEXT PRIMARY KEY, created_at TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("DROP INDEX IF EXISTS idx_images_created_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_images_created_at_id ON images (created_at, id)")
+        self._conn.commit()
+        self._fts = self._create_fts()
+
+        if legacy_json is not None and legacy_json.exists():
+            self._migrate(legacy_json)
+
+    def _create_fts(self) -> bool:
+        """Create the prompt search index and return whether it is available."""
+        try:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'images_fts'"
+            ).fetchone()
+            with self._conn:
+                if not exists:
+                    self._conn.execute("CREATE VIRTUAL TABLE images_fts USING fts5(prompt, tokenize='trigram')")
+                    self._conn.execute(
+                        "INSERT INTO images_fts (rowid, prompt) "
+                        "SELECT rowid, json_extract(data, '$.prompt') FROM images"
+                    )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN "
+                    "INSERT INTO images_fts (rowid, prompt) VALUES (new.rowid, json_extract(new.data, '$.prompt')); END"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN "
+                    "DELETE FROM images_fts WHERE rowid = old.rowid; END"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF data ON images BEGIN "
+                    "UPDATE images_fts SET prompt = json_extract(new.data, '$.prompt') WHERE rowid = new.rowid; END"
+                )
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite has no FTS5 trigram tokenizer, prompt search falls back to LIKE: {e}")
+            return False
+
+    def _where(self, filters: Optional[HistoryFilter], cursor: Optional[Cursor] = None) -> Tuple[str, list]:
+        """Build the WHERE clause of a query and its parameters."""
+        clauses, params = [], []
+        if filters is not None:
+            for field in ("width", "height", "num_inference_steps", "seed", "use_gpu"):
+                value = getattr(filters, field)
+                if value is not None:
+                    clauses.append(f"json_extract(data, '$.{field}') = ?")
+                    params.append(int(value))
+            if filters.created_after is not None:
+                clauses.append("created_at >= ?")
+                params.append(_sort_key(filters.created_after))
+            if filters.created_before is not None:
+                clauses.append("created_at < ?")
+                params.append(_sort_key(filters.created_before))
+            for term in _search_terms(filters):
+                if self._fts and len(term) >= 3:
+                    clauses.append("rowid IN (SELECT rowid FROM images_fts WHERE images_fts MATCH ?)")
+                    params.append('"' + term.replace('"', '""') + '"')
+                else:
+                    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    clauses.append("lower(json_extract(data, '$.prompt')) LIKE ? ESCAPE '\\'")
+                    params.append(f"%{escaped}%")
+        if cursor is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(cursor)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _migrate(self, legacy_json: Path):
+        """Import the records of history.json, then rename it so it is imported only once."""
+        if self.count() > 0:
+            return
+
+        with open(legacy_json, 'r', encoding='utf-8') as f:
+            records = json.load(f).get('images', [])
+
+        images = []
+        for record in records:
+            try:
+                images.append(ImageInfo(**record))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable history record {record.get('id')}: {e}")
+        self.add(images)
+
+        legacy_json.rename(legacy_json.with_name(legacy_json.name + ".migrated"))
+        logger.info(f"Migrated {len(images)} history record(s) from {legacy_json.name} to SQLite")
+
+    @staticmethod
+    def _row_to_image(row: tuple) -> ImageInfo:
+        """Build an image record from its stored JSON."""
+        return ImageInfo.model_validate_json(row[0])
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a read query."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add(self, images: List[ImageInfo]):
+        rows = [(image.id, _sort_key(image.created_at), image.model_dump_json()) for image in images]
+        with self._lock, self._conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the FTS trigger
+            self._conn.executemany(
+                "INSERT INTO images (id, created_at, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET created_at = excluded.created_at, data = excluded.data",
+                rows
+            )
+
+    def get(self, image_id: str) -> Optional[ImageInfo]:
+        rows = self._query("SELECT data FROM images WHERE id = ?", (image_id,))
+        return self._row_to_image(rows[0]) if rows else None
+
+    def get_many(self, image_ids: List[str]) -> List[ImageInfo]:
+        images = {}
+        # Stay under the bound parameter limit of older SQLite builds
+        for idx in range(0, len(image_ids), 500):
+            chunk = image_ids[idx:idx + 500]
+            rows = self._query(
+                f"SELECT data FROM images WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            )
+            for image in map(self._row_to_image, rows):
+                images[image.id] = image
+        return [images[image_id] for image_id in image_ids if image_id in images]
+
+    def query(
+        self,
+        filters: Optional[HistoryFilter] = None,
+        limit: int = 20,
+        cursor: Optional[Cursor] = None,
+        offset: int = 0
+    ) -> List[ImageInfo]:
+        where, params = self._where(filters, cursor)
+        rows = self._query(
+            f"SELECT data FROM images{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        )
+        return [self._row_to_image(row) for row in rows]
+
+    def count(self, filters: Optional[HistoryFilter] = None) -> int:
+        where, params = self._where(filters)
+        return self._query(f"SELECT COUNT(*) FROM images{where}", tuple(params))[0][0]
+
+    def all_images(self) -> List[ImageInfo]:
+        rows = self._query("SELECT data FROM images ORDER BY created_at, id")
+        return [self._row_to_image(row) for row in rows]
+
+    def total_bytes(self) -> int:
+        return self._query(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM ("
+            "SELECT MAX(json_extract(data, '$.size_bytes')) AS size_bytes FROM images "
+            "GROUP BY json_extract(data, '$.filename'))"
+        )[0][0]
+
+    def expired(self, cutoff: datetime, keep: int, max_bytes: int = 0) -> List[ImageInfo]:
+        # Rank and running size of each record counted from the newest; a file
+        # shared by several records only counts at the newest of them
+        rows = self._query(
+            "SELECT data FROM ("
+            "SELECT data, created_at, id, ROW_NUMBER() OVER newest AS rank, "
+            "SUM(CASE WHEN file_rank = 1 THEN size_bytes ELSE 0 END) OVER newest AS newer_bytes FROM ("
+            "SELECT data, created_at, id, json_extract(data, '$.size_bytes') AS size_bytes, "
+            "ROW_NUMBER() OVER (PARTITION BY json_extract(data, '$.filename') "
+            "ORDER BY created_at DESC, id DESC) AS file_rank FROM images) "
+            "WINDOW newest AS (ORDER BY created_at DESC, id DESC ROWS UNBOUNDED PRECEDING)"
+            ") WHERE created_at < ? OR rank > ? OR (? > 0 AND newer_bytes > ?) "
+            "ORDER BY created_at, id",
+            (_sort_key(cutoff), keep, max_bytes, max_bytes)
+        )
+        return [self._row_to_image(row) for row in rows]
+
+    def delete(self, image_ids: List[str]) -> List[ImageInfo]:
+        deleted = []
+        with self._lock, self._conn:
+            for image_id in image_ids:
+                row = self._conn.execute("SELECT data FROM images WHERE id = ?", (image_id,)).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM images WHERE id = ?", (image_id,))
+                deleted.append(self._row_to_image(row))
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JournalHistoryStore(HistoryStore):
+    """History held in memory, persisted as a snapshot plus an append-only journal.
+
+    The snapshot has the format of history.json. Every change is appended to a
+    line-delimited journal; a background thread periodically folds the journal
+    into a new snapshot, written to a temporary file and renamed into place.
+    Replaying the journal is idempotent, so a crash between the rename and the
+    journal truncation loses nothing.
+
+    Prompts are indexed in an inverted index from token to image ids; a search
+    word matches the ids of every token containing it, and candidates are
+    then checked against the full filter.
+    """
+
+    def __init__(self, snapshot_path: Path, journal_path: Path, compact_interval: float, compact_entries: int):
+        """
+        Initialize the store and load the history.
+
+        Args:
+            snapshot_path: Path of the snapshot file
+            journal_path: Path of the journal file
+            compact_interval: Seconds between compactions of a non-empty journal
+            compact_entries: Journal entries that trigger a compaction right away
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_interval = compact_interval
+        self.compact_entries = compact_entries
+
+        # Single writer: every mutation and compaction step holds the lock
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._records: Dict[str, ImageInfo] = {}
+        # (created_at sort key, id), oldest first
+        self._order: List[Cursor] = []
+        self._postings: Dict[str, Set[str]] = {}
+        # Records referencing each file, and the summed size of the files
+        self._file_refs: Dict[str, int] = {}
+        self._bytes = 0
+        self._journal_entries = 0
+        # Journal lines written while a compaction is in progress
+        self._tail: Optional[List[str]] = None
+
+        self._load()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+        self._stop = threading.Event()
+        self._compact_requested = threading.Event()
+        self._compactor = threading.Thread(target=self._run_compactor, name="history-compaction", daemon=True)
+        self._compactor.start()
+
+    def _load(self):
+        """Load the snapshot and replay the journal."""
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                for record in json.load(f).get('images', []):
+                    self._put(ImageInfo(**record))
+
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-append
+                        logger.warning("Skipping unreadable history journal entry")
+                        continue
+                    if entry['op'] == "add":
+                        self._put(ImageInfo(**entry['image']))
+                    elif entry['op'] == "delete":
+                        self._remove(entry['id'])
+                    self._journal_entries += 1
+
+        logger.info(f"Loaded {len(self._records)} history record(s), {self._journal_entries} journal entries")
+
+    def _put(self, image: ImageInfo):
+        """Insert or replace a record in memory. Caller holds the lock."""
+        self._remove(image.id)
+        self._records[image.id] = image
+        refs = self._file_refs.get(image.filename, 0)
+        if refs == 0:
+            self._bytes += image.size_bytes
+        self._file_refs[image.filename] = refs + 1
+        insort(self._order, _entry(image))
+        for token in set(_TOKEN_PATTERN.findall(image.prompt.lower())):
+            self._postings.setdefault(token, set()).add(image.id)
+
+    def _remove(self, image_id: str) -> Optional[ImageInfo]:
+        """Remove a record from memory. Caller holds the lock."""
+        image = self._records.pop(image_id, None)
+        if image is not None:
+            refs = self._file_refs.pop(image.filename) - 1
+            if refs:
+                self._file_refs[image.filename] = refs
+            else:
+                self._bytes -= image.size_bytes
+            del self._order[bisect_left(self._order, _entry(image))]
+            for token in set(_TOKEN_PATTERN.findall(image.prompt.lower())):
+                postings = self._postings[token]
+                postings.discard(image_id)
+                if not postings:
+                    del self._postings[token]
+        return image
+
+    def _search(self, terms: List[str]) -> Set[str]:
+        """Get the ids of the images whose prompt may contain every term. Caller holds the lock."""
+        candidates: Optional[Set[str]] = None
+        for term in terms:
+            for token in _TOKEN_PATTERN.findall(term):
+                ids = self._postings.get(token, set()).copy()
+                for word, postings in self._postings.items():
+                    if token in word and word != token:
+                        ids |= postings
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+        return candidates if candidates is not None else set(self._records)
+
+    def _newest_first(self, filters: Optional[HistoryFilter], cursor: Optional[Cursor]) -> Iterable[Cursor]:
+        """Iterate the positions that may match, newest first, after the cursor. Caller holds the lock."""
+        terms = _search_terms(filters)
+        if terms:
+            entries = sorted((_entry(self._records[image_id]) for image_id in self._search(terms)), reverse=True)
+            return (entry for entry in entries if cursor is None or entry < cursor)
+        end = bisect_left(self._order, cursor) if cursor is not None else len(self._order)
+        return (self._order[idx] for idx in range(end - 1, -1, -1))
+
+    def _append(self, entries: List[dict]):
+        """Append entries to the journal. Caller holds the lock."""
+        lines = [json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries]
+        self._journal.writelines(lines)
+        self._journal.flush()
+        if self._tail is not None:
+            self._tail.extend(lines)
+        self._journal_entries += len(lines)
+        if self._journal_entries >= self.compact_entries:
+            self._compact_requested.set()
+
+    def add(self, images: List[ImageInfo]):
+        with self._lock:
+            for image in images:
+                self._put(image)
+            self._append([{"op": "add", "image": image.model_dump(mode="json")} for image in images])
+
+    def get(self, image_id: str) -> Optional[ImageInfo]:
+        return self._records.get(image_id)
+
+    def query(
+        self,
+        filters: Optional[HistoryFilter] = None,
+        limit: int = 20,
+        cursor: Optional[Cursor] = None,
+        offset: int = 0
+    ) -> List[ImageInfo]:
+        with self._lock:
+            if not _has_filters(filters):
+                # Unfiltered pages are slices of the ordered sequence
+                end = bisect_left(self._order, cursor) if cursor is not None else len(self._order)
+                end = max(end - offset, 0)
+                page = self._order[max(end - limit, 0):end]
+                return [self._records[image_id] for _, image_id in reversed(page)]
+
+            images = []
+            skipped = 0
+            for _, image_id in self._newest_first(filters, cursor):
+                image = self._records[image_id]
+                if not matches(image, filters):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                images.append(image)
+                if len(images) == limit:
+                    break
+            return images
+
+    def count(self, filters: Optional[HistoryFilter] = None) -> int:
+        if not _has_filters(filters):
+            return len(self._records)
+        with self._lock:
+            return sum(matches(self._records[image_id], filters) for _, image_id in self._newest_first(filters, None))
+
+    def all_images(self) -> List[ImageInfo]:
+        with self._lock:
+            return [self._records[image_id] for _, image_id in self._order]
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def expired(self, cutoff: datetime, keep: int, max_bytes: int = 0) -> List[ImageInfo]:
+        cutoff_key = _sort_key(cutoff)
+        with self._lock:
+            # Older than the cutoff, or older than the newest `keep` records
+            end = max(bisect_left(self._order, (cutoff_key,)), len(self._order) - keep)
+            expired = [self._records[image_id] for _, image_id in self._order[:end]]
+            if max_bytes > 0:
+                # Then the oldest of the rest, up to the newest records whose files fit the budget
+                kept_from = len(self._order)
+                newer_bytes = 0
+                newer_files = set()
+                for idx in range(len(self._order) - 1, end - 1, -1):
+                    image = self._records[self._order[idx][1]]
+                    if image.filename not in newer_files:
+                        newer_files.add(image.filename)
+                        newer_bytes += image.size_bytes
+                    if newer_bytes > max_bytes:
+                        break
+                    kept_from = idx
+                expired.extend(self._records[image_id] for _, image_id in self._order[end:kept_from])
+            return expired
+
+    def delete(self, image_ids: List[str]) -> List[ImageInfo]:
+        with self._lock:
+            deleted = [image for image in map(self._remove, image_ids) if image is not None]
+            if deleted:
+                self._append([{"op": "delete", "id": image.id} for image in deleted])
+        return deleted
+
+    def compact(self):
+        """Write the records to a new snapshot and empty the journal."""
+        with self._compact_lock:
+            with self._lock:
+                if self._journal_entries == 0:
+                    return
+                records = [self._records[image_id].model_dump(mode="json") for _, image_id in self._order]
+                self._tail = []
+
+            try:
+                # The slow part runs without the lock, writers keep appending meanwhile
+                tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"images": records}, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+
+                with self._lock:
+                    # Keep only what was journaled after the snapshot was taken
+                    tmp_journal = self.journal_path.with_suffix(".journal.tmp")
+                    with open(tmp_journal, 'w', encoding='utf-8') as f:
+                        f.writelines(self._tail)
+                    self._journal.close()
+                    os.replace(tmp_journal, self.journal_path)
+                    self._journal = open(self.journal_path, 'a', encoding='utf-8')
+                    self._journal_entries = len(self._tail)
+            finally:
+                self._tail = None
+
+        logger.info(f"Compacted history journal into a snapshot of {len(records)} record(s)")
+
+    def _run_compactor(self):
+        """Compact periodically, or as soon as the journal grows past compact_entries."""
+        while not self._stop.is_set():
+            self._compact_requested.wait(timeout=self.compact_interval)
+            self._compact_requested.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"History compaction failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._compact_requested.set()
+        self._compactor.join()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+
+
+def create_history_store(backend: str) -> HistoryStore:
+    """
+    Create the history store of a backend.
+
+    Args:
+        backend: One of HISTORY_BACKENDS
+
+    Returns:
+        HistoryStore: The store
+    """
+    if backend == "json":
+        return JSONHistoryStore(Config.HISTORY_FILE)
+    if backend == "sqlite":
+        return SQLiteHistoryStore(Config.HISTORY_DB, legacy_json=Config.HISTORY_FILE)
+    if backend == "journal":
+        return JournalHistoryStore(
+            Config.HISTORY_FILE,
+            Config.HISTORY_JOURNAL,
+            compact_interval=Config.HISTORY_COMPACT_INTERVAL,
+            compact_entries=Config.HISTORY_COMPACT_ENTRIES
+        )
+    raise ValueError(f"HISTORY_BACKEND must be one of {', '.join(HISTORY_BACKENDS)}, got {backend!r}")
+
+
+# Global singleton instance, created on first use so importing this module
+# (e.g. from a benchmark) does not open or migrate the real history
+_history_store: Optional[HistoryStore] = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Get the global history store instance."""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = create_history_store(Config.HISTORY_BACKEND)
+        return _history_store
+
+
+def close_history_store():
+    """Flush and close the global history store if it was opened."""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is not None:
+            _history_store.close()
+            _history_store = None
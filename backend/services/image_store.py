@@ -0,0 +1,242 @@
+"""
+Image file storage.
+Keeps image files under the hash of their content in sharded directories,
+so identical images are stored once and no directory grows too large.
+Files are reference-counted from the history records that point to them.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import ImageInfo
+from backend.services.history_store import get_history_store
+
+logger = logging.getLogger(__name__)
+
+# Hex digits of the content hash naming the shard directory
+SHARD_PREFIX_LENGTH = 2
+# Unreferenced files younger than this may belong to a render not recorded yet
+ORPHAN_GRACE_SECONDS = 3600
+MIGRATION_BATCH_SIZE = 200
+
+
+def content_filename(digest: str, extension: str) -> str:
+    """
+    Build the file name of an image, relative to the images directory.
+
+    Args:
+        digest: Hex SHA-256 of the file content
+        extension: File extension without the dot
+
+    Returns:
+        str: Sharded file name, e.g. "3f/3fa1...c2.png"
+    """
+    return f"{digest[:SHARD_PREFIX_LENGTH]}/{digest}.{extension}"
+
+
+def download_name(image: ImageInfo) -> str:
+    """Get the file name an image is downloaded as."""
+    return f"{image.created_at:%Y%m%d_%H%M%S}_{image.id}{Path(image.filename).suffix}"
+
+
+def _hash_file(path: Path) -> str:
+    """Get the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """Content-addressed image files with reference counts.
+
+    Encoders write new files to an incoming directory and commit them under
+    their content hash; a file that already exists is shared rather than
+    written again. Each commit takes a reference on behalf of the history
+    record the image will get, and a file is removed when the last record
+    pointing to it is released. Reference counts are rebuilt from the
+    history at startup.
+    """
+
+    def __init__(self, directory: Path, incoming_dir: Path):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Root directory of the image files
+            incoming_dir: Directory new files are written to before they are committed.
+                Must not be served, and must be on the same filesystem as directory
+                so commits are atomic renames.
+        """
+        self.directory = directory
+        self.incoming_dir = incoming_dir
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.incoming_dir.mkdir(parents=True, exist_ok=True)
+
+        # Commits and releases of the same file must not interleave
+        self._lock = threading.Lock()
+        self._refs: Dict[str, int] = {}
+        self._loaded = False
+
+    def path(self, filename: str) -> Path:
+        """Get the path of an image file."""
+        return self.directory / filename
+
+    def incoming_path(self, extension: str) -> Path:
+        """Get a new path for an encoder to write an image to before it is committed."""
+        return self.incoming_dir / f"{uuid.uuid4()}.{extension}"
+
+    def open(self):
+        """Migrate the flat directory, count references and remove leftovers. Runs once at startup."""
+        self.migrate()
+        with self._lock:
+            self._load()
+        self._remove_leftovers()
+
+    def _load(self):
+        """Count the references of the history records. Caller holds the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        for image in get_history_store().all_images():
+            self._refs[image.filename] = self._refs.get(image.filename, 0) + 1
+
+    def commit(self, incoming: Path, digest: str, extension: str) -> str:
+        """
+        Move a newly written image to its content address and reference it.
+
+        Args:
+            incoming: File written by an encoder
+            digest: Hex SHA-256 of the file content
+            extension: File extension without the dot
+
+        Returns:
+            str: File name of the image
+        """
+        filename = content_filename(digest, extension)
+        target = self.path(filename)
+        with self._lock:
+            self._load()
+            if target.exists():
+                # Same content as a stored image, share its file
+                os.remove(incoming)
+                logger.debug(f"Image {filename} is already stored, sharing it")
+            else:
+                target.parent.mkdir(exist_ok=True)
+                os.replace(incoming, target)
+            self._refs[filename] = self._refs.get(filename, 0) + 1
+        return filename
+
+    def release(self, images: Iterable[ImageInfo]) -> Tuple[int, int]:
+        """
+        Drop the references of deleted image records, removing unreferenced files.
+
+        Args:
+            images: Deleted records
+
+        Returns:
+            Tuple[int, int]: Files removed and bytes freed
+        """
+        removed = 0
+        freed = 0
+        for image in images:
+            path = self.path(image.filename)
+            with self._lock:
+                self._load()
+                refs = self._refs.pop(image.filename, 1) - 1
+                if refs > 0:
+                    self._refs[image.filename] = refs
+                    continue
+                try:
+                    size = path.stat().st_size
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    logger.warning(f"Error deleting image file {image.filename}: {e}")
+                    continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def migrate(self):
+        """
+        Move the images of the flat directory layout to their content address.
+
+        Each batch is hard-linked to its new name before its records are
+        updated, and unlinked from the old name only afterwards, so an
+        interrupted migration leaves every record pointing to a file.
+        """
+        store = get_history_store()
+        flat = [image for image in store.all_images() if "/" not in image.filename]
+        if not flat:
+            return
+
+        start_time = time.perf_counter()
+        migrated = 0
+        for idx in range(0, len(flat), MIGRATION_BATCH_SIZE):
+            updated: List[ImageInfo] = []
+            sources: List[Path] = []
+            for image in flat[idx:idx + MIGRATION_BATCH_SIZE]:
+                source = self.path(image.filename)
+                if not source.exists():
+                    continue
+                filename = content_filename(_hash_file(source), source.suffix.lstrip("."))
+                target = self.path(filename)
+                if not target.exists():
+                    target.parent.mkdir(exist_ok=True)
+                    try:
+                        os.link(source, target)
+                    except OSError:
+                        shutil.copy2(source, target)
+                updated.append(image.model_copy(update={"filename": filename}))
+                sources.append(source)
+
+            if updated:
+                store.add(updated)
+            for source in sources:
+                os.remove(source)
+            migrated += len(updated)
+
+        logger.info(
+            f"Moved {migrated} image(s) to content-addressed storage "
+            f"in {time.perf_counter() - start_time:.1f}s"
+        )
+
+    def _remove_leftovers(self):
+        """Remove interrupted writes and files no record references anymore."""
+        for path in self.incoming_dir.iterdir():
+            path.unlink(missing_ok=True)
+        # Earlier versions staged files inside the served images directory
+        shutil.rmtree(self.directory / ".incoming", ignore_errors=True)
+
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed = 0
+        for shard in self.directory.iterdir():
+            if not shard.is_dir() or len(shard.name) != SHARD_PREFIX_LENGTH:
+                continue
+            for path in shard.iterdir():
+                with self._lock:
+                    if f"{shard.name}/{path.name}" in self._refs or path.stat().st_mtime > cutoff:
+                        continue
+                    path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced image file(s)")
+
+
+# Global singleton instance
+_image_store = ImageStore(directory=Config.IMAGES_DIR, incoming_dir=Config.INCOMING_DIR)
+
+
+def get_image_store() -> ImageStore:
+    """Get the global image store instance."""
+    return _image_store
@@ -0,0 +1,314 @@
+"""
+Performance metrics.
+In-process counters, gauges and histograms of the generation pipeline,
+rendered in the Prometheus text exposition format for /metrics.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a cached thumbnail save up to a cold multi-image render on CPU
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Square side lengths that resolutions are bucketed to, to bound label cardinality
+RESOLUTION_BUCKETS = (256, 512, 768, 1024, 1536, 2048)
+
+LabelValues = Tuple[str, ...]
+
+
+def resolution_bucket(width: int, height: int) -> str:
+    """
+    Get the resolution label of an image size.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        str: Side of the smallest bucket square with at least as many pixels, e.g. "1024"
+    """
+    side = math.sqrt(width * height)
+    for bucket in RESOLUTION_BUCKETS:
+        if side <= bucket:
+            return str(bucket)
+    return f">{RESOLUTION_BUCKETS[-1]}"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format a label set, empty for no labels."""
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """A named metric with a fixed set of label names."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        """Get the label values of a sample in label name order."""
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """Render the HELP, TYPE and sample lines."""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """Add to the count of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Current value, set by the instrumented code or read at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        """
+        Initialize the gauge.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Label names
+            collect: Function returning the value of every label set at scrape
+                time, replacing the values set with set()
+        """
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        """Set the value of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        if self._collect is not None:
+            try:
+                values = list(self._collect().items())
+            except Exception as e:
+                logger.warning(f"Error collecting metric {self.name}: {e}")
+                values = []
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (the last one is +Inf) and the sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        """Record a value for a label set."""
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        lines = []
+        labelnames = self.labelnames + ("le",)
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labelnames, key + (_format_value(bound),))} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class GenerationMetrics:
+    """The metrics of the generation pipeline.
+
+    Instrumented code records into these metrics as it runs; gauges of
+    state kept elsewhere (queues, task counts, VRAM) are read from that
+    state when scraped, so a scrape never touches the history or does
+    I/O.
+    """
+
+    def __init__(self):
+        """Create the metrics."""
+        stage_labels = ("resolution", "steps", "device")
+
+        self.task_duration = Histogram(
+            "zimage_task_duration_seconds",
+            "Time from task submission to completion",
+            stage_labels
+        )
+        self.queue_wait = Histogram(
+            "zimage_queue_wait_seconds",
+            "Time a work item waited in its device queue before rendering started",
+            stage_labels
+        )
+        self.model_load = Histogram(
+            "zimage_model_load_seconds",
+            "Time to load a pipeline replica onto a device",
+            ("device",)
+        )
+        self.denoise = Histogram(
+            "zimage_denoise_seconds",
+            "Time of one pipeline call, from the denoising loop to decoded images",
+            stage_labels
+        )
+        self.save = Histogram(
+            "zimage_save_seconds",
+            "Time to encode and save the images of a work item",
+            stage_labels
+        )
+        self.tasks_completed = Counter(
+            "zimage_tasks_completed_total",
+            "Tasks that completed",
+            stage_labels
+        )
+        self.tasks_failed = Counter(
+            "zimage_tasks_failed_total",
+            "Tasks that failed",
+            stage_labels
+        )
+        self.images_generated = Counter(
+            "zimage_images_generated_total",
+            "Images rendered by the pipeline",
+            ("device",)
+        )
+        self.tasks = Gauge(
+            "zimage_tasks",
+            "Tasks by status",
+            ("status",),
+            collect=self._collect_tasks
+        )
+        self.queue_depth = Gauge(
+            "zimage_queue_depth",
+            "Work items waiting in the queue of each device",
+            ("device",),
+            collect=self._collect_queue_depth
+        )
+        self.vram_allocated = Gauge(
+            "zimage_vram_allocated_bytes",
+            "GPU memory allocated by tensors on each device with a loaded replica",
+            ("device",),
+            collect=lambda: self._collect_vram(0)
+        )
+        self.vram_reserved = Gauge(
+            "zimage_vram_reserved_bytes",
+            "GPU memory reserved by the caching allocator on each device with a loaded replica",
+            ("device",),
+            collect=lambda: self._collect_vram(1)
+        )
+        self._metrics: List[_Metric] = [
+            self.task_duration, self.queue_wait, self.model_load, self.denoise, self.save,
+            self.tasks_completed, self.tasks_failed, self.images_generated,
+            self.tasks, self.queue_depth, self.vram_allocated, self.vram_reserved,
+        ]
+
+    @staticmethod
+    def _collect_tasks() -> Dict[LabelValues, float]:
+        from backend.services.task_manager import get_task_manager
+        return {(status.value,): count for status, count in get_task_manager().status_counts().items()}
+
+    @staticmethod
+    def _collect_queue_depth() -> Dict[LabelValues, float]:
+        from backend.services.device_pool import get_device_pool
+        return {(slot.device,): len(slot.pending) for slot in get_device_pool().slots}
+
+    @staticmethod
+    def _collect_vram(field: int) -> Dict[LabelValues, float]:
+        from backend.services.generator import get_generator
+        return {(device,): stats[field] for device, stats in get_generator().memory_stats().items()}
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global singleton instance
+_metrics = GenerationMetrics()
+
+
+def get_metrics() -> GenerationMetrics:
+    """Get the global generation metrics instance."""
+    return _metrics
@@ -1,44 +1,164 @@
 """
 System monitoring service.
+A background thread samples CPU, memory, GPU and disk usage at a fixed rate
+into a ring buffer, so status requests never wait on a measurement.
 """
 import psutil
-from datetime import datetime
-from typing import Optional
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional, Set
 import logging
 
-from backend.models.schemas import CPUInfo, MemoryInfo, GPUInfo, DiskInfo
+from backend.models.config import Config
+from backend.models.schemas import CPUInfo, MemoryInfo, GPUInfo, DiskInfo, MetricsSample, SystemStatusResponse
+from backend.services.gpu_telemetry import GPUProvider, create_gpu_provider
 
 logger = logging.getLogger(__name__)
 
 
 class SystemMonitor:
-    """Service for monitoring system resources."""
-
-    def __init__(self):
-        """Initialize system monitor."""
-        self._cache = {}
-        self._cache_ttl = 2  # Cache for 2 seconds
+    """Service for monitoring system resources.
+
+    Usage is sampled every `interval` seconds by a daemon thread. The latest
+    full snapshot is kept for /system/status, and a compact point of every
+    sample goes into a ring buffer of `history_size` entries for charting.
+    """
+
+    def __init__(self, interval: float, history_size: int, gpu_provider: Optional[GPUProvider] = None):
+        """
+        Initialize system monitor.
+
+        Args:
+            interval: Seconds between samples
+            history_size: Number of samples kept in the ring buffer
+            gpu_provider: Source of GPU telemetry, created from Config.GPU_TELEMETRY on first use when omitted
+        """
+        self.interval = interval
+        self.history_size = history_size
+        self._gpu_provider = gpu_provider
+
+        self._lock = threading.Lock()
+        self._latest: Optional[SystemStatusResponse] = None
+        self._samples: Deque[MetricsSample] = deque(maxlen=history_size)
+        # Warnings currently raised, logged once when a threshold is crossed
+        self._alerts: Set[str] = set()
+
+        self._cores = psutil.cpu_count(logical=False)
+        partitions = psutil.disk_partitions()
+        self._disk_path = partitions[0].mountpoint if partitions else "/"
+
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
         logger.info("System monitor initialized")
 
+    def start(self):
+        """Start the sampler thread."""
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._stop.clear()
+        # CPU usage is measured since the previous call, so the first call only sets the baseline
+        psutil.cpu_percent(interval=None)
+        self._sampler = threading.Thread(target=self._run_sampler, name="system-monitor", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stop the sampler thread."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=self.interval + 5)
+            self._sampler = None
+        if self._gpu_provider is not None:
+            self._gpu_provider.close()
+            self._gpu_provider = None
+
+    def _run_sampler(self):
+        """Take a sample every interval until stopped."""
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling system status: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self) -> SystemStatusResponse:
+        """
+        Measure the system now and record the result.
+
+        Returns:
+            SystemStatusResponse: The new snapshot
+        """
+        gpus = self.get_gpus_info()
+        status = SystemStatusResponse(
+            cpu=self.get_cpu_info(),
+            memory=self.get_memory_info(),
+            gpu=gpus[0] if gpus else GPUInfo(available=False),
+            gpus=gpus,
+            disk=self.get_disk_info(),
+            timestamp=datetime.now()
+        )
+        gpu = status.gpu if status.gpu is not None and status.gpu.available else None
+        point = MetricsSample(
+            timestamp=status.timestamp,
+            cpu_percent=status.cpu.usage_percent,
+            memory_percent=status.memory.usage_percent,
+            memory_used_gb=status.memory.used_gb,
+            gpu_percent=gpu.usage_percent if gpu else None,
+            gpu_memory_used_gb=gpu.memory_used_gb if gpu else None,
+            gpu_temperature=gpu.temperature if gpu else None,
+            disk_percent=status.disk.usage_percent
+        )
+        with self._lock:
+            self._latest = status
+            self._samples.append(point)
+        return status
+
+    def latest(self) -> Optional[SystemStatusResponse]:
+        """Get the most recent snapshot, None before the first sample."""
+        return self._latest
+
+    def history(self, seconds: Optional[float] = None) -> List[MetricsSample]:
+        """
+        Get the buffered samples, oldest first.
+
+        Args:
+            seconds: Only return the samples of this many last seconds, all when omitted
+
+        Returns:
+            List[MetricsSample]: Recorded samples
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if seconds is not None:
+            cutoff = datetime.now() - timedelta(seconds=seconds)
+            samples = [sample for sample in samples if sample.timestamp >= cutoff]
+        return samples
+
+    def _check(self, name: str, high: bool, message: str):
+        """Log a warning when a usage threshold is crossed, not on every sample above it."""
+        if not high:
+            self._alerts.discard(name)
+        elif name not in self._alerts:
+            self._alerts.add(name)
+            logger.warning(message)
+
     def get_cpu_info(self) -> CPUInfo:
-        """Get CPU information."""
-        usage = psutil.cpu_percent(interval=0.1)
-        # Log CPU warnings only
-        if usage > 80:
-            logger.warning(f"CPU usage high: {usage:.1f}%")
+        """Get CPU information, with the usage since the previous call."""
+        usage = psutil.cpu_percent(interval=None)
+        self._check("cpu", usage > 80, f"CPU usage high: {usage:.1f}%")
 
+        freq = psutil.cpu_freq()
         return CPUInfo(
             usage_percent=usage,
-            cores=psutil.cpu_count(logical=False),
-            frequency_mhz=psutil.cpu_freq().current if psutil.cpu_freq() else 0.0
+            cores=self._cores,
+            frequency_mhz=freq.current if freq else 0.0
         )
 
     def get_memory_info(self) -> MemoryInfo:
         """Get memory information."""
         mem = psutil.virtual_memory()
-        # Log memory warnings only
-        if mem.percent > 80:
-            logger.warning(f"Memory usage high: {mem.percent:.1f}%")
+        self._check("memory", mem.percent > 80, f"Memory usage high: {mem.percent:.1f}%")
 
         return MemoryInfo(
             total_gb=mem.total / (1024**3),
@@ -47,45 +167,51 @@ class SystemMonitor:
             usage_percent=mem.percent
         )
 
-    def get_gpu_info(self) -> Optional[GPUInfo]:
-        """Get GPU information if available."""
+    def get_gpus_info(self) -> List[GPUInfo]:
+        """Get information of every GPU, empty without GPUs."""
+        if self._gpu_provider is None:
+            self._gpu_provider = create_gpu_provider()
         try:
-            import GPUtil
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                gpu = gpus[0]
-                # Log GPU warnings only
-                if gpu.temperature > 80:
-                    logger.warning(f"GPU temperature high: {gpu.temperature}°C")
-                if gpu.load * 100 > 90:
-                    logger.warning(f"GPU usage high: {gpu.load * 100:.1f}%")
-                if gpu.memoryUsed / gpu.memoryTotal > 0.9:
-                    logger.warning(f"GPU memory usage high: {gpu.memoryUsed / gpu.memoryTotal * 100:.1f}%")
-
-                return GPUInfo(
-                    available=True,
-                    name=gpu.name,
-                    memory_total_gb=gpu.memoryTotal / 1024,
-                    memory_used_gb=gpu.memoryUsed / 1024,
-                    usage_percent=gpu.load * 100,
-                    temperature=gpu.temperature
-                )
-        except ImportError:
-            logger.debug("GPUtil not installed, GPU monitoring unavailable")
+            gpus = self._gpu_provider.devices()
         except Exception as e:
             logger.error(f"Error getting GPU info: {e}")
+            return []
+
+        for gpu in gpus:
+            label = f"GPU {gpu.index}"
+            if gpu.temperature is not None:
+                self._check(
+                    f"gpu{gpu.index}_temperature",
+                    gpu.temperature > 80,
+                    f"{label} temperature high: {gpu.temperature}°C"
+                )
+            if gpu.usage_percent is not None:
+                self._check(
+                    f"gpu{gpu.index}_usage",
+                    gpu.usage_percent > 90,
+                    f"{label} usage high: {gpu.usage_percent:.1f}%"
+                )
+            if gpu.memory_used_gb is not None and gpu.memory_total_gb:
+                memory_ratio = gpu.memory_used_gb / gpu.memory_total_gb
+                self._check(
+                    f"gpu{gpu.index}_memory",
+                    memory_ratio > 0.9,
+                    f"{label} memory usage high: {memory_ratio * 100:.1f}%"
+                )
+        return gpus
 
-        return GPUInfo(available=False)
+    def get_gpu_info(self) -> GPUInfo:
+        """Get information of the first GPU if available."""
+        gpus = self.get_gpus_info()
+        return gpus[0] if gpus else GPUInfo(available=False)
 
     def get_disk_info(self) -> DiskInfo:
         """Get disk information."""
-        disk = psutil.disk_usage(str(psutil.disk_partitions()[0].mountpoint))
-        # Log disk warnings only
-        if disk.percent > 80:
-            logger.warning(f"Disk usage high: {disk.percent:.1f}%")
+        disk = psutil.disk_usage(self._disk_path)
+        self._check("disk", disk.percent > 80, f"Disk usage high: {disk.percent:.1f}%")
 
         return DiskInfo(
-            path=psutil.disk_partitions()[0].mountpoint,
+            path=self._disk_path,
             total_gb=disk.total / (1024**3),
             used_gb=disk.used / (1024**3),
             free_gb=disk.free / (1024**3),
@@ -94,9 +220,9 @@ class SystemMonitor:
 
 
 # Global singleton instance
-_monitor = SystemMonitor()
+_monitor = SystemMonitor(interval=Config.METRICS_SAMPLE_INTERVAL, history_size=Config.METRICS_HISTORY_SIZE)
 
 
 def get_monitor() -> SystemMonitor:
     """Get the global monitor instance."""
-    return _monitor
\ No newline at end of file
+    return _monitor
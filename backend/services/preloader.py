@@ -0,0 +1,137 @@
+"""
+Model preloading at startup.
+Loads (and optionally warms up) every pipeline replica before the service
+reports itself ready, so the first request does not pay the cold start.
+"""
+import asyncio
+import time
+from typing import List, Optional, Tuple
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import StartupStatusResponse
+from backend.services.device_pool import DeviceSlot, get_device_pool
+from backend.services.generator import get_generator
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_MODES = ("off", "load", "warmup")
+
+
+def parse_shapes(shapes: str) -> List[Tuple[int, int]]:
+    """
+    Parse a list of image shapes.
+
+    Args:
+        shapes: Comma-separated WIDTHxHEIGHT shapes, e.g. "1024x1024,768x1344"
+
+    Returns:
+        List[Tuple[int, int]]: (width, height) of each shape
+    """
+    parsed = []
+    for shape in shapes.split(","):
+        if not shape.strip():
+            continue
+        width, height = shape.lower().split("x")
+        parsed.append((int(width), int(height)))
+    return parsed
+
+
+class ModelPreloader:
+    """Runs the configured preload and tracks its progress."""
+
+    def __init__(self, mode: str):
+        """
+        Initialize the preloader.
+
+        Args:
+            mode: One of PRELOAD_MODES
+        """
+        if mode not in PRELOAD_MODES:
+            raise ValueError(f"PRELOAD_MODE must be one of {', '.join(PRELOAD_MODES)}, got {mode!r}")
+        self.mode = mode
+        self.state = "disabled" if mode == "off" else "pending"
+        self.error: Optional[str] = None
+        self._total_ms: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the service can take traffic."""
+        return self.state in ("disabled", "ready")
+
+    async def run(self):
+        """Load, then warm up, the replica of every device in the pool."""
+        if self.mode == "off":
+            return
+
+        start_time = time.perf_counter()
+        pool = get_device_pool()
+        devices = [slot.device for slot in pool.gpu_slots] or [pool.cpu_slot.device]
+        generator = get_generator()
+        loop = asyncio.get_running_loop()
+
+        try:
+            self.state = "loading"
+            logger.info(f"Preloading model on {', '.join(devices)}")
+            await asyncio.gather(*(
+                loop.run_in_executor(None, generator.load, device) for device in devices
+            ))
+
+            if self.mode == "warmup":
+                self.state = "warming_up"
+                shapes = parse_shapes(Config.WARMUP_SHAPES)
+                await asyncio.gather(*(
+                    self._warmup_device(slot, shapes) for slot in pool.gpu_slots or [pool.cpu_slot]
+                ))
+
+            self.state = "ready"
+        except Exception as e:
+            logger.exception(f"Model preload failed: {e}")
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            self._total_ms = (time.perf_counter() - start_time) * 1000
+            logger.info(f"Model preload {self.state} after {self._total_ms / 1000:.2f}s")
+
+    @staticmethod
+    async def _warmup_device(slot: DeviceSlot, shapes: List[Tuple[int, int]]):
+        """
+        Render every warmup shape on a device.
+
+        Requests are not held back during warmup. A warmup render takes the
+        render lock of the replica like any batch, so the two never run at the
+        same time, and counts as load on the slot, so new tasks go to other
+        devices while it runs.
+        """
+        generator = get_generator()
+        loop = asyncio.get_running_loop()
+        for width, height in shapes:
+            slot.batch_started(1)
+            try:
+                await loop.run_in_executor(
+                    None, generator.warmup, slot.device, height, width, Config.WARMUP_STEPS
+                )
+            finally:
+                slot.batch_finished(1, completed=False)
+
+    def get_status(self) -> StartupStatusResponse:
+        """Get the preload state and the timing of every cold-start phase."""
+        return StartupStatusResponse(
+            backend=get_generator().name,
+            mode=self.mode,
+            state=self.state,
+            ready=self.ready,
+            torch_compile=Config.TORCH_COMPILE,
+            phases=get_generator().load_timings(),
+            total_ms=self._total_ms,
+            error=self.error
+        )
+
+
+# Global singleton instance
+_preloader = ModelPreloader(mode=Config.PRELOAD_MODE)
+
+
+def get_preloader() -> ModelPreloader:
+    """Get the global model preloader instance."""
+    return _preloader
@@ -0,0 +1,153 @@
+"""
+LRU cache of text-encoder prompt embeddings.
+"""
+from collections import OrderedDict
+from typing import Hashable
+import threading
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import PromptCacheStats
+
+logger = logging.getLogger(__name__)
+
+
+def _tensor_bytes(tensor) -> int:
+    """Get the memory used by a tensor."""
+    return tensor.numel() * tensor.element_size()
+
+
+class PromptEmbeddingCache:
+    """Two-tier LRU cache of prompt embeddings.
+
+    Entries live on the device they were encoded on until the device tier
+    exceeds its byte budget; the least recently used entries are then spilled
+    to CPU memory, and dropped once the CPU tier exceeds its own budget.
+    """
+
+    def __init__(self, device_budget_bytes: int, cpu_budget_bytes: int):
+        """
+        Initialize the cache.
+
+        Args:
+            device_budget_bytes: Maximum bytes of embeddings kept on device
+            cpu_budget_bytes: Maximum bytes of embeddings spilled to CPU memory
+        """
+        self.device_budget_bytes = device_budget_bytes
+        self.cpu_budget_bytes = cpu_budget_bytes
+        self._device_entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._cpu_entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._device_bytes = 0
+        self._cpu_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache can hold any entry."""
+        return self.device_budget_bytes > 0 or self.cpu_budget_bytes > 0
+
+    def get(self, key: Hashable, device: str):
+        """
+        Look up an embedding and return it on the requested device.
+
+        Args:
+            key: Cache key
+            device: Device the caller needs the tensor on
+
+        Returns:
+            The cached tensor, or None on a miss
+        """
+        with self._lock:
+            tensor = self._device_entries.get(key)
+            if tensor is not None:
+                self._device_entries.move_to_end(key)
+                self._hits += 1
+                return tensor if str(tensor.device) == device else tensor.to(device)
+
+            tensor = self._cpu_entries.pop(key, None)
+            if tensor is None:
+                self._misses += 1
+                return None
+
+            # Promote the spilled entry back to the device tier
+            self._hits += 1
+            self._cpu_bytes -= _tensor_bytes(tensor)
+            tensor = tensor.to(device)
+            self._insert(key, tensor)
+            return tensor
+
+    def put(self, key: Hashable, tensor):
+        """
+        Store an embedding.
+
+        Args:
+            key: Cache key
+            tensor: Embedding tensor, kept on its current device
+        """
+        with self._lock:
+            if key in self._device_entries or key in self._cpu_entries:
+                return
+            self._insert(key, tensor)
+
+    def _insert(self, key: Hashable, tensor):
+        """Insert into the device tier and spill what no longer fits. Caller holds the lock."""
+        self._device_entries[key] = tensor
+        self._device_bytes += _tensor_bytes(tensor)
+
+        while self._device_bytes > self.device_budget_bytes and self._device_entries:
+            spilled_key, spilled = self._device_entries.popitem(last=False)
+            self._device_bytes -= _tensor_bytes(spilled)
+            if self.cpu_budget_bytes <= 0:
+                self._evictions += 1
+                continue
+            spilled = spilled.to("cpu")
+            self._cpu_entries[spilled_key] = spilled
+            self._cpu_bytes += _tensor_bytes(spilled)
+
+        while self._cpu_bytes > self.cpu_budget_bytes and self._cpu_entries:
+            _, evicted = self._cpu_entries.popitem(last=False)
+            self._cpu_bytes -= _tensor_bytes(evicted)
+            self._evictions += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._device_entries.clear()
+            self._cpu_entries.clear()
+            self._device_bytes = 0
+            self._cpu_bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def get_stats(self) -> PromptCacheStats:
+        """Get hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return PromptCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                hit_rate=self._hits / lookups if lookups else 0.0,
+                evictions=self._evictions,
+                device_entries=len(self._device_entries),
+                device_bytes=self._device_bytes,
+                device_budget_bytes=self.device_budget_bytes,
+                cpu_entries=len(self._cpu_entries),
+                cpu_bytes=self._cpu_bytes,
+                cpu_budget_bytes=self.cpu_budget_bytes
+            )
+
+
+# Global singleton instance
+_prompt_cache = PromptEmbeddingCache(
+    device_budget_bytes=Config.PROMPT_CACHE_DEVICE_MB * 1024**2,
+    cpu_budget_bytes=Config.PROMPT_CACHE_CPU_MB * 1024**2
+)
+
+
+def get_prompt_cache() -> PromptEmbeddingCache:
+    """Get the global prompt embedding cache instance."""
+    return _prompt_cache
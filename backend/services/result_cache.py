@@ -0,0 +1,205 @@
+"""
+Deterministic result cache.
+Indexes saved images by the parameters that fully determine their pixels,
+so a fully seeded request can reuse an image that was already rendered.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import ImageFormat, ImageInfo, ResultCacheStats
+from backend.services.history_store import get_history_store
+
+logger = logging.getLogger(__name__)
+
+
+def result_key(
+    prompt: str,
+    negative_prompt: Optional[str],
+    seed: int,
+    width: int,
+    height: int,
+    num_inference_steps: int,
+    guidance_scale: float,
+    use_gpu: bool,
+    output_format: ImageFormat,
+    quality: Optional[int],
+    webp_lossless: Optional[bool],
+    model: str,
+    precision: str
+) -> tuple:
+    """
+    Build the key of a single rendered sample.
+
+    The negative prompt is only part of the key when classifier-free guidance
+    is active, since it is not used otherwise. CPU and GPU draw different
+    noise from the same seed, so the device type is part of the key, and so
+    are the model and the precision of the replica. The quality only matters
+    for lossy formats.
+
+    Returns:
+        tuple: Hashable key
+    """
+    if guidance_scale <= 1:
+        negative_prompt = None
+    output_format = ImageFormat(output_format)
+    if output_format == ImageFormat.PNG or (output_format == ImageFormat.WEBP and webp_lossless):
+        quality = None
+        webp_lossless = output_format == ImageFormat.WEBP
+    else:
+        webp_lossless = False
+    return (
+        prompt,
+        negative_prompt or "",
+        seed,
+        width,
+        height,
+        num_inference_steps,
+        float(guidance_scale),
+        use_gpu,
+        output_format,
+        quality,
+        webp_lossless,
+        model,
+        precision,
+    )
+
+
+def image_key(image: ImageInfo) -> Optional[tuple]:
+    """Get the key of a saved image, None if its record lacks a parameter."""
+    if image.seed is None or image.guidance_scale is None or image.model is None or image.precision is None:
+        return None
+    return result_key(
+        image.prompt,
+        image.negative_prompt,
+        image.seed,
+        image.width,
+        image.height,
+        image.num_inference_steps,
+        image.guidance_scale,
+        image.use_gpu,
+        image.format,
+        image.quality,
+        image.webp_lossless,
+        image.model,
+        image.precision
+    )
+
+
+class ResultCache:
+    """Index of saved images by result key.
+
+    The index is built from the history store at startup and kept up to date
+    as tasks complete; deleted images are dropped through discard(). Lookups
+    miss until the index is built.
+    """
+
+    def __init__(self, enabled: bool):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled: Whether lookups can hit
+        """
+        self.enabled = enabled
+        self._index: Dict[tuple, ImageInfo] = {}
+        self._loaded = False
+        self._loading: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._misses = 0
+        self._shared_renders = 0
+
+    async def load(self):
+        """Build the index from the history store, reading it off the event loop."""
+        if self._loaded or not self.enabled:
+            return
+        try:
+            images = await asyncio.to_thread(get_history_store().all_images)
+        except Exception as e:
+            logger.warning(f"Could not read history to build the result cache: {e}")
+            return
+
+        index: Dict[tuple, ImageInfo] = {}
+        for image in images:
+            key = image_key(image)
+            if key is not None:
+                index[key] = image
+        # Images saved while the history was read are newer than its records
+        index.update(self._index)
+        self._index = index
+        self._loaded = True
+        logger.info(f"Result cache indexed {len(self._index)} image(s) from history")
+
+    def _retry_load(self):
+        """Build the index in the background after a failed load. Must run on the event loop."""
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self.load())
+
+    def lookup(self, keys: List[tuple]) -> Optional[List[ImageInfo]]:
+        """
+        Find the saved images of a work item. Must run on the event loop.
+
+        Args:
+            keys: Result key of every sample of the item
+
+        Returns:
+            The saved image of every sample, in order, or None unless all of them are cached
+        """
+        if not self.enabled:
+            return None
+        if not self._loaded:
+            self._retry_load()
+            self._misses += 1
+            return None
+
+        images = []
+        for key in keys:
+            image = self._index.get(key)
+            if image is None:
+                self._misses += 1
+                return None
+            images.append(image)
+
+        self._hits += 1
+        return images
+
+    def add(self, images: Iterable[ImageInfo]):
+        """Index saved images, newer images replace older ones with the same key."""
+        for image in images:
+            key = image_key(image)
+            if key is not None:
+                self._index[key] = image
+
+    def discard(self, images: Iterable[ImageInfo]):
+        """Drop deleted images from the index."""
+        for image in images:
+            key = image_key(image)
+            indexed = self._index.get(key) if key is not None else None
+            if indexed is not None and indexed.id == image.id:
+                del self._index[key]
+
+    def record_shared_render(self):
+        """Count a request that joined an identical in-flight render."""
+        self._shared_renders += 1
+
+    def get_stats(self) -> ResultCacheStats:
+        """Get hit/miss counters."""
+        lookups = self._hits + self._misses
+        return ResultCacheStats(
+            enabled=self.enabled,
+            entries=len(self._index),
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / lookups if lookups else 0.0,
+            shared_renders=self._shared_renders
+        )
+
+
+# Global singleton instance
+_result_cache = ResultCache(enabled=Config.RESULT_CACHE_ENABLED)
+
+
+def get_result_cache() -> ResultCache:
+    """Get the global result cache instance."""
+    return _result_cache
@@ -0,0 +1,189 @@
+"""
+History retention.
+Background job that enforces the age, count and disk-space limits of the
+history, so saving an image never waits on a cleanup.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import ImageInfo, RetentionReport, RetentionStatusResponse
+from backend.services.history_store import get_history_store
+from backend.services.image_store import get_image_store
+from backend.services.result_cache import get_result_cache
+from backend.services.thumbnails import get_thumbnail_cache
+
+logger = logging.getLogger(__name__)
+
+# Least time between two sweeps woken by saved images, in seconds
+MIN_SWEEP_GAP = 10
+
+
+class RetentionEngine:
+    """Deletes the history records and image files beyond the retention limits.
+
+    Sweeps run every `interval` seconds, and sooner when saved images push the
+    estimated usage over the count or byte limit. A sweep takes the oldest
+    records outside the limits from the store's created_at order, deletes
+    them in batches and then removes their files and thumbnails, all in a
+    worker thread.
+    """
+
+    def __init__(self, max_images: int, max_days: int, max_bytes: int, interval: int, batch_size: int):
+        """
+        Initialize the engine.
+
+        Args:
+            max_images: Number of newest records to keep
+            max_days: Age in days after which records expire
+            max_bytes: Disk budget of the image files, 0 for no limit
+            interval: Seconds between scheduled sweeps
+            batch_size: Records deleted per store write
+        """
+        self.max_images = max_images
+        self.max_days = max_days
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._running = False
+        self._sweeps = 0
+        self._total_records = 0
+        self._total_bytes = 0
+        self._last_report: Optional[RetentionReport] = None
+        # Usage after the last sweep plus the images saved since, None before the first sweep
+        self._records: Optional[int] = None
+        self._bytes: Optional[int] = None
+
+    async def run(self):
+        """Sweep at startup, then on schedule or when woken, until cancelled."""
+        trigger = "scheduled"
+        while True:
+            try:
+                await self.sweep(trigger)
+            except Exception as e:
+                logger.error(f"History retention sweep failed: {e}")
+            await asyncio.sleep(MIN_SWEEP_GAP)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(self.interval - MIN_SWEEP_GAP, 0))
+                trigger = "usage"
+            except asyncio.TimeoutError:
+                trigger = "scheduled"
+
+    def notify_saved(self, images: Iterable[ImageInfo]):
+        """
+        Account for newly saved images, waking the job if they exceed a limit.
+
+        Args:
+            images: Images just added to the history
+        """
+        if self._records is None:
+            return
+        # A file shared with an older record is counted again, which at worst wakes a sweep early
+        for image in images:
+            self._records += 1
+            self._bytes += image.size_bytes
+        if self._records > self.max_images or (self.max_bytes > 0 and self._bytes > self.max_bytes):
+            self._wake.set()
+
+    async def sweep(self, trigger: str = "manual") -> RetentionReport:
+        """
+        Run a sweep now, or wait for the one in progress and run another.
+
+        Args:
+            trigger: What started the sweep, reported as is
+
+        Returns:
+            RetentionReport: What the sweep reclaimed
+        """
+        async with self._lock:
+            self._running = True
+            try:
+                loop = asyncio.get_running_loop()
+                report = await loop.run_in_executor(None, self._sweep, trigger)
+            finally:
+                self._running = False
+
+        self._sweeps += 1
+        self._total_records += report.deleted_records
+        self._total_bytes += report.reclaimed_bytes
+        self._last_report = report
+        self._records = report.remaining_records
+        self._bytes = report.remaining_bytes
+        return report
+
+    def _sweep(self, trigger: str) -> RetentionReport:
+        """Delete the expired records and their files. Runs in a worker thread."""
+        started_at = datetime.now()
+        start_time = time.perf_counter()
+        store = get_history_store()
+
+        expired = store.expired(started_at - timedelta(days=self.max_days), self.max_images, self.max_bytes)
+        deleted_records = 0
+        deleted_files = 0
+        reclaimed_bytes = 0
+        for idx in range(0, len(expired), self.batch_size):
+            batch = expired[idx:idx + self.batch_size]
+            # Records go first, so a file is never listed after it is removed
+            deleted = store.delete([image.id for image in batch])
+            deleted_records += len(deleted)
+            get_result_cache().discard(deleted)
+            get_thumbnail_cache().remove(image.id for image in deleted)
+            # Files shared with records that are kept stay in place
+            files, freed = get_image_store().release(deleted)
+            deleted_files += files
+            reclaimed_bytes += freed
+
+        report = RetentionReport(
+            trigger=trigger,
+            started_at=started_at,
+            duration_ms=(time.perf_counter() - start_time) * 1000,
+            deleted_records=deleted_records,
+            deleted_files=deleted_files,
+            reclaimed_bytes=reclaimed_bytes,
+            remaining_records=store.count(),
+            remaining_bytes=store.total_bytes()
+        )
+        if deleted_records:
+            logger.info(
+                f"History retention ({trigger}) deleted {deleted_records} record(s) and "
+                f"{deleted_files} file(s), reclaimed {reclaimed_bytes / 1024 / 1024:.1f}MB "
+                f"in {report.duration_ms:.0f}ms"
+            )
+        return report
+
+    def get_status(self) -> RetentionStatusResponse:
+        """Get the retention policy and the result of the last sweep."""
+        return RetentionStatusResponse(
+            max_images=self.max_images,
+            max_days=self.max_days,
+            max_bytes=self.max_bytes,
+            interval_seconds=self.interval,
+            running=self._running,
+            sweeps=self._sweeps,
+            total_deleted_records=self._total_records,
+            total_reclaimed_bytes=self._total_bytes,
+            last_sweep=self._last_report
+        )
+
+
+# Global singleton instance
+_retention_engine = RetentionEngine(
+    max_images=Config.MAX_HISTORY_IMAGES,
+    max_days=Config.MAX_HISTORY_DAYS,
+    max_bytes=int(Config.MAX_HISTORY_GB * 1024 ** 3),
+    interval=Config.RETENTION_INTERVAL,
+    batch_size=Config.RETENTION_BATCH_SIZE
+)
+
+
+def get_retention_engine() -> RetentionEngine:
+    """Get the global retention engine instance."""
+    return _retention_engine
@@ -0,0 +1,211 @@
+"""
+Synthetic generator backend.
+Renders placeholder images after a simulated latency, with an optional
+failure rate, so the HTTP, queue and storage paths can be load tested
+without torch, diffusers, model weights or a GPU.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+import logging
+
+from PIL import Image
+
+from backend.services import tracing
+from backend.services.generator import GeneratorBackend, RenderedImage
+from backend.services.metrics import get_metrics, resolution_bucket
+
+logger = logging.getLogger(__name__)
+
+# Noise is drawn at this fraction of the image size and upscaled, so files
+# encode to about the size of rendered images rather than of pure noise
+NOISE_SCALE = 8
+
+
+def noise_image(seed: int, prompt: str, width: int, height: int) -> Image.Image:
+    """
+    Render the placeholder image of a seed and prompt.
+
+    Args:
+        seed: Seed of the image
+        prompt: Prompt of the image
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Image.Image: Smooth RGB noise, identical for identical arguments
+    """
+    # A str seed is hashed with SHA-512, so it does not depend on PYTHONHASHSEED
+    rng = random.Random(f"{seed}:{prompt}")
+    size = (max(width // NOISE_SCALE, 1), max(height // NOISE_SCALE, 1))
+    noise = Image.frombytes("RGB", size, rng.randbytes(size[0] * size[1] * 3))
+    return noise.resize((width, height), Image.BICUBIC)
+
+
+class SyntheticGenerator(GeneratorBackend):
+    """Backend that sleeps instead of rendering.
+
+    A batch takes step_ms per denoising step and per 1024x1024 worth of
+    pixels in the batch, scaled by a log-normal factor of sigma `jitter`,
+    and fails with probability `failure_rate` at a random step. Images are
+    noise seeded from their seed and prompt, so identical requests give
+    identical files while any other pair of requests gives distinct files
+    of realistic size.
+    """
+
+    name = "synthetic"
+    model_name = "synthetic"
+
+    def __init__(self, load_ms: float, step_ms: float, jitter: float, failure_rate: float, seed: Optional[int] = None):
+        """
+        Initialize the synthetic generator.
+
+        Args:
+            load_ms: Simulated replica load time per device
+            step_ms: Simulated time of one denoising step of a 1024x1024 image
+            jitter: Sigma of the log-normal spread of batch latencies, 0 for none
+            failure_rate: Fraction of batches that fail
+            seed: Seed of the latency and failure draws, random when omitted
+        """
+        self.load_ms = load_ms
+        self.step_ms = step_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._devices: Set[str] = set()
+        # Renders on one device take turns, as on a real replica
+        self._render_locks: Dict[str, threading.Lock] = {}
+        self._load_timings = []
+
+    def loaded_devices(self) -> List[str]:
+        return list(self._devices)
+
+    def load(self, device: str):
+        with self._load_lock:
+            if device in self._devices:
+                return
+            start_time = time.perf_counter()
+            time.sleep(self.load_ms / 1000)
+            self._record_phase(device, "synthetic_load", start_time)
+            self._devices.add(device)
+        get_metrics().model_load.observe(self.load_ms / 1000, device=device)
+
+    def unload(self, device: str):
+        with self._load_lock:
+            self._devices.discard(device)
+
+    def precision(self, device: str) -> Optional[str]:
+        return "synthetic" if device in self._devices else None
+
+    def target_precision(self, device: str) -> str:
+        return "synthetic"
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[Optional[int]],
+        height: int = 1024,
+        width: int = 1024,
+        num_inference_steps: int = 9,
+        use_gpu: bool = True,
+        gpu_id: int = 0,
+        guidance_scale: float = 0.0,
+        progress_callback: Optional[Callable[..., None]] = None,
+        device: Optional[str] = None,
+        trace: Optional[tracing.Trace] = None
+    ) -> List[RenderedImage]:
+        if device is None:
+            device = self.resolve_device(use_gpu, gpu_id)
+        if trace is None:
+            trace = tracing.new_trace(device)
+        self.load(device)
+
+        seeds = [seed if seed is not None else random.randrange(2**32) for seed in seeds]
+
+        with self._lock:
+            scale = self._random.lognormvariate(0, self.jitter) if self.jitter > 0 else 1.0
+            failed_step = (
+                self._random.randrange(num_inference_steps)
+                if self._random.random() < self.failure_rate else None
+            )
+        megapixels = width * height * len(prompts) / (1024 * 1024)
+        step_seconds = self.step_ms / 1000 * megapixels * scale
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(device, threading.Lock())
+        with render_lock:
+            return self._render(
+                prompts, negative_prompts, seeds, height, width, num_inference_steps,
+                guidance_scale, progress_callback, device, trace, step_seconds, failed_step
+            )
+
+    def _render(
+        self,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[int],
+        height: int,
+        width: int,
+        num_inference_steps: int,
+        guidance_scale: float,
+        progress_callback: Optional[Callable[..., None]],
+        device: str,
+        trace: tracing.Trace,
+        step_seconds: float,
+        failed_step: Optional[int]
+    ) -> List[RenderedImage]:
+        """Sleep through the steps of a batch, with the render lock of the device held."""
+        start_time = time.time()
+        pipeline_start = step_start = trace.now()
+        for step in range(num_inference_steps):
+            time.sleep(step_seconds)
+            if step == failed_step:
+                if progress_callback:
+                    progress_callback("Generation failed: synthetic failure", 0)
+                raise RuntimeError(f"Failed to generate image: synthetic failure at step {step + 1}")
+            now = trace.now()
+            trace.add("step", step_start, now, step=step + 1)
+            step_start = now
+            if progress_callback:
+                progress_callback(
+                    f"Denoising step {step + 1}/{num_inference_steps}",
+                    30 + 60 * (step + 1) // num_inference_steps,
+                    step + 1
+                )
+        trace.add("pipeline", pipeline_start, step_start, width=width, height=height, images=len(prompts))
+        trace.add("denoise", pipeline_start, step_start, steps=num_inference_steps)
+        get_metrics().denoise.observe(
+            step_start - pipeline_start,
+            resolution=resolution_bucket(width, height),
+            steps=num_inference_steps,
+            device=device
+        )
+
+        generation_time = (time.time() - start_time) * 1000
+        if progress_callback:
+            progress_callback(f"{len(prompts)} image(s) generated successfully", 90)
+        stages = trace.stages()
+
+        return [
+            RenderedImage(
+                image=noise_image(seed, prompts[idx], width, height),
+                prompt=prompts[idx],
+                negative_prompt=negative_prompts[idx],
+                seed=seed,
+                width=width,
+                height=height,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                use_gpu=device != "cpu",
+                generation_time_ms=generation_time,
+                stages=stages,
+                model=self.model_name,
+                precision="synthetic"
+            )
+            for idx, seed in enumerate(seeds)
+        ]
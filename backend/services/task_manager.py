@@ -2,14 +2,91 @@
 Task manager for handling async image generation tasks.
 """
 import asyncio
-from typing import Dict, Optional
-from datetime import datetime
-import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+import random
+import time
 import uuid
 
 from backend.models.config import Config
-from backend.models.schemas import TaskStatus, TaskResponse, ImageInfo
-from backend.services.generator import get_generator
+from backend.models.schemas import TaskStatus, TaskResponse, ImageInfo, OutputOptions
+from backend.services.device_pool import DeviceSlot, get_device_pool
+from backend.services.encoder import get_encoder
+from backend.services.generator import RenderedImage, get_generator
+from backend.services.history_store import get_history_store
+from backend.services.metrics import get_metrics, resolution_bucket
+from backend.services.result_cache import get_result_cache, result_key
+from backend.services.retention import get_retention_engine
+from backend.services.thumbnails import get_thumbnail_cache
+from backend.services.tracing import Trace, new_trace
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a task does not fit in the Config.MAX_QUEUE_SIZE images the queue holds."""
+
+
+@dataclass
+class _PendingTask:
+    """A unit of work waiting in a device queue.
+
+    A task is made of one or more work items; a single-prompt request is one
+    item, a batch job has one item per prompt (or per prompt and seed).
+    """
+    task_id: str
+    prompt: str
+    negative_prompt: Optional[str]
+    seed: Optional[int]
+    batch_size: int
+    height: int
+    width: int
+    num_inference_steps: int
+    guidance_scale: float
+    output: OutputOptions = field(default_factory=OutputOptions)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Set when the item's batch starts rendering
+    queue_wait_ms: Optional[float] = None
+    # Result key of every sample, set for fully seeded items
+    result_keys: Optional[tuple] = None
+    # Tasks that submitted an identical item while this one was in flight
+    followers: List[str] = field(default_factory=list)
+
+    @property
+    def owners(self) -> List[str]:
+        """Tasks that receive the images of this item."""
+        return [self.task_id] + self.followers
+
+    def metric_labels(self, device: str) -> Dict[str, str]:
+        """Get the labels of the stage metrics of this item on a device."""
+        return {
+            "resolution": resolution_bucket(self.width, self.height),
+            "steps": str(self.num_inference_steps),
+            "device": device,
+        }
+
+    @property
+    def batch_key(self) -> tuple:
+        """Tasks with equal keys can share one pipeline call."""
+        return (
+            self.height,
+            self.width,
+            self.num_inference_steps,
+            self.guidance_scale,
+        )
+
+
+@dataclass
+class _TaskState:
+    """Bookkeeping of a task whose work items are queued or running."""
+    total_images: int
+    remaining_items: int
+    done_images: int = 0
+    # Images rendered for this task, as opposed to reused from the result cache or another task
+    new_images: List[ImageInfo] = field(default_factory=list)
 
 
 class TaskManager:
@@ -19,6 +96,22 @@ class TaskManager:
         """Initialize task manager."""
         self.tasks: Dict[str, TaskResponse] = {}
         self.lock = asyncio.Lock()
+        self._device_pool = get_device_pool()
+        self._task_states: Dict[str, _TaskState] = {}
+        self._queued_task_ids: Set[str] = set()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._workers: Dict[str, List[asyncio.Task]] = {}
+        self._save_jobs: Set[asyncio.Task] = set()
+        # Fully seeded items queued or rendering, by result keys
+        self._inflight: Dict[tuple, _PendingTask] = {}
+        # Number of tasks in each status, and the submission time and metric labels of unfinished tasks
+        self._status_counts: Dict[TaskStatus, int] = {status: 0 for status in TaskStatus}
+        self._task_metrics: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        # Dedicated threads, GENERATION_WORKERS per device; the generator serializes renders on a replica
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.GENERATION_WORKERS * len(self._device_pool.slots),
+            thread_name_prefix="generation"
+        )
 
     async def create_task(
         self,
@@ -30,9 +123,9 @@ class TaskManager:
         use_gpu: bool = True,
         seed: Optional[int] = None,
         batch_size: int = 1,
-        gpu_id: int = 0,
+        gpu_id: Optional[int] = None,
         guidance_scale: float = 0.0,
-        max_concurrent_tasks: int = 1
+        output: Optional[OutputOptions] = None
     ) -> str:
         """
         Create a new image generation task.
@@ -46,142 +139,578 @@ class TaskManager:
             use_gpu: Whether to use GPU
             seed: Random seed for reproducibility
             batch_size: Number of images to generate
-            gpu_id: GPU device ID
+            gpu_id: GPU device ID, None to use the least-loaded GPU
             guidance_scale: Guidance scale for CFG
+            output: Output format and compression settings
 
         Returns:
             str: Task ID
+
+        Raises:
+            QueueFullError: If the queue has no room for the task's images
+            ValueError: If the requested GPU is not served by this node
         """
-        task_id = str(uuid.uuid4())
+        items = [_PendingTask(
+            task_id="",
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            seed=seed,
+            batch_size=batch_size,
+            height=height,
+            width=width,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            output=output or OutputOptions(),
+        )]
+        return await self._submit(items, use_gpu, gpu_id)
+
+    async def create_batch_task(
+        self,
+        prompts: List[str],
+        seeds: Optional[List[int]] = None,
+        images_per_prompt: int = 1,
+        negative_prompt: Optional[str] = None,
+        height: int = 1024,
+        width: int = 1024,
+        num_inference_steps: int = 9,
+        use_gpu: bool = True,
+        gpu_id: Optional[int] = None,
+        guidance_scale: float = 0.0,
+        output: Optional[OutputOptions] = None
+    ) -> str:
+        """
+        Create a batch job rendering many prompts as one task.
+
+        With seeds, every prompt is rendered once per seed (prompt x seed grid);
+        otherwise every prompt is rendered images_per_prompt times with random
+        seeds. Work items are batched with each other, and with other tasks,
+        by the scheduler.
+
+        Args:
+            prompts: Text prompts to render
+            seeds: Seeds of the prompt x seed grid
+            images_per_prompt: Images per prompt when no seeds are given
+            negative_prompt: Negative prompt shared by all prompts
+            height: Image height in pixels
+            width: Image width in pixels
+            num_inference_steps: Number of inference steps
+            use_gpu: Whether to use GPU
+            gpu_id: GPU device ID, None to spread items over the least-loaded GPUs
+            guidance_scale: Guidance scale for CFG
+            output: Output format and compression settings
+
+        Returns:
+            str: Task ID
+
+        Raises:
+            QueueFullError: If the queue has no room for the job's images
+            ValueError: If the job is too large or the requested GPU is not served
+        """
+        total_images = len(prompts) * (len(seeds) if seeds else images_per_prompt)
+        if total_images > Config.MAX_BATCH_JOB_IMAGES:
+            raise ValueError(
+                f"Batch job renders {total_images} images, the limit is {Config.MAX_BATCH_JOB_IMAGES}"
+            )
 
-        # Create task response
-        task = TaskResponse(
-            task_id=task_id,
-            status=TaskStatus.PENDING,
-            message="Task created, waiting to start...",
-            total_steps=num_inference_steps,
-            current_step=0
+        common = dict(
+            negative_prompt=negative_prompt,
+            height=height,
+            width=width,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            output=output or OutputOptions(),
         )
+        if seeds:
+            items = [
+                _PendingTask(task_id="", prompt=prompt, seed=seed, batch_size=1, **common)
+                for prompt in prompts
+                for seed in seeds
+            ]
+        else:
+            items = [
+                _PendingTask(task_id="", prompt=prompt, seed=None, batch_size=images_per_prompt, **common)
+                for prompt in prompts
+            ]
+        return await self._submit(items, use_gpu, gpu_id)
+
+    async def _submit(self, items: List[_PendingTask], use_gpu: bool, gpu_id: Optional[int]) -> str:
+        """Register a task and queue its work items on their devices.
+
+        Fully seeded items whose images are already saved complete from the
+        result cache, and items identical to one in flight share its render;
+        only the remaining items are queued.
+        """
+        # Select devices up front so an unserved GPU fails before anything is queued;
+        # the images of earlier items count towards their device so items spread out
+        slots = []
+        assigned: Dict[str, int] = {}
+        for item in items:
+            slot = self._device_pool.select(use_gpu, gpu_id, assigned)
+            assigned[slot.device] = assigned.get(slot.device, 0) + item.batch_size
+            slots.append(slot)
+        task_id = str(uuid.uuid4())
+        total_images = sum(item.batch_size for item in items)
+
+        result_cache = get_result_cache()
+        cached_images: List[List[ImageInfo]] = []
 
+        # Nothing awaits between finding an in-flight leader and joining it, so the
+        # leader cannot finish and hand out its images in between
         async with self.lock:
-            self.tasks[task_id] = task
+            leaders: List[_PendingTask] = []
+            queued = []
+            for item, slot in zip(items, slots):
+                item.task_id = task_id
+                item.result_keys = self._result_keys(item, slot)
+                if item.result_keys is not None:
+                    images = result_cache.lookup(list(item.result_keys))
+                    if images is not None:
+                        cached_images.append(images)
+                        continue
+                    leader = self._inflight.get(item.result_keys)
+                    if leader is not None:
+                        leaders.append(leader)
+                        continue
+                queued.append((item, slot))
+
+            # The queue is bounded in images, as one batch job can hold many items
+            incoming_images = sum(item.batch_size for item, _ in queued)
+            if incoming_images > Config.MAX_QUEUE_SIZE:
+                raise ValueError(
+                    f"Task renders {incoming_images} images, the queue holds at most {Config.MAX_QUEUE_SIZE}"
+                )
+            queued_images = self.queued_images()
+            if queued and queued_images + incoming_images > Config.MAX_QUEUE_SIZE:
+                raise QueueFullError(
+                    f"Task queue is full ({queued_images} of {Config.MAX_QUEUE_SIZE} images queued), "
+                    f"please retry later"
+                )
 
-        # Start task in background
-        # Use ensure_future to properly schedule the coroutine
-        task_coro = self._execute_task(
-            task_id, prompt, negative_prompt, height, width, num_inference_steps, use_gpu, seed, batch_size, gpu_id, guidance_scale, max_concurrent_tasks
-        )
-        # Store reference to prevent garbage collection
-        self._background_task = asyncio.ensure_future(task_coro)
+            # Create task response
+            self.tasks[task_id] = TaskResponse(
+                task_id=task_id,
+                status=TaskStatus.PENDING,
+                message="Task created, waiting to start...",
+                total_steps=items[0].num_inference_steps,
+                current_step=0,
+                total_images=total_images,
+                queue_position=len(queued[0][1].pending) + 1 if queued else None,
+                device=slots[0].device
+            )
+            self._status_counts[TaskStatus.PENDING] += 1
+            self._task_metrics[task_id] = (time.monotonic(), items[0].metric_labels(slots[0].device))
+            self._task_states[task_id] = _TaskState(total_images=total_images, remaining_items=len(items))
+            if queued:
+                self._queued_task_ids.add(task_id)
+
+            for leader in leaders:
+                leader.followers.append(task_id)
+                result_cache.record_shared_render()
+
+            # Queue the work items on their devices
+            for item, slot in queued:
+                if item.result_keys is not None:
+                    self._inflight.setdefault(item.result_keys, item)
+                slot.pending.append(item)
+                slot.pending_event.set()
+                self._ensure_workers(slot)
+
+        for images in cached_images:
+            await self._item_finished(task_id, images, reused=True)
 
         return task_id
 
-    async def _execute_task(
-        self,
-        task_id: str,
-        prompt: str,
-        height: int,
-        width: int,
-        num_inference_steps: int,
-        use_gpu: bool,
-        batch_size: int,
-        gpu_id: int,
-        guidance_scale: float,
-        max_concurrent_tasks: int,
-        negative_prompt: Optional[str] = None,
-        seed: Optional[int] = None
-    ):
-        """Execute the image generation task in background."""
+    @staticmethod
+    def _result_keys(item: _PendingTask, slot: DeviceSlot) -> Optional[tuple]:
+        """Get the result key of every sample of a fully seeded item."""
+        if item.seed is None:
+            return None
+        generator = get_generator()
+        model = generator.model_name
+        precision = generator.target_precision(slot.device)
+        return tuple(
+            result_key(
+                item.prompt,
+                item.negative_prompt,
+                (item.seed + idx) % 2**32,
+                item.width,
+                item.height,
+                item.num_inference_steps,
+                item.guidance_scale,
+                slot.gpu_id is not None,
+                item.output.output_format,
+                item.output.quality,
+                item.output.webp_lossless,
+                model,
+                precision
+            )
+            for idx in range(item.batch_size)
+        )
+
+    def status_counts(self) -> Dict[TaskStatus, int]:
+        """Get the number of tasks in each status."""
+        return dict(self._status_counts)
+
+    def pending_count(self) -> int:
+        """Get the number of tasks that have not started yet."""
+        return len(self._queued_task_ids)
+
+    def queued_images(self) -> int:
+        """Get the number of images of the work items waiting in the device queues."""
+        return sum(item.batch_size for slot in self._device_pool.slots for item in slot.pending)
+
+    def _ensure_workers(self, slot: DeviceSlot):
+        """Start the worker loops of a device on first use."""
+        workers = [worker for worker in self._workers.get(slot.device, []) if not worker.done()]
+        while len(workers) < Config.GENERATION_WORKERS:
+            workers.append(asyncio.ensure_future(self._run_worker(slot)))
+        self._workers[slot.device] = workers
+
+    async def _run_worker(self, slot: DeviceSlot):
+        """Take batches of compatible pending tasks of a device and execute them one by one."""
+        while True:
+            # Only one idle worker per device assembles a batch at a time
+            async with slot.dispatch_lock:
+                while not slot.pending:
+                    slot.pending_event.clear()
+                    await slot.pending_event.wait()
+
+                await self._wait_for_batch_window(slot)
+                batch = self._take_batch(slot)
+
+            try:
+                await self._execute_batch(slot, batch)
+            except Exception as e:
+                logger.exception(f"Unexpected error while executing batch: {e}")
+
+    async def _wait_for_batch_window(self, slot: DeviceSlot):
+        """Wait until the oldest task's batch is full or its window has elapsed."""
+        head = slot.pending[0]
+        deadline = head.enqueued_at + Config.BATCH_WINDOW_MS / 1000
+
+        while True:
+            batched_images = sum(
+                task.batch_size for task in slot.pending if task.batch_key == head.batch_key
+            )
+            remaining = deadline - time.monotonic()
+            if batched_images >= Config.MAX_BATCH_SIZE or remaining <= 0:
+                return
+
+            slot.pending_event.clear()
+            try:
+                await asyncio.wait_for(slot.pending_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def _take_batch(self, slot: DeviceSlot) -> List[_PendingTask]:
+        """Remove the oldest pending task and the compatible tasks that fit in its batch."""
+        head = slot.pending.popleft()
+        batch = [head]
+        batched_images = head.batch_size
+
+        for task in list(slot.pending):
+            if task.batch_key != head.batch_key:
+                continue
+            if batched_images + task.batch_size > Config.MAX_BATCH_SIZE:
+                continue
+            slot.pending.remove(task)
+            batch.append(task)
+            batched_images += task.batch_size
+
+        # Tasks left behind moved up the queue
+        positioned = set()
+        for position, task in enumerate(slot.pending, start=1):
+            if task.task_id in positioned or task.task_id not in self._queued_task_ids:
+                continue
+            positioned.add(task.task_id)
+            self._apply_update(task.task_id, queue_position=position)
+
+        return batch
+
+    async def _execute_batch(self, slot: DeviceSlot, batch: List[_PendingTask]):
+        """Execute a batch of compatible work items with a single pipeline call."""
+        head = batch[0]
+        task_ids = list(dict.fromkeys(owner for item in batch for owner in item.owners))
+        num_inference_steps = head.num_inference_steps
+
+        num_images = sum(item.batch_size for item in batch)
+        completed = False
+        slot.batch_started(num_images)
+        metrics = get_metrics()
+        trace = new_trace(slot.device)
+        now = time.monotonic()
+        trace_now = time.perf_counter()
+        for item in batch:
+            wait = now - item.enqueued_at
+            item.queue_wait_ms = wait * 1000
+            metrics.queue_wait.observe(wait, **item.metric_labels(slot.device))
+            trace.add("queue_wait", trace_now - wait, trace_now, task_id=item.task_id)
         try:
             # Update status to processing
-            await self._update_task(task_id, status=TaskStatus.PROCESSING, message="Initializing...")
+            for task_id in task_ids:
+                self._queued_task_ids.discard(task_id)
+                if self.tasks[task_id].status == TaskStatus.PENDING:
+                    await self._update_task(task_id, status=TaskStatus.PROCESSING, message="Initializing...")
 
             # Get the current event loop
             loop = asyncio.get_running_loop()
 
-            # Create a queue for thread-safe progress updates
-            progress_queue = asyncio.Queue()
+            # Images each task renders in this batch, to scale batch progress to task progress
+            batch_images: Dict[str, int] = {}
+            for item in batch:
+                for owner in item.owners:
+                    batch_images[owner] = batch_images.get(owner, 0) + item.batch_size
 
-            def progress_callback(message: str, progress: int):
+            def progress_callback(message: str, progress: int, current_step: Optional[int] = None):
                 """Callback for progress updates - thread safe."""
                 try:
-                    # Map 0-100 progress to step-based progress
-                    current_step = int(progress * num_inference_steps / 100) if progress > 0 else 0
-                    # Put update in queue using call_soon_threadsafe
-                    loop.call_soon_threadsafe(
-                        progress_queue.put_nowait,
-                        {
-                            'message': message,
-                            'progress': progress,
-                            'current_step': current_step
-                        }
-                    )
+                    if current_step is None:
+                        # Map 0-100 progress to step-based progress
+                        current_step = int(progress * num_inference_steps / 100) if progress > 0 else 0
+                    # Apply the update on the event loop, in the order it was reported
+                    for task_id, images in batch_images.items():
+                        loop.call_soon_threadsafe(
+                            functools.partial(
+                                self._apply_batch_progress,
+                                task_id,
+                                images,
+                                message,
+                                progress,
+                                current_step
+                            )
+                        )
                 except Exception as e:
                     print(f"Error in progress callback: {e}")
 
-            # Start the generation task in executor
-            future = loop.run_in_executor(
-                None,
-                lambda: get_generator().generate(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    height=height,
-                    width=width,
+            # Expand every item into one sample per requested image
+            prompts, negative_prompts, seeds = [], [], []
+            for item in batch:
+                seed = item.seed if item.seed is not None else random.randrange(2**32)
+                for idx in range(item.batch_size):
+                    prompts.append(item.prompt)
+                    negative_prompts.append(item.negative_prompt)
+                    seeds.append((seed + idx) % 2**32)
+
+            start_time = time.monotonic()
+
+            # Run the generation in executor
+            rendered_images = await loop.run_in_executor(
+                self._executor,
+                lambda: get_generator().generate_batch(
+                    prompts=prompts,
+                    negative_prompts=negative_prompts,
+                    seeds=seeds,
+                    height=head.height,
+                    width=head.width,
                     num_inference_steps=num_inference_steps,
-                    use_gpu=use_gpu,
-                    seed=seed,
-                    batch_size=batch_size,
-                    gpu_id=gpu_id,
-                    guidance_scale=guidance_scale,
-                    progress_callback=progress_callback
+                    guidance_scale=head.guidance_scale,
+                    progress_callback=progress_callback,
+                    device=slot.device,
+                    trace=trace
                 )
             )
 
-            # Process progress updates while waiting for generation to complete
-            image_info = None
-            while image_info is None:
-                try:
-                    # Wait for progress update with timeout
-                    update = await asyncio.wait_for(progress_queue.get(), timeout=0.1)
-                    await self._update_task(task_id, **update)
-                except asyncio.TimeoutError:
-                    # No update available, check if future is done
-                    if future.done():
-                        try:
-                            image_info = await future
-                        except Exception as e:
-                            raise e
-
-            # Process any remaining updates in queue
-            while not progress_queue.empty():
-                try:
-                    update = progress_queue.get_nowait()
-                    await self._update_task(task_id, **update)
-                except asyncio.QueueEmpty:
-                    break
+            completed = True
+            elapsed = time.monotonic() - start_time
+            metrics.images_generated.inc(len(rendered_images), device=slot.device)
+            logger.info(
+                f"Batch of {len(batch)} item(s) on {slot.device} rendered {len(rendered_images)} image(s) "
+                f"in {elapsed:.2f}s ({len(rendered_images) / max(elapsed, 1e-6):.2f} images/sec)"
+            )
+
+        except Exception as e:
+            for item in batch:
+                self._release_inflight(item)
+            for task_id in task_ids:
+                await self._item_failed(task_id, sum(item.owners.count(task_id) for item in batch), e)
+            return
+        finally:
+            slot.batch_finished(num_images, completed)
+
+        # Encoding runs in the background so the device can start the next batch
+        save_job = asyncio.ensure_future(self._save_batch(batch, rendered_images, slot.device, trace))
+        self._save_jobs.add(save_job)
+        save_job.add_done_callback(self._save_jobs.discard)
+
+    async def _save_batch(
+        self,
+        batch: List[_PendingTask],
+        rendered_images: List[RenderedImage],
+        device: str,
+        trace: Trace
+    ):
+        """Encode and save the images of a rendered batch, then hand them to their tasks."""
+        item_jobs = []
+        offset = 0
+        for item in batch:
+            item_jobs.append(self._save_item(item, rendered_images[offset:offset + item.batch_size], device, trace))
+            offset += item.batch_size
+        await asyncio.gather(*item_jobs)
+
+        if trace.sampled:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, trace.dump, Config.TRACES_DIR)
+            except Exception as e:
+                logger.warning(f"Error writing generation trace: {e}")
+
+    async def _save_item(self, item: _PendingTask, rendered_images: List[RenderedImage], device: str, trace: Trace):
+        """Encode and save the images of one work item."""
+        encoder = get_encoder()
+        start_time = time.perf_counter()
+        try:
+            self._apply_batch_progress(item.task_id, item.batch_size, "Encoding images...", 95, None)
+            saved = await asyncio.gather(*(
+                encoder.save(rendered.image, item.output) for rendered in rendered_images
+            ))
+            end_time = time.perf_counter()
+            trace.add("save", start_time, end_time, task_id=item.task_id, images=len(rendered_images))
+            update = {"queue_wait_ms": item.queue_wait_ms, "save_ms": (end_time - start_time) * 1000}
+            item_images = [
+                rendered.to_image_info(
+                    image_id, filename, size_bytes, encode_time, item.output,
+                    rendered.stages.model_copy(update=update) if rendered.stages else None
+                )
+                for rendered, (image_id, filename, size_bytes, encode_time) in zip(rendered_images, saved)
+            ]
+        except Exception as e:
+            self._release_inflight(item)
+            for owner in item.owners:
+                await self._item_failed(owner, 1, RuntimeError(f"Failed to save image: {str(e)}"))
+            return
+
+        get_metrics().save.observe(end_time - start_time, **item.metric_labels(device))
+        self._release_inflight(item)
+        get_thumbnail_cache().schedule(
+            (image, rendered.image) for image, rendered in zip(item_images, rendered_images)
+        )
+        await self._item_finished(item.task_id, item_images)
+        for follower in item.followers:
+            await self._item_finished(follower, item_images, reused=True)
 
-            # Save to history
-            await self._save_to_history(image_info)
+    def _release_inflight(self, item: _PendingTask):
+        """Stop sharing an item with identical requests."""
+        if item.result_keys is not None and self._inflight.get(item.result_keys) is item:
+            del self._inflight[item.result_keys]
 
-            # Update task as completed
+    def _apply_batch_progress(
+        self,
+        task_id: str,
+        batch_images: int,
+        message: str,
+        progress: int,
+        current_step: Optional[int]
+    ):
+        """Scale the progress of a running batch to the progress of one of its tasks."""
+        state = self._task_states.get(task_id)
+        task = self.tasks.get(task_id)
+        if state is None or task is None:
+            return
+
+        task_progress = (state.done_images + batch_images * progress / 100) / state.total_images * 100
+        self._apply_update(
+            task_id,
+            message=message,
+            progress=max(task.progress, min(int(task_progress), 99)),
+            current_step=current_step
+        )
+
+    async def _item_finished(self, task_id: str, images: List[ImageInfo], reused: bool = False):
+        """
+        Record the images of a finished work item and complete its task when it was the last one.
+
+        Args:
+            task_id: Task ID
+            images: Saved images of the item
+            reused: Whether the images belong to another task or the history already
+        """
+        state = self._task_states.get(task_id)
+        if state is None:
+            return
+
+        state.done_images += len(images)
+        if not reused:
+            state.new_images.extend(images)
+        state.remaining_items -= 1
+
+        async with self.lock:
+            task = self.tasks[task_id]
+            task.results.extend(images)
+            if task.result is None and images:
+                task.result = images[0]
+                task.stages = images[0].stages
+
+        if state.remaining_items > 0:
+            if self.tasks[task_id].status == TaskStatus.FAILED:
+                return
             await self._update_task(
                 task_id,
-                status=TaskStatus.COMPLETED,
-                message="Image generation completed",
-                progress=100,
-                current_step=num_inference_steps,
-                result=image_info
+                message=f"{state.done_images}/{state.total_images} image(s) generated",
+                progress=max(self.tasks[task_id].progress, int(state.done_images / state.total_images * 100))
             )
+            return
+
+        await self._finish_task(task_id)
+        if self.tasks[task_id].status == TaskStatus.FAILED:
+            return
+        await self._update_task(
+            task_id,
+            status=TaskStatus.COMPLETED,
+            message="Image generation completed",
+            progress=100,
+            current_step=self.tasks[task_id].total_steps
+        )
 
-        except Exception as e:
-            # Update task as failed
+    async def _item_failed(self, task_id: str, items: int, error: Exception):
+        """Fail the task of a work item whose batch raised."""
+        state = self._task_states.get(task_id)
+        if state is None:
+            return
+
+        state.remaining_items -= items
+        if self.tasks[task_id].status != TaskStatus.FAILED:
             await self._update_task(
                 task_id,
                 status=TaskStatus.FAILED,
-                message=f"Error: {str(e)}",
-                error=str(e)
+                message=f"Error: {str(error)}",
+                error=str(error)
             )
 
+        # The rest of the task will not be rendered
+        state.remaining_items -= self._drop_pending_items(task_id)
+
+        # Keep what was already rendered once no item of the task is running anymore
+        if state.remaining_items <= 0:
+            await self._finish_task(task_id)
+
+    def _drop_pending_items(self, task_id: str) -> int:
+        """
+        Withdraw a task from the queued work items and return how many items it had.
+
+        Items other tasks are following are handed over to the first of them
+        instead of being removed.
+        """
+        dropped = 0
+        for slot in self._device_pool.slots:
+            for item in list(slot.pending):
+                if task_id not in item.owners:
+                    continue
+                dropped += item.owners.count(task_id)
+                owners = [owner for owner in item.owners if owner != task_id]
+                if owners:
+                    item.task_id, item.followers = owners[0], owners[1:]
+                else:
+                    slot.pending.remove(item)
+                    self._release_inflight(item)
+        return dropped
+
+    async def _finish_task(self, task_id: str):
+        """Record the new images of a task in history with a single write."""
+        state = self._task_states.pop(task_id, None)
+        self._queued_task_ids.discard(task_id)
+        if state is not None and state.new_images:
+            await self._save_to_history(state.new_images)
+            get_result_cache().add(state.new_images)
+
     async def _update_task(
         self,
         task_id: str,
@@ -194,92 +723,120 @@ class TaskManager:
     ):
         """Update task status."""
         async with self.lock:
-            if task_id in self.tasks:
-                task = self.tasks[task_id]
-                if status is not None:
-                    task.status = status
-                if message is not None:
-                    task.message = message
-                if progress is not None:
-                    task.progress = progress
-                if current_step is not None:
-                    task.current_step = current_step
-                if result is not None:
-                    task.result = result
-                if error is not None:
-                    task.error = error
+            self._apply_update(
+                task_id,
+                status=status,
+                message=message,
+                progress=progress,
+                current_step=current_step,
+                result=result,
+                error=error
+            )
+
+    def _apply_update(
+        self,
+        task_id: str,
+        status: Optional[TaskStatus] = None,
+        message: Optional[str] = None,
+        progress: Optional[int] = None,
+        current_step: Optional[int] = None,
+        result: Optional[ImageInfo] = None,
+        error: Optional[str] = None,
+        queue_position: Optional[int] = None
+    ):
+        """Update task status and notify subscribers. Must run on the event loop."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return
+
+        if status is not None:
+            if status != task.status:
+                self._status_changed(task_id, task.status, status)
+            task.status = status
+            if status != TaskStatus.PENDING:
+                task.queue_position = None
+        if message is not None:
+            task.message = message
+        if progress is not None:
+            task.progress = progress
+        if current_step is not None:
+            task.current_step = current_step
+        if result is not None:
+            task.result = result
+        if error is not None:
+            task.error = error
+        if queue_position is not None:
+            task.queue_position = queue_position
+
+        self._publish(task)
+
+    def _status_changed(self, task_id: str, old: TaskStatus, new: TaskStatus):
+        """Count a status transition, and record the latency of a task that finished."""
+        self._status_counts[old] -= 1
+        self._status_counts[new] += 1
+        if new not in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            return
+
+        submitted = self._task_metrics.pop(task_id, None)
+        if submitted is None:
+            return
+        submitted_at, labels = submitted
+        metrics = get_metrics()
+        if new == TaskStatus.COMPLETED:
+            metrics.tasks_completed.inc(**labels)
+            metrics.task_duration.observe(time.monotonic() - submitted_at, **labels)
+        else:
+            metrics.tasks_failed.inc(**labels)
+
+    def _publish(self, task: TaskResponse):
+        """Push a snapshot of a task to its subscribers."""
+        subscribers = self._subscribers.get(task.task_id)
+        if not subscribers:
+            return
+
+        snapshot = task.model_copy(deep=True)
+        for queue in subscribers:
+            # Slow consumers only need the latest state, drop their oldest update
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """
+        Subscribe to the updates of a task.
+
+        Args:
+            task_id: Task ID
+
+        Returns:
+            asyncio.Queue: Queue receiving a TaskResponse snapshot per update
+        """
+        queue = asyncio.Queue(maxsize=Config.TASK_EVENT_QUEUE_SIZE)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        """Stop receiving the updates of a task."""
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[task_id]
 
     async def get_task(self, task_id: str) -> Optional[TaskResponse]:
         """Get task status by ID."""
         async with self.lock:
             return self.tasks.get(task_id)
 
-    async def _save_to_history(self, image_info: ImageInfo):
-        """Save image info to history file."""
+    async def _save_to_history(self, image_infos: List[ImageInfo]):
+        """Save image infos to the history store in a single write."""
         try:
-            # Read existing history
-            with open(Config.HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-
-            # Add new image
-            history['images'].append(image_info.model_dump())
-
-            # Cleanup old history
-            await self._cleanup_old_history(history)
-
-            # Write back
-            with open(Config.HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False, default=str)
-
-        except Exception as e:
-            print(f"Error saving to history: {e}")
-
-    async def _cleanup_old_history(self, history: dict):
-        """Clean up old history records and their image files."""
-        try:
-            import os
-            from datetime import timedelta
-
-            images = history['images']
-
-            # Sort by created_at (oldest first)
-            images.sort(key=lambda x: x['created_at'])
-
-            # Calculate cutoff date
-            cutoff_date = datetime.now() - timedelta(days=Config.MAX_HISTORY_DAYS)
-
-            # Keep only recent images within limits
-            kept_images = []
-            deleted_images = []
-
-            for img in images:
-                img_date = datetime.fromisoformat(img['created_at'])
-                should_keep = (
-                    img_date >= cutoff_date and
-                    len(kept_images) < Config.MAX_HISTORY_IMAGES
-                )
-
-                if should_keep:
-                    kept_images.append(img)
-                else:
-                    deleted_images.append(img)
-                    # Delete corresponding image file
-                    try:
-                        image_path = Config.IMAGES_DIR / img['filename']
-                        if image_path.exists():
-                            os.remove(image_path)
-                            print(f"Deleted old image file: {img['filename']}")
-                    except Exception as e:
-                        print(f"Error deleting image file {img['filename']}: {e}")
-
-            # Update history with kept images
-            history['images'] = kept_images
-
-            if deleted_images:
-                print(f"Cleaned up {len(deleted_images)} old history records")
-
+            get_history_store().add(image_infos)
+            # Expired records are removed by the retention job, not on save
+            get_retention_engine().notify_saved(image_infos)
         except Exception as e:
-            print(f"Error cleaning up history: {e}")
+            logger.error(f"Error saving to history: {e}")
 
 
 # Global singleton instance
@@ -0,0 +1,166 @@
+"""
+Thumbnail service.
+Renders small WebP derivatives of saved images for gallery tiles and
+previews, and keeps them on disk next to the originals.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import logging
+
+from PIL import Image
+
+from backend.models.config import Config
+from backend.models.schemas import ImageInfo
+from backend.services.encoder import get_encoder
+from backend.services.image_store import get_image_store
+
+logger = logging.getLogger(__name__)
+
+
+def render_thumbnails(source: Union[str, Image.Image], targets: List[Tuple[int, str]], quality: int) -> int:
+    """
+    Render thumbnails of an image and write them to disk.
+
+    Runs in a worker process. The source is decoded once and each thumbnail
+    is downscaled from the previous, larger one. Files are written under a
+    temporary name and renamed, so readers never see a partial thumbnail.
+
+    Args:
+        source: Path of the image file, or the image itself
+        targets: (size, path) of each thumbnail; the image is fit in a size x size square
+        quality: WebP quality
+
+    Returns:
+        int: Total bytes written
+    """
+    original = Image.open(source) if isinstance(source, str) else source
+    try:
+        image = original.convert("RGB")
+        written = 0
+        for size, path in sorted(targets, reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            tmp_path = f"{path}.tmp"
+            image.save(tmp_path, format="WEBP", quality=quality, method=4)
+            os.replace(tmp_path, path)
+            written += os.path.getsize(path)
+        return written
+    finally:
+        original.close()
+
+
+class ThumbnailCache:
+    """On-disk cache of image thumbnails.
+
+    Thumbnails of new images are rendered in the encoding processes right
+    after the originals are saved. Thumbnails of older images are rendered
+    when first requested. Concurrent requests for the same image share one
+    render.
+    """
+
+    def __init__(self, directory: Path, sizes: List[int], quality: int):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Root directory of the thumbnails, with one subdirectory per size
+            sizes: Thumbnail sizes in pixels
+            quality: WebP quality
+        """
+        self.directory = directory
+        self.sizes = sorted(set(sizes))
+        self.quality = quality
+        for size in self.sizes:
+            (directory / str(size)).mkdir(parents=True, exist_ok=True)
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Keeps scheduled renders from being garbage collected
+        self._jobs: Set[asyncio.Task] = set()
+
+    def path(self, image_id: str, size: int) -> Path:
+        """Get the file path of a thumbnail."""
+        return self.directory / str(size) / f"{image_id}.webp"
+
+    def urls(self, image_id: str) -> Dict[int, str]:
+        """Get the URL of every thumbnail size of an image."""
+        return {size: f"{Config.API_PREFIX}/thumbnails/{image_id}?size={size}" for size in self.sizes}
+
+    async def get(self, image: ImageInfo, size: int) -> Path:
+        """
+        Get the path of a thumbnail, rendering the missing sizes of the image first.
+
+        Args:
+            image: Image record
+            size: One of the configured sizes
+
+        Returns:
+            Path: Thumbnail file
+        """
+        path = self.path(image.id, size)
+        if not path.exists():
+            await self._render(image)
+            if not path.exists():
+                # A render that was already running when this size went missing
+                await self._render(image)
+        return path
+
+    def schedule(self, images: Iterable[Tuple[ImageInfo, Optional[Image.Image]]]):
+        """
+        Render the thumbnails of saved images in the background.
+
+        Args:
+            images: Image records, each with its rendered image to skip decoding the file, or None
+        """
+        for image, source in images:
+            job = asyncio.ensure_future(self._render(image, source))
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+
+    async def _render(self, image: ImageInfo, source: Optional[Image.Image] = None):
+        """Render the missing thumbnails of an image, or wait for the render in progress."""
+        pending = self._pending.get(image.id)
+        if pending is not None:
+            await asyncio.shield(pending)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[image.id] = future
+        try:
+            targets = [
+                (size, str(self.path(image.id, size))) for size in self.sizes
+                if not self.path(image.id, size).exists()
+            ]
+            if targets:
+                if source is None:
+                    source = str(get_image_store().path(image.filename))
+                await get_encoder().run(render_thumbnails, source, targets, self.quality)
+        except Exception as e:
+            logger.warning(f"Error rendering thumbnails of {image.filename}: {e}")
+        finally:
+            del self._pending[image.id]
+            future.set_result(None)
+
+    def remove(self, image_ids: Iterable[str]):
+        """Delete the thumbnails of images."""
+        for image_id in image_ids:
+            for size in self.sizes:
+                try:
+                    os.remove(self.path(image_id, size))
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Error deleting thumbnail of {image_id}: {e}")
+
+
+# Global singleton instance
+_thumbnail_cache = ThumbnailCache(
+    directory=Config.THUMBNAILS_DIR,
+    sizes=Config.THUMBNAIL_SIZES,
+    quality=Config.THUMBNAIL_QUALITY
+)
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Get the global thumbnail cache instance."""
+    return _thumbnail_cache
@@ -0,0 +1,218 @@
+"""
+Generation tracing.
+Records timed spans of the stages of a render (text encoding, every
+denoising step, VAE decode, saving), summarizes them per image and dumps
+a sampled fraction of the traces as Chrome trace files.
+"""
+import functools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional
+import logging
+
+from backend.models.config import Config
+from backend.models.schemas import StageTimings
+
+logger = logging.getLogger(__name__)
+
+# Thread the trace of the running render is active on
+_local = threading.local()
+
+
+@dataclass
+class Span:
+    """A timed stage, in time.perf_counter seconds."""
+    name: str
+    start: float
+    end: float
+    thread: int
+    args: dict = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+
+class Trace:
+    """Spans of one generation batch.
+
+    With synchronize set, the clock waits for the CUDA queue of the device
+    before every reading, so spans cover the GPU work they launch rather
+    than just the launches.
+    """
+
+    def __init__(self, device: str, sampled: bool = False, synchronize: bool = False):
+        """
+        Initialize the trace.
+
+        Args:
+            device: Torch device string the batch renders on
+            sampled: Whether the trace is dumped to a file
+            synchronize: Whether to synchronize CUDA at span boundaries
+        """
+        self.trace_id = uuid.uuid4().hex
+        self.device = device
+        self.sampled = sampled
+        self.synchronize = synchronize and device.startswith("cuda")
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """Read the clock once the device has caught up."""
+        if self.synchronize:
+            import torch
+            torch.cuda.synchronize(self.device)
+        return time.perf_counter()
+
+    def add(self, name: str, start: float, end: float, **args):
+        """Record a span measured by the caller."""
+        with self._lock:
+            self.spans.append(Span(name, start, end, threading.get_ident(), args))
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        """Record the block as a span."""
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.now(), **args)
+
+    def durations_ms(self, name: str) -> List[float]:
+        """Get the duration of every span of a stage, in recording order."""
+        with self._lock:
+            return [span.duration_ms for span in self.spans if span.name == name]
+
+    def total_ms(self, name: str) -> Optional[float]:
+        """Get the summed duration of a stage, None if it was not recorded."""
+        durations = self.durations_ms(name)
+        return sum(durations) if durations else None
+
+    def stages(self) -> StageTimings:
+        """Summarize the render stages recorded so far."""
+        return StageTimings(
+            text_encode_ms=self.total_ms("text_encode"),
+            denoise_ms=self.total_ms("denoise"),
+            step_ms=self.durations_ms("step"),
+            vae_decode_ms=self.total_ms("vae_decode"),
+            trace_id=self.trace_id if self.sampled else None
+        )
+
+    def to_chrome_trace(self) -> dict:
+        """Convert the spans to the Chrome trace event format."""
+        with self._lock:
+            spans = list(self.spans)
+        origin = min((span.start for span in spans), default=0.0)
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_names.get(tid, str(tid))}}
+            for tid in dict.fromkeys(span.thread for span in spans)
+        ]
+        for span in spans:
+            events.append({
+                "name": span.name,
+                "cat": "zimage",
+                "ph": "X",
+                "ts": (span.start - origin) * 1e6,
+                "dur": (span.end - span.start) * 1e6,
+                "pid": pid,
+                "tid": span.thread,
+                "args": span.args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "device": self.device},
+        }
+
+    def dump(self, directory: Path) -> Path:
+        """
+        Write the trace as a Chrome trace file, viewable in chrome://tracing or Perfetto.
+
+        Args:
+            directory: Directory of the trace files
+
+        Returns:
+            Path: The written file
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.trace_id}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f)
+        prune_traces(directory, Config.TRACE_MAX_FILES)
+        logger.info(f"Wrote generation trace {path.name}")
+        return path
+
+
+def prune_traces(directory: Path, max_files: int):
+    """Remove the oldest trace files beyond max_files."""
+    files = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    for path in files[:max(len(files) - max_files, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def new_trace(device: str) -> Trace:
+    """Start the trace of a batch, sampled for a file at Config.TRACE_SAMPLE_RATE."""
+    sampled = random.random() < Config.TRACE_SAMPLE_RATE
+    return Trace(device, sampled=sampled, synchronize=sampled or Config.TRACE_CUDA_SYNC)
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    """Make a trace the one spans of the current thread are recorded to."""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace active on the current thread."""
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name: str, **args) -> Iterator[None]:
+    """Record the block as a span of the active trace, if any."""
+    trace = current_trace()
+    if trace is None:
+        yield
+    else:
+        with trace.span(name, **args):
+            yield
+
+
+def instrument(obj, method: str, name: str):
+    """
+    Record every call of a method of an object as a span of the active trace.
+
+    Used for stages that run inside the pipeline call, such as the VAE
+    decode. Calls made while no trace is active are not affected.
+
+    Args:
+        obj: Object whose method is wrapped
+        method: Method name
+        name: Span name
+    """
+    original = getattr(obj, method)
+    if getattr(original, "_traced", False):
+        return
+
+    @functools.wraps(original)
+    def traced(*args, **kwargs):
+        with span(name):
+            return original(*args, **kwargs)
+
+    traced._traced = True
+    setattr(obj, method, traced)
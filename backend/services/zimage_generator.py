@@ -0,0 +1,505 @@
+"""
+Z-Image generator backends.
+Wraps the Z-Image Pipeline for async task execution, with one replica per
+device, and a miniature randomly initialized variant for load tests.
+"""
+import torch
+from contextlib import nullcontext
+import time
+import random
+import threading
+from typing import TYPE_CHECKING, Optional, Callable, Dict, List, Tuple
+import logging
+
+from backend.models.config import Config
+from backend.services import cpu_engine, tracing
+from backend.services.generator import GeneratorBackend, RenderedImage
+from backend.services.metrics import get_metrics, resolution_bucket
+from backend.services.prompt_cache import get_prompt_cache
+
+if TYPE_CHECKING:
+    # Imported on first load, so the module imports without diffusers
+    from diffusers import ZImagePipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ImageGenerator(GeneratorBackend):
+    """Singleton class for Z-Image model loading and inference.
+
+    One pipeline replica is kept per device ("cuda:0", "cuda:1", ..., "cpu"),
+    each loaded lazily the first time a batch is dispatched to that device.
+    """
+
+    name = "zimage"
+    # Prompt embeddings and results are cached under the model name
+    model_name = Config.MODEL_NAME
+    # Name of the load phase that creates the pipeline
+    build_phase = "from_pretrained"
+
+    _instance = None
+    _pipelines: Dict[str, "ZImagePipeline"]
+    _load_locks: Dict[str, threading.Lock]
+    _render_locks: Dict[str, threading.Lock]
+    _precisions: Dict[str, str]
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._pipelines = {}
+            cls._instance._load_locks = {}
+            cls._instance._render_locks = {}
+            cls._instance._load_timings = []
+            cls._instance._precisions = {}
+            cpu_engine.configure_threads()
+            cls._instance._locks_guard = threading.Lock()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the generator (singleton pattern)."""
+        pass  # Lazy loading
+
+    def loaded_devices(self) -> List[str]:
+        """Get the devices that have a loaded pipeline replica."""
+        return list(self._pipelines)
+
+    def load(self, device: str):
+        """
+        Load the replica of a device ahead of its first request.
+
+        Args:
+            device: Torch device string
+        """
+        self._load_model(device)
+
+    def unload(self, device: str):
+        """
+        Drop the replica of a device, it is loaded again on next use.
+
+        Args:
+            device: Torch device string
+        """
+        with self._locks_guard:
+            load_lock = self._load_locks.setdefault(device, threading.Lock())
+        with load_lock:
+            self._pipelines.pop(device, None)
+            self._precisions.pop(device, None)
+        if device.startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def memory_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Get the allocated and reserved bytes of every CUDA device with a loaded replica."""
+        return {
+            device: (torch.cuda.memory_allocated(device), torch.cuda.memory_reserved(device))
+            for device in list(self._pipelines)
+            if device.startswith("cuda")
+        }
+
+    def precision(self, device: str) -> Optional[str]:
+        """Get the precision the replica of a device runs at, None if not loaded."""
+        return self._precisions.get(device)
+
+    def target_precision(self, device: str) -> str:
+        """Get the precision the replica of a device runs at, or will run at once loaded."""
+        precision = self._precisions.get(device)
+        if precision is not None:
+            return precision
+        # CPU weights stay float32, reduced precision comes from autocast or quantization
+        return "bfloat16" if device.startswith("cuda") else cpu_engine.resolve_precision(Config.CPU_PRECISION)
+
+    def _build_pipeline(self, dtype: torch.dtype) -> "ZImagePipeline":
+        """Load the pipeline weights on the CPU."""
+        from diffusers import ZImagePipeline
+        return ZImagePipeline.from_pretrained(
+            Config.MODEL_NAME,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=False,
+            local_files_only=True,  # 使用本地已下载的模型，避免网络检查
+        )
+
+    def _load_model(self, device: str, progress_callback: Optional[Callable[..., None]] = None) -> "ZImagePipeline":
+        """Load the Z-Image replica for a device if not already loaded."""
+        pipeline = self._pipelines.get(device)
+        if pipeline is not None:
+            return pipeline
+
+        with self._locks_guard:
+            load_lock = self._load_locks.setdefault(device, threading.Lock())
+
+        # Only one thread loads a given replica, the others wait for it
+        with load_lock:
+            pipeline = self._pipelines.get(device)
+            if pipeline is not None:
+                return pipeline
+
+            if progress_callback:
+                progress_callback(f"Loading Z-Image model on {device}...", 0)
+
+            use_cuda = device.startswith("cuda")
+            # CPU weights stay float32, reduced precision comes from autocast or quantization
+            dtype = torch.bfloat16 if use_cuda else torch.float32
+            precision = self.target_precision(device)
+
+            # Load pipeline
+            try:
+                load_start = phase_start = time.perf_counter()
+                pipeline = self._build_pipeline(dtype)
+                phase_start = self._record_phase(device, self.build_phase, phase_start)
+
+                if progress_callback:
+                    progress_callback(f"Model loaded, moving to {device}", 10)
+
+                # Move to device with correct dtype
+                pipeline.to(device, dtype=dtype)
+                if use_cuda:
+                    torch.cuda.synchronize(device)
+                phase_start = self._record_phase(device, "to_device", phase_start)
+
+                # 启用性能优化
+                if use_cuda:
+                    # 尝试使用 Flash Attention，如果不可用则使用 native 后端
+                    try:
+                        pipeline.transformer.set_attention_backend("flash")
+                        if progress_callback:
+                            progress_callback("Flash Attention enabled", 15)
+                    except Exception as e:
+                        # Flash Attention 不可用，使用 native 后端（PyTorch 原生优化）
+                        try:
+                            pipeline.transformer.set_attention_backend("native")
+                            if progress_callback:
+                                progress_callback("Native attention enabled", 15)
+                        except Exception as e2:
+                            if progress_callback:
+                                progress_callback(f"Attention backend not available: {str(e2)}", 15)
+
+                    # 启用内存优化
+                    pipeline.enable_attention_slicing()
+                    if progress_callback:
+                        progress_callback("Attention slicing enabled", 18)
+
+                else:
+                    cpu_engine.optimize_pipeline(pipeline, precision)
+                    if progress_callback:
+                        progress_callback(f"CPU profile applied ({precision})", 18)
+
+                if Config.TORCH_COMPILE:
+                    # Compilation itself happens on the first call, i.e. during warmup
+                    pipeline.transformer = torch.compile(pipeline.transformer, mode=Config.TORCH_COMPILE_MODE)
+                    if progress_callback:
+                        progress_callback(f"Transformer compiled ({Config.TORCH_COMPILE_MODE})", 19)
+                self._record_phase(device, "optimize", phase_start)
+
+                # The decode runs inside the pipeline call, a hook times it for the active trace
+                tracing.instrument(pipeline.vae, "decode", "vae_decode")
+
+                self._pipelines[device] = pipeline
+                self._precisions[device] = precision
+                get_metrics().model_load.observe(time.perf_counter() - load_start, device=device)
+                if progress_callback:
+                    progress_callback("Model ready", 20)
+                return pipeline
+
+            except Exception as e:
+                if progress_callback:
+                    progress_callback(f"Model loading failed: {str(e)}", 0)
+                raise RuntimeError(f"Failed to load model: {str(e)}")
+
+    def _encode_prompts(self, pipeline: "ZImagePipeline", device: str, texts: List[str]) -> List[torch.Tensor]:
+        """
+        Encode prompts with the text encoder, reusing cached embeddings.
+
+        Args:
+            pipeline: Pipeline replica whose text encoder is used
+            device: Device the embeddings are needed on
+            texts: Prompts to encode
+
+        Returns:
+            List[torch.Tensor]: One embedding per prompt, in order
+        """
+        cache = get_prompt_cache()
+        max_length = Config.PROMPT_MAX_SEQUENCE_LENGTH
+        # Embeddings of replicas running at different precisions are not interchangeable
+        keys = [(self.model_name, self._precisions[device], text, max_length) for text in texts]
+
+        embeddings = [cache.get(key, device) if cache.enabled else None for key in keys]
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # Encode each distinct missing prompt once
+            unique_texts = list(dict.fromkeys(texts[idx] for idx in missing))
+            with torch.no_grad():
+                encoded, _ = pipeline.encode_prompt(
+                    prompt=list(unique_texts),
+                    device=device,
+                    do_classifier_free_guidance=False,
+                    max_sequence_length=max_length,
+                )
+            encoded_by_text = dict(zip(unique_texts, encoded))
+            for idx in missing:
+                embeddings[idx] = encoded_by_text[texts[idx]]
+            if cache.enabled:
+                for text, embedding in encoded_by_text.items():
+                    cache.put((self.model_name, self._precisions[device], text, max_length), embedding)
+
+        return embeddings
+
+    @staticmethod
+    def _profile(trace: tracing.Trace):
+        """Run torch.profiler over a sampled render when enabled, writing its trace next to the span trace."""
+        if not (trace.sampled and Config.TRACE_TORCH_PROFILER):
+            return nullcontext()
+
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if trace.device.startswith("cuda"):
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        Config.TRACES_DIR.mkdir(parents=True, exist_ok=True)
+        path = Config.TRACES_DIR / f"{trace.trace_id}.torch.json"
+        return torch.profiler.profile(
+            activities=activities,
+            on_trace_ready=lambda profiler: profiler.export_chrome_trace(str(path))
+        )
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[Optional[int]],
+        height: int = 1024,
+        width: int = 1024,
+        num_inference_steps: int = 9,
+        use_gpu: bool = True,
+        gpu_id: int = 0,
+        guidance_scale: float = 0.0,
+        progress_callback: Optional[Callable[..., None]] = None,
+        device: Optional[str] = None,
+        trace: Optional[tracing.Trace] = None
+    ) -> List["RenderedImage"]:
+        """
+        Generate one image per prompt in a single pipeline call, without saving.
+
+        All samples share the same resolution, step count and guidance scale;
+        each sample has its own prompt, negative prompt and seed, so the
+        output of every sample is the same as rendering it on its own.
+
+        Args:
+            prompts: Text prompt of each sample
+            negative_prompts: Negative prompt of each sample
+            seeds: Random seed of each sample (None for a random seed)
+            height: Image height in pixels
+            width: Image width in pixels
+            num_inference_steps: Number of inference steps
+            use_gpu: Whether to use GPU
+            gpu_id: GPU device ID
+            guidance_scale: Guidance scale for CFG
+            progress_callback: Callback function for progress updates (message, progress_percent[, current_step])
+            device: Device to render on, derived from use_gpu/gpu_id when omitted
+            trace: Trace the stages are recorded to, a new one when omitted
+
+        Returns:
+            List[RenderedImage]: Rendered images with their parameters, in sample order
+        """
+        if device is None:
+            device = self.resolve_device(use_gpu, gpu_id)
+        if trace is None:
+            trace = tracing.new_trace(device)
+
+        # Load model if not loaded
+        pipeline = self._load_model(device, progress_callback)
+
+        if progress_callback and device != "cpu":
+            progress_callback(f"Using GPU device: {device}", 25)
+
+        if progress_callback:
+            progress_callback("Starting image generation...", 30)
+
+        # Generate seeds if not provided
+        seeds = [seed if seed is not None else random.randrange(2**32) for seed in seeds]
+
+        # One generator per sample keeps every sample reproducible from its own seed
+        generators = [torch.Generator(device).manual_seed(seed) for seed in seeds]
+
+        # A replica and its scheduler are not thread-safe, renders on one device take turns
+        with self._locks_guard:
+            render_lock = self._render_locks.setdefault(device, threading.Lock())
+        with render_lock:
+            return self._render(
+                pipeline, device, prompts, negative_prompts, seeds, height, width,
+                num_inference_steps, guidance_scale, generators, progress_callback, trace
+            )
+
+    def _render(
+        self,
+        pipeline: "ZImagePipeline",
+        device: str,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[int],
+        height: int,
+        width: int,
+        num_inference_steps: int,
+        guidance_scale: float,
+        generators: List[torch.Generator],
+        progress_callback: Optional[Callable[..., None]],
+        trace: tracing.Trace
+    ) -> List[RenderedImage]:
+        """Run the pipeline on a batch, with the render lock of the device held."""
+        # End of the previous denoising step, the first one starts with the pipeline call
+        step_start = [0.0]
+
+        def on_step_end(pipe, step: int, timestep, callback_kwargs: dict) -> dict:
+            """Record the step and report denoising progress after every step (30% -> 90%)."""
+            now = trace.now()
+            trace.add("step", step_start[0], now, step=step + 1)
+            step_start[0] = now
+            if progress_callback:
+                progress_callback(
+                    f"Denoising step {step + 1}/{num_inference_steps}",
+                    30 + 60 * (step + 1) // num_inference_steps,
+                    step + 1
+                )
+            return callback_kwargs
+
+        # Start timing
+        start_time = time.time()
+
+        # Generate image(s)
+        try:
+            # bfloat16 autocast or nothing, depending on the CPU profile
+            with self._profile(trace), tracing.activate(trace), \
+                    cpu_engine.inference_context(device, self._precisions[device]):
+                # Text embeddings come from the shared cache, the pipeline skips its own encoding
+                with trace.span("text_encode", prompts=len(prompts)):
+                    prompt_embeds = self._encode_prompts(pipeline, device, list(prompts))
+                    negative_prompt_embeds = None
+                    if guidance_scale > 1:
+                        # Negative prompts only matter when classifier-free guidance is active
+                        negative_prompt_embeds = self._encode_prompts(
+                            pipeline, device, [negative or "" for negative in negative_prompts]
+                        )
+
+                pipeline_start = step_start[0] = trace.now()
+                result = pipeline(
+                    prompt_embeds=prompt_embeds,
+                    negative_prompt_embeds=negative_prompt_embeds,
+                    max_sequence_length=Config.PROMPT_MAX_SEQUENCE_LENGTH,
+                    height=height,
+                    width=width,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    generator=generators,
+                    num_images_per_prompt=1,
+                    callback_on_step_end=on_step_end,
+                ).images
+                pipeline_end = trace.now()
+                trace.add("pipeline", pipeline_start, pipeline_end, width=width, height=height, images=len(prompts))
+                trace.add("denoise", pipeline_start, step_start[0], steps=num_inference_steps)
+                get_metrics().denoise.observe(
+                    pipeline_end - pipeline_start,
+                    resolution=resolution_bucket(width, height),
+                    steps=num_inference_steps,
+                    device=device
+                )
+
+            # Calculate generation time
+            generation_time = (time.time() - start_time) * 1000  # Convert to ms
+
+            if progress_callback:
+                progress_callback(f"{len(result)} image(s) generated successfully", 90)
+            stages = trace.stages()
+
+        except Exception as e:
+            if progress_callback:
+                progress_callback(f"Generation failed: {str(e)}", 0)
+            raise RuntimeError(f"Failed to generate image: {str(e)}")
+
+        return [
+            RenderedImage(
+                image=image,
+                prompt=prompts[idx],
+                negative_prompt=negative_prompts[idx],
+                seed=seeds[idx],
+                width=width,
+                height=height,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                use_gpu=device != "cpu",
+                generation_time_ms=generation_time,
+                stages=stages,
+                model=self.model_name,
+                precision=self._precisions[device]
+            )
+            for idx, image in enumerate(result)
+        ]
+
+
+class TinyImageGenerator(ImageGenerator):
+    """Z-Image pipeline with miniature, randomly initialized components.
+
+    Runs the real pipeline code (text encoding, denoising loop, VAE decode)
+    in a fraction of the time and memory and without the model weights, so
+    load tests exercise the whole stack on CPU-only machines. Only the
+    tokenizer is loaded, from TINY_TOKENIZER or the Z-Image repository.
+    The images are noise.
+    """
+
+    name = "tiny"
+    model_name = "tiny-random"
+    build_phase = "random_init"
+
+    _instance = None
+
+    def _build_pipeline(self, dtype: torch.dtype) -> "ZImagePipeline":
+        """Create the miniature pipeline with fixed random weights."""
+        from diffusers import AutoencoderKL, FlowMatchEulerDiscreteScheduler, ZImagePipeline, ZImageTransformer2DModel
+        from transformers import AutoTokenizer, Qwen3Config, Qwen3Model
+
+        if Config.TINY_TOKENIZER:
+            tokenizer = AutoTokenizer.from_pretrained(Config.TINY_TOKENIZER)
+        else:
+            tokenizer = AutoTokenizer.from_pretrained(Config.MODEL_NAME, subfolder="tokenizer")
+
+        # Same weights on every replica and every run
+        torch.manual_seed(0)
+        text_encoder = Qwen3Model(Qwen3Config(
+            vocab_size=len(tokenizer),
+            hidden_size=32,
+            intermediate_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            num_key_value_heads=1,
+            head_dim=16,
+            max_position_embeddings=Config.PROMPT_MAX_SEQUENCE_LENGTH
+        ))
+        transformer = ZImageTransformer2DModel(
+            all_patch_size=(2,),
+            all_f_patch_size=(1,),
+            in_channels=16,
+            dim=64,
+            n_layers=2,
+            n_refiner_layers=1,
+            n_heads=2,
+            n_kv_heads=2,
+            cap_feat_dim=32,
+            axes_dims=[8, 12, 12],
+            axes_lens=[1024, 512, 512]
+        )
+        # Four blocks keep the 8x downscaling of the real VAE
+        vae = AutoencoderKL(
+            in_channels=3,
+            out_channels=3,
+            down_block_types=("DownEncoderBlock2D",) * 4,
+            up_block_types=("UpDecoderBlock2D",) * 4,
+            block_out_channels=(8, 8, 16, 16),
+            layers_per_block=1,
+            latent_channels=16,
+            norm_num_groups=8,
+            scaling_factor=1.0,
+            shift_factor=0.0
+        )
+        # Cast to dtype with the move to the device
+        return ZImagePipeline(
+            scheduler=FlowMatchEulerDiscreteScheduler(shift=3.0),
+            vae=vae,
+            text_encoder=text_encoder,
+            tokenizer=tokenizer,
+            transformer=transformer
+        )
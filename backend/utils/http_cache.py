@@ -0,0 +1,312 @@
+"""
+HTTP caching for generated files.
+Serves image files with content-hash ETags, long-lived immutable caching,
+304 Not Modified and single byte ranges, and counts the bytes it saved.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import PurePosixPath
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from backend.models.schemas import HttpCacheStats
+
+# Generated files never change under their URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Memoized content hashes, keyed by path and validated by mtime and size
+ETAG_CACHE_SIZE = 4096
+CHUNK_SIZE = 64 * 1024
+
+# Name of a content-addressed file: the hex SHA-256 of its content
+_CONTENT_ADDRESS = re.compile(r"[0-9a-f]{64}")
+
+
+class TransferStats:
+    """Counters of the file responses and the bytes they did not have to send."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._not_modified = 0
+        self._partial = 0
+        self._bytes_sent = 0
+        self._bytes_saved = 0
+
+    def record(self, file_size: int, bytes_sent: int, not_modified: bool = False, partial: bool = False):
+        """Count a file response."""
+        with self._lock:
+            self._requests += 1
+            self._not_modified += not_modified
+            self._partial += partial
+            self._bytes_sent += bytes_sent
+            self._bytes_saved += file_size - bytes_sent
+
+    def get_stats(self) -> HttpCacheStats:
+        """Get the transfer counters."""
+        with self._lock:
+            return HttpCacheStats(
+                requests=self._requests,
+                not_modified=self._not_modified,
+                partial=self._partial,
+                bytes_sent=self._bytes_sent,
+                bytes_saved=self._bytes_saved,
+                not_modified_rate=self._not_modified / self._requests if self._requests else 0.0
+            )
+
+
+class _ETagCache:
+    """Strong ETags from file content, hashed once per file version."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[:2] != (stat_result.st_mtime_ns, stat_result.st_size):
+                return None
+            self._entries.move_to_end(path)
+            return entry[2]
+
+    def put(self, path: str, stat_result: os.stat_result, etag: str):
+        with self._lock:
+            self._entries[path] = (stat_result.st_mtime_ns, stat_result.st_size, etag)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+def _hash_file(path: str) -> str:
+    """Hash the content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+def address_etag(filename: str) -> Optional[str]:
+    """
+    Get the strong ETag of a content-addressed file from its name, without reading it.
+
+    Args:
+        filename: File name or path
+
+    Returns:
+        Quoted ETag, None if the file is not named by the SHA-256 of its content
+    """
+    stem = PurePosixPath(filename).stem
+    return f'"{stem}"' if _CONTENT_ADDRESS.fullmatch(stem) else None
+
+
+async def content_etag(path: str, stat_result: os.stat_result) -> str:
+    """
+    Get the strong ETag of a file, hashing it off the event loop on first use.
+
+    Args:
+        path: File path
+        stat_result: Current stat of the file
+
+    Returns:
+        str: Quoted ETag
+    """
+    etag = _etag_cache.get(path, stat_result)
+    if etag is None:
+        etag = await anyio.to_thread.run_sync(_hash_file, path)
+        _etag_cache.put(path, stat_result, etag)
+    return etag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag, using weak comparison."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """Whether the client's cached copy is current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header.
+
+    Args:
+        header: Range header value
+        size: File size in bytes
+
+    Returns:
+        (start, end) inclusive byte positions, None to send the whole file
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        # Unknown units and multipart ranges are served as a whole file
+        return None
+
+    first, sep, last = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                # An invalid range is ignored rather than unsatisfiable (RFC 9110, 14.2)
+                return None
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start > end or start >= size:
+        raise ValueError(f"Range not satisfiable: {header}")
+    return start, min(end, size - 1)
+
+
+async def _read_range(path: str, start: int, end: int):
+    """Stream the inclusive byte range of a file."""
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def send_file(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    stat_result: Optional[os.stat_result] = None,
+    etag: Optional[str] = None
+) -> Response:
+    """
+    Build the response of an immutable file.
+
+    Answers conditional requests with 304 and a Range request with 206.
+
+    Args:
+        request: Incoming request
+        path: File path
+        media_type: Content type, guessed from the path when omitted
+        filename: Download file name, sent as an attachment when given
+        stat_result: Stat of the file, taken when omitted
+        etag: Strong ETag of the file, hashed from its content when omitted
+
+    Returns:
+        Response: 200, 206, 304 or 416 response
+    """
+    if stat_result is None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    size = stat_result.st_size
+    etag = etag or await content_etag(path, stat_result)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, stat_result):
+        _transfer_stats.record(size, 0, not_modified=True)
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A range of an older version of the file would be corrupt, so If-Range falls back to the whole file
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            _transfer_stats.record(0, 0)
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        _transfer_stats.record(size, 0 if request.method == "HEAD" else size)
+        return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat_result)
+
+    start, end = byte_range
+    length = end - start + 1
+    _transfer_stats.record(size, 0 if request.method == "HEAD" else length, partial=True)
+    headers.update({
+        "content-range": f"bytes {start}-{end}/{size}",
+        "content-length": str(length),
+    })
+    if filename is not None:
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files served through send_file.
+
+    With content_addressed set, files named by the SHA-256 of their content
+    get it as their ETag instead of being hashed.
+    """
+
+    def __init__(self, *args, content_addressed: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.content_addressed = content_addressed
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+            except OSError:
+                # Left to the default handling below
+                stat_result = None
+            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                etag = address_etag(path) if self.content_addressed else None
+                return await send_file(Request(scope), full_path, stat_result=stat_result, etag=etag)
+        return await super().get_response(path, scope)
+
+
+# Global singleton instances
+_etag_cache = _ETagCache(max_entries=ETAG_CACHE_SIZE)
+_transfer_stats = TransferStats()
+
+
+def get_transfer_stats() -> TransferStats:
+    """Get the global file transfer counters."""
+    return _transfer_stats
@@ -0,0 +1,421 @@
+"""
+Offline API benchmark suite.
+
+Runs the application in process, without a GPU or model weights, on the
+synthetic generator backend, and measures:
+    - task submission throughput and the time to drain the queue
+    - task status and system status poll latency
+    - history listing, download and delete latency
+    - the cost of a retention cleanup
+at each history size. Every size runs in its own process against a fresh
+temporary data directory, so the real data directory is never touched.
+
+The report is JSON; pass two reports to --compare to see the change of
+every measurement between versions.
+
+Usage:
+    python -m benchmarks.api_suite --sizes 1000,10000,100000 --output report.json
+    python -m benchmarks.api_suite --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Distinct image files the history records point to
+SEED_FILES = 100
+
+
+def summarize(samples: List[float]) -> dict:
+    """Median, 95th percentile and mean of latency samples in ms."""
+    ordered = sorted(samples)
+    return {
+        "median_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        "mean_ms": statistics.fmean(ordered),
+        "samples": len(ordered),
+    }
+
+
+class ASGIClient:
+    """Minimal in-process HTTP client of an ASGI app, so no socket time is measured."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a request and read the whole response.
+
+        Returns:
+            Tuple[int, Dict[str, str], bytes]: Status, headers and body
+        """
+        path, _, query = path.partition("?")
+        payload = json.dumps(body).encode() if body is not None else b""
+        request_headers = [(b"host", b"bench")]
+        if body is not None:
+            request_headers.append((b"content-type", b"application/json"))
+        for name, value in (headers or {}).items():
+            request_headers.append((name.lower().encode(), value.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": request_headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+
+        sent = False
+        finished = asyncio.Event()
+        status = 0
+        response_headers: Dict[str, str] = {}
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            # Streaming responses listen for a disconnect while they send
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.update((name.decode(), value.decode()) for name, value in message["headers"])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        return status, response_headers, b"".join(chunks)
+
+    async def json(self, method: str, path: str, body: Optional[dict] = None) -> dict:
+        """Send a request and decode its JSON response."""
+        status, _, content = await self.request(method, path, body)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} returned {status}: {content[:200]!r}")
+        return json.loads(content)
+
+
+async def timed(client: ASGIClient, repeat: int, method: str, path_factory, body_factory=None, headers=None) -> dict:
+    """Latency of a request repeated with a path (and body) per call."""
+    samples = []
+    for idx in range(repeat):
+        path = path_factory(idx) if callable(path_factory) else path_factory
+        body = body_factory(idx) if body_factory else None
+        start_time = time.perf_counter()
+        status, _, _ = await client.request(method, path, body, headers)
+        samples.append((time.perf_counter() - start_time) * 1000)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} returned {status}")
+    return summarize(samples)
+
+
+def configure(data_dir: Path):
+    """
+    Point the configuration at a temporary data directory.
+
+    Must run before any service module is imported, since their singletons
+    read the configuration when they are created.
+    """
+    from backend.models.config import Config
+    Config.DATA_DIR = data_dir
+    Config.IMAGES_DIR = data_dir / "images"
+    Config.THUMBNAILS_DIR = data_dir / "thumbnails"
+    Config.TRACES_DIR = data_dir / "traces"
+    Config.HISTORY_FILE = data_dir / "history.json"
+    Config.HISTORY_DB = data_dir / "history.db"
+    Config.HISTORY_JOURNAL = data_dir / "history.journal"
+    Config.ensure_directories()
+
+
+def seed_history(records: int):
+    """Write SEED_FILES image files and `records` history records pointing to them, one per minute up to now."""
+    import hashlib
+    import io
+    import uuid
+    from PIL import Image
+    from backend.models.config import Config
+    from backend.models.schemas import ImageInfo
+    from backend.services.history_store import get_history_store
+    from backend.services.image_store import content_filename
+
+    filenames = []
+    for idx in range(SEED_FILES):
+        buffer = io.BytesIO()
+        Image.new("RGB", (256, 256), (idx, 255 - idx, 128)).save(buffer, format="PNG")
+        data = buffer.getvalue()
+        filename = content_filename(hashlib.sha256(data).hexdigest(), "png")
+        path = Config.IMAGES_DIR / filename
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+        filenames.append((filename, len(data)))
+
+    store = get_history_store()
+    start = datetime.now() - timedelta(minutes=records)
+    batch = []
+    for idx in range(records):
+        filename, size_bytes = filenames[idx % SEED_FILES]
+        batch.append(ImageInfo(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            prompt=f"benchmark prompt {idx}",
+            width=1024,
+            height=1024,
+            num_inference_steps=9,
+            use_gpu=False,
+            seed=idx,
+            guidance_scale=0.0,
+            size_bytes=size_bytes,
+            created_at=start + timedelta(minutes=idx),
+            generation_time_ms=1000.0
+        ))
+        if len(batch) == 5000:
+            store.add(batch)
+            batch = []
+    if batch:
+        store.add(batch)
+
+
+async def bench_tasks(client: ASGIClient, tasks: int, repeat: int) -> dict:
+    """Submit tasks as fast as possible, then poll them until the queue drains."""
+    request = {"prompt": "benchmark", "width": 512, "height": 512, "num_inference_steps": 2, "use_gpu": False}
+
+    start_time = time.perf_counter()
+    task_ids = [(await client.json("POST", "/api/generate", request))["task_id"] for _ in range(tasks)]
+    submit_seconds = time.perf_counter() - start_time
+
+    status = await timed(client, repeat, "GET", lambda idx: f"/api/generate/{task_ids[idx % len(task_ids)]}")
+
+    pending = set(task_ids)
+    while pending:
+        for task_id in list(pending):
+            task = await client.json("GET", f"/api/generate/{task_id}")
+            if task["status"] in ("completed", "failed"):
+                pending.discard(task_id)
+        await asyncio.sleep(0.01)
+    drain_seconds = time.perf_counter() - start_time
+
+    return {
+        "tasks": tasks,
+        "submit_per_second": tasks / submit_seconds,
+        "completed_per_second": tasks / drain_seconds,
+        "task_status": status,
+    }
+
+
+async def bench_history(client: ASGIClient, records: int, repeat: int) -> dict:
+    """Time the history endpoints on the seeded history."""
+    page = await client.json("GET", "/api/history?page_size=20")
+    ids = [image["id"] for image in page["images"]]
+    deep_page = max(records // 20 - records // 200, 1)
+    _, headers, _ = await client.request("GET", f"/api/download/{ids[0]}")
+
+    results = {
+        "list_first_page": await timed(client, repeat, "GET", "/api/history?page_size=20"),
+        "list_deep_offset": await timed(client, repeat, "GET", f"/api/history?page_size=20&page={deep_page}"),
+        "list_next_cursor": await timed(
+            client, repeat, "GET", f"/api/history?page_size=20&cursor={page['next_cursor']}"
+        ),
+        "search": await timed(client, repeat, "GET", lambda idx: f"/api/history?page_size=20&q={records // 2 + idx}"),
+        "latest": await timed(client, repeat, "GET", "/api/images/latest"),
+        "download": await timed(client, repeat, "GET", lambda idx: f"/api/download/{ids[idx % len(ids)]}"),
+        "download_not_modified": await timed(
+            client, repeat, "GET", f"/api/download/{ids[0]}", headers={"If-None-Match": headers.get("etag", "")}
+        ),
+    }
+
+    # Delete the oldest records, so the pages above stay comparable between runs
+    oldest = await client.json("GET", f"/api/history?page_size=100&page={max(records // 100, 1)}")
+    delete_ids = [image["id"] for image in oldest["images"]]
+    results["delete"] = await timed(
+        client, min(repeat, len(delete_ids) // 2), "DELETE", lambda idx: f"/api/images/{delete_ids[idx]}"
+    )
+    bulk_ids = delete_ids[len(delete_ids) // 2:]
+    start_time = time.perf_counter()
+    job = await client.json("POST", "/api/history/delete", {"ids": bulk_ids})
+    while job["status"] == "processing":
+        await asyncio.sleep(0.005)
+        job = await client.json("GET", f"/api/history/delete/{job['job_id']}")
+    results["bulk_delete"] = {
+        "records": job["deleted_records"],
+        "ms": (time.perf_counter() - start_time) * 1000,
+    }
+    return results
+
+
+async def bench_cleanup(client: ASGIClient, records: int) -> dict:
+    """Time a manual retention sweep that expires a tenth of the history."""
+    from backend.services.retention import get_retention_engine
+    engine = get_retention_engine()
+    remaining = (await client.json("GET", "/api/history?page_size=1"))["total"]
+    engine.max_images = remaining - max(records // 10, 1)
+
+    start_time = time.perf_counter()
+    result = await client.json("POST", "/api/history/cleanup")
+    return {
+        "ms": (time.perf_counter() - start_time) * 1000,
+        "deleted_records": result["deleted_count"],
+        "remaining_records": result["remaining_count"],
+    }
+
+
+async def run_size(records: int, tasks: int, repeat: int) -> dict:
+    """Run every benchmark against a history of `records` records."""
+    from backend.main import app
+
+    start_time = time.perf_counter()
+    seed_history(records)
+    seed_ms = (time.perf_counter() - start_time) * 1000
+
+    client = ASGIClient(app)
+    async with app.router.lifespan_context(app):
+        startup_ms = (time.perf_counter() - start_time) * 1000 - seed_ms
+        results = {"records": records, "seed_ms": seed_ms, "startup_ms": startup_ms}
+        results["system_status"] = await timed(client, repeat, "GET", "/api/system/status")
+        results["tasks"] = await bench_tasks(client, tasks, repeat)
+        results["history"] = await bench_history(client, records, repeat)
+        results["cleanup"] = await bench_cleanup(client, records)
+    return results
+
+
+def run_worker(args) -> dict:
+    """Benchmark one history size in this process."""
+    # Nothing may expire while the benchmark runs, except in the cleanup benchmark
+    os.environ["MAX_HISTORY_IMAGES"] = str(10 ** 9)
+    os.environ["MAX_HISTORY_DAYS"] = str(10 ** 5)
+    os.environ["GENERATOR_BACKEND"] = "synthetic"
+    os.environ["SYNTHETIC_LOAD_MS"] = "0"
+    os.environ["SYNTHETIC_STEP_MS"] = str(args.step_ms)
+    os.environ["SYNTHETIC_JITTER"] = "0"
+    os.environ["SYNTHETIC_FAILURE_RATE"] = "0"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure(Path(tmp_dir))
+        return asyncio.run(run_size(args.records, args.tasks, args.repeat))
+
+
+def git_revision() -> Optional[str]:
+    """Get the checked-out commit, None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report: dict, prefix: str = "") -> Dict[str, float]:
+    """Flatten the numbers of a report to dotted keys."""
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(before_path: str, after_path: str):
+    """Print the change of every measurement between two reports."""
+    with open(before_path, encoding='utf-8') as f:
+        before = flatten(json.load(f)["results"])
+    with open(after_path, encoding='utf-8') as f:
+        after = flatten(json.load(f)["results"])
+
+    print(f"{'measurement':<60} {'before':>12} {'after':>12} {'change':>9}")
+    for name in sorted(before.keys() & after.keys()):
+        if name.endswith(("samples", "records", "tasks")):
+            continue
+        old, new = before[name], after[name]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"{name:<60} {old:>12.2f} {new:>12.2f} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API, task manager and history paths offline")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated history sizes")
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks submitted in the throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="Requests per latency measurement")
+    parser.add_argument("--step-ms", type=float, default=0.0, help="Simulated step time of a 1024x1024 image")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two reports and exit")
+    parser.add_argument("--records", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.records is not None:
+        # Worker process of one size, reporting to the parent on stdout
+        print(json.dumps(run_worker(args)))
+        return
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"Benchmarking with {size} history records...", file=sys.stderr)
+        worker = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.api_suite", "--records", str(size), "--tasks", str(args.tasks),
+                "--repeat", str(args.repeat), "--step-ms", str(args.step_ms),
+            ],
+            capture_output=True, text=True, check=True
+        )
+        results[str(size)] = json.loads(worker.stdout.strip().splitlines()[-1])
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"tasks": args.tasks, "repeat": args.repeat, "step_ms": args.step_ms},
+        "results": results,
+    }
+
+    print(f"{'records':>8} {'submit/s':>9} {'done/s':>8} {'poll ms':>8} {'list ms':>8} "
+          f"{'deep ms':>8} {'search ms':>9} {'dl ms':>7} {'del ms':>7} {'cleanup ms':>10}")
+    for size, result in results.items():
+        history = result["history"]
+        print(
+            f"{size:>8} {result['tasks']['submit_per_second']:>9.1f} {result['tasks']['completed_per_second']:>8.1f} "
+            f"{result['tasks']['task_status']['median_ms']:>8.2f} {history['list_first_page']['median_ms']:>8.2f} "
+            f"{history['list_deep_offset']['median_ms']:>8.2f} {history['search']['median_ms']:>9.2f} "
+            f"{history['download']['median_ms']:>7.2f} {history['delete']['median_ms']:>7.2f} "
+            f"{result['cleanup']['ms']:>10.1f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
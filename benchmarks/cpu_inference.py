@@ -0,0 +1,127 @@
+"""
+CPU inference benchmark.
+
+Compares seconds per image of the CPU precision profiles against the plain
+float32 path the CPU replica used before (no channels_last, no autocast,
+no quantization), all rendered at the same resolution.
+
+Usage:
+    python -m benchmarks.cpu_inference --width 1024 --height 1024 --steps 9 --images 2
+    python -m benchmarks.cpu_inference --profiles baseline,int8 --threads 16 --output cpu.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+PROFILES = {
+    "baseline": {"precision": "float32", "channels_last": False},
+    "float32": {"precision": "float32", "channels_last": True},
+    "bfloat16": {"precision": "bfloat16", "channels_last": True},
+    "int8": {"precision": "int8", "channels_last": True},
+}
+
+
+def run_profile(name: str, args) -> dict:
+    """
+    Load the CPU replica with a profile and time full renders.
+
+    Args:
+        name: Profile name
+        args: Parsed command line arguments
+
+    Returns:
+        dict: Load time and per-image render times of the profile
+    """
+    from backend.models.config import Config
+    from backend.services.generator import get_generator
+    from backend.services.prompt_cache import get_prompt_cache
+
+    profile = PROFILES[name]
+    Config.CPU_PRECISION = profile["precision"]
+    Config.CPU_CHANNELS_LAST = profile["channels_last"]
+
+    generator = get_generator()
+    generator.unload("cpu")
+
+    start_time = time.perf_counter()
+    generator.load("cpu")
+    load_s = time.perf_counter() - start_time
+
+    # First call pays one-time allocation and kernel selection costs
+    generator.warmup("cpu", args.height, args.width, args.steps)
+
+    image_times = []
+    for idx in range(args.images):
+        # Include text encoding in every measurement
+        get_prompt_cache().clear()
+        start_time = time.perf_counter()
+        generator.generate_batch(
+            prompts=[args.prompt],
+            negative_prompts=[None],
+            seeds=[idx],
+            height=args.height,
+            width=args.width,
+            num_inference_steps=args.steps,
+            device="cpu"
+        )
+        image_times.append(time.perf_counter() - start_time)
+
+    return {
+        "profile": name,
+        "precision": generator.precision("cpu"),
+        "channels_last": profile["channels_last"],
+        "load_s": load_s,
+        "seconds_per_image": statistics.mean(image_times),
+        "image_times_s": image_times,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference profiles")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profiles to run")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--steps", type=int, default=9)
+    parser.add_argument("--images", type=int, default=2, help="Timed images per profile")
+    parser.add_argument("--prompt", default="A mountain lake at sunrise, photorealistic")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads, 0 for the PyTorch default")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Read by the generator when it is first created
+    os.environ["CPU_THREADS"] = str(args.threads)
+
+    results = []
+    for name in args.profiles.split(","):
+        name = name.strip()
+        if name not in PROFILES:
+            parser.error(f"Unknown profile {name!r}, choose from {', '.join(PROFILES)}")
+        print(f"Running {name} at {args.width}x{args.height}, {args.steps} steps...")
+        results.append(run_profile(name, args))
+
+    baseline = next((r["seconds_per_image"] for r in results if r["profile"] == "baseline"), None)
+    print()
+    print(f"{'profile':<10} {'precision':<10} {'load s':>8} {'s/image':>9} {'speedup':>8}")
+    for result in results:
+        speedup = f"{baseline / result['seconds_per_image']:.2f}x" if baseline else "-"
+        print(
+            f"{result['profile']:<10} {result['precision']:<10} {result['load_s']:>8.1f} "
+            f"{result['seconds_per_image']:>9.2f} {speedup:>8}"
+        )
+
+    if args.output:
+        report = {
+            "width": args.width,
+            "height": args.height,
+            "steps": args.steps,
+            "threads": args.threads,
+            "results": results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
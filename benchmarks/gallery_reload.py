@@ -0,0 +1,89 @@
+"""
+Gallery reload benchmark.
+
+Loads one history page from a running server the way the gallery does, then
+reloads it revalidating every image with the ETag of the first load, and
+reports the bytes and time of both loads.
+
+Usage:
+    python -m benchmarks.gallery_reload --url http://localhost:15000 --page-size 20
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+
+def fetch(url: str, etag: Optional[str] = None) -> Tuple[int, int, Optional[str]]:
+    """
+    GET a URL.
+
+    Returns:
+        Tuple[int, int, Optional[str]]: Status, body bytes and ETag of the response
+    """
+    request = urllib.request.Request(url)
+    if etag:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, len(response.read()), response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        # urllib raises on 304
+        return e.code, len(e.read()), e.headers.get("ETag")
+
+
+def load_gallery(urls: List[str], etags: Dict[str, str]) -> dict:
+    """Fetch every image URL, revalidating with the known ETags."""
+    start_time = time.perf_counter()
+    transferred = 0
+    not_modified = 0
+    for url in urls:
+        status, size, etag = fetch(url, etags.get(url))
+        transferred += size
+        not_modified += status == 304
+        if etag:
+            etags[url] = etag
+    return {
+        "requests": len(urls),
+        "not_modified": not_modified,
+        "bytes": transferred,
+        "ms": (time.perf_counter() - start_time) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery reload bandwidth")
+    parser.add_argument("--url", default="http://localhost:15000", help="Server base URL")
+    parser.add_argument("--page-size", type=int, default=20, help="Images per gallery page")
+    parser.add_argument("--originals", action="store_true", help="Load original images instead of thumbnails")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with urllib.request.urlopen(f"{args.url}/api/history?page_size={args.page_size}") as response:
+        images = json.load(response)["images"]
+    if args.originals:
+        urls = [f"{args.url}/static/images/{image['filename']}" for image in images]
+    else:
+        urls = [f"{args.url}{min(image['thumbnail_urls'].items(), key=lambda item: int(item[0]))[1]}" for image in images]
+
+    etags: Dict[str, str] = {}
+    results = {"cold": load_gallery(urls, etags), "reload": load_gallery(urls, etags)}
+    with urllib.request.urlopen(f"{args.url}/api/system/cache") as response:
+        results["server"] = json.load(response)["http"]
+
+    print(f"{'load':<8} {'requests':>8} {'304':>6} {'bytes':>12} {'ms':>10}")
+    for name in ("cold", "reload"):
+        result = results[name]
+        print(f"{name:<8} {result['requests']:>8} {result['not_modified']:>6} {result['bytes']:>12} {result['ms']:>10.1f}")
+    saved = results["cold"]["bytes"] - results["reload"]["bytes"]
+    print(f"Reload saved {saved} bytes ({saved / max(results['cold']['bytes'], 1):.1%})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+History store benchmark.
+
+Measures the latency of the operations behind the history endpoints for the
+JSON file, SQLite and in-memory journal backends at several history sizes.
+
+Usage:
+    python -m benchmarks.history_store --sizes 10000,100000 --repeat 5
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from backend.models.schemas import HistoryFilter, ImageInfo
+from backend.services.history_store import JournalHistoryStore, JSONHistoryStore, SQLiteHistoryStore, decode_cursor, encode_cursor
+
+
+def make_images(count: int) -> list:
+    """Build synthetic image records, one per minute up to now."""
+    start = datetime.now() - timedelta(minutes=count)
+    images = []
+    for idx in range(count):
+        image_id = str(uuid.uuid4())
+        images.append(ImageInfo(
+            id=image_id,
+            filename=f"bench_{image_id}.png",
+            prompt=f"benchmark prompt {idx}",
+            width=1024,
+            height=1024,
+            num_inference_steps=9,
+            use_gpu=True,
+            seed=idx,
+            guidance_scale=0.0,
+            size_bytes=1_500_000,
+            created_at=start + timedelta(minutes=idx),
+            generation_time_ms=1000.0
+        ))
+    return images
+
+
+def time_ms(func, repeat: int) -> float:
+    """Median latency of a call in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def bench_store(store, images: list, repeat: int) -> dict:
+    """Time the history operations on a populated store."""
+    ids = [image.id for image in images]
+    new_images = iter(make_images(repeat))
+    # A page close to the oldest record, reached by cursor and by offset
+    deep_cursor = decode_cursor(encode_cursor(images[len(images) // 10]))
+    deep_offset = len(images) - len(images) // 10
+    search = HistoryFilter(q=str(len(images) // 2 + 7))
+    return {
+        "list_page": time_ms(lambda: (store.list_images(0, 20), store.count()), repeat),
+        "deep_offset": time_ms(lambda: store.query(limit=20, offset=deep_offset), repeat),
+        "deep_cursor": time_ms(lambda: store.query(limit=20, cursor=deep_cursor), repeat),
+        "search": time_ms(lambda: store.query(search, limit=20), repeat),
+        "get": time_ms(lambda: store.get(random.choice(ids)), repeat),
+        "latest": time_ms(store.latest, repeat),
+        "add": time_ms(lambda: store.add([next(new_images)]), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history store backends")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated history sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls per operation")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        images = make_images(size)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = json.dumps({"images": [image.model_dump(mode="json") for image in images]}, indent=2)
+            json_path = Path(tmp_dir) / "history.json"
+            json_path.write_text(snapshot, encoding='utf-8')
+            snapshot_path = Path(tmp_dir) / "snapshot.json"
+            snapshot_path.write_text(snapshot, encoding='utf-8')
+
+            sqlite_store = SQLiteHistoryStore(Path(tmp_dir) / "history.db")
+            sqlite_store.add(images)
+
+            start_time = time.perf_counter()
+            journal_store = JournalHistoryStore(
+                snapshot_path, Path(tmp_dir) / "history.journal", compact_interval=3600, compact_entries=10**9
+            )
+            print(f"Journal store loaded {size} records in {(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+            stores = (("json", JSONHistoryStore(json_path)), ("sqlite", sqlite_store), ("journal", journal_store))
+            for backend, store in stores:
+                print(f"Running {backend} with {size} records...")
+                results.append({"backend": backend, "records": size, **bench_store(store, images, args.repeat)})
+                store.close()
+
+    print()
+    operations = ("list_page", "deep_offset", "deep_cursor", "search", "get", "latest", "add")
+    print(f"{'backend':<8} {'records':>8} " + " ".join(f"{op + ' ms':>14}" for op in operations))
+    for result in results:
+        print(
+            f"{result['backend']:<8} {result['records']:>8} "
+            + " ".join(f"{result[op]:>14.2f}" for op in operations)
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
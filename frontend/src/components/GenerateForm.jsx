@@ -17,9 +17,8 @@ const GenerateForm = ({ onTaskCreated }) => {
   // 高级设置状态
   const [useGPU, setUseGPU] = useState(true);
   const [batchSize, setBatchSize] = useState(1);
-  const [gpuId, setGpuId] = useState(0);
+  const [gpuId, setGpuId] = useState('auto');
   const [guidanceScale, setGuidanceScale] = useState(0.0);
-  const [maxConcurrentTasks, setMaxConcurrentTasks] = useState(1);
 
   // 画幅比例配置
   const aspectRatios = {
@@ -55,9 +54,8 @@ const GenerateForm = ({ onTaskCreated }) => {
         seed: seed ? parseInt(seed) : null,
         use_gpu: useGPU,
         batch_size: batchSize,
-        gpu_id: parseInt(gpuId),
+        gpu_id: gpuId === 'auto' ? null : parseInt(gpuId),
         guidance_scale: parseFloat(guidanceScale),
-        max_concurrent_tasks: parseInt(maxConcurrentTasks),
       };
 
       const response = await generateAPI.createTask(params);
@@ -185,8 +183,9 @@ const GenerateForm = ({ onTaskCreated }) => {
                       <Form.Label>🎮 GPU 设备 ID</Form.Label>
                       <Form.Select 
                         value={gpuId} 
-                        onChange={(e) => setGpuId(parseInt(e.target.value))}
+                        onChange={(e) => setGpuId(e.target.value)}
                       >
+                        <option value="auto">自动（负载最低的 GPU）</option>
                         {[0, 1, 2, 3, 4, 5, 6, 7].map(id => (
                           <option key={id} value={id}>GPU {id}</option>
                         ))}
@@ -218,21 +217,6 @@ const GenerateForm = ({ onTaskCreated }) => {
                   </Col>
                 </Row>
 
-                <Form.Group className="mb-3">
-                  <Form.Label>🔄 最大并发任务数</Form.Label>
-                  <Form.Select 
-                    value={maxConcurrentTasks} 
-                    onChange={(e) => setMaxConcurrentTasks(parseInt(e.target.value))}
-                  >
-                    <option value={1}>1 个任务（推荐）</option>
-                    <option value={2}>2 个任务</option>
-                    <option value={4}>4 个任务</option>
-                  </Form.Select>
-                  <Form.Text className="text-muted">
-                    同时运行的最大任务数（需要更多计算资源）
-                  </Form.Text>
-                </Form.Group>
-
                 <Alert variant="info" className="mb-0">
                   <small>
                     ⚠️ <strong>注意：</strong>
@@ -240,7 +224,7 @@ const GenerateForm = ({ onTaskCreated }) => {
                       <li>批量大小 大于 1 需要 2 倍以上的显存</li>
                       <li>GPU 模式推荐使用引导系数 0.0（Turbo 模型特性）</li>
                       <li>CPU 模式建议批量大小设为 1</li>
-                      <li>并发任务过多可能导致显存不足</li>
+                      <li>并发任务数由服务端统一配置，多余的任务会排队等待</li>
                     </ul>
                   </small>
                 </Alert>
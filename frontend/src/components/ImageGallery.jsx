@@ -14,12 +14,15 @@ const ImageGallery = () => {
   const [selectedImages, setSelectedImages] = useState(new Set());
   const [showDeleteModal, setShowDeleteModal] = useState(false);
   const [deleting, setDeleting] = useState(false);
+  const [search, setSearch] = useState('');
+  const [query, setQuery] = useState('');
   const pageSize = 8;
 
-  const fetchHistory = async (currentPage = 1) => {
+  const fetchHistory = async (currentPage = 1, currentQuery = query) => {
     try {
       setLoading(true);
-      const data = await historyAPI.getHistory(currentPage, pageSize);
+      const filters = currentQuery ? { q: currentQuery } : {};
+      const data = await historyAPI.getHistory(currentPage, pageSize, filters);
       setImages(data.images);
       setTotal(data.total);
       setPage(data.page);
@@ -41,7 +44,7 @@ const ImageGallery = () => {
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = image.filename;
+      a.download = historyAPI.downloadName(image);
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);
@@ -72,10 +75,8 @@ const ImageGallery = () => {
   const handleDeleteSelected = async () => {
     setDeleting(true);
     try {
-      // 删除选中的图片
-      for (const imageId of selectedImages) {
-        await historyAPI.deleteImage(imageId);
-      }
+      // 一次请求删除选中的图片，文件由后端在后台清理
+      await historyAPI.deleteImages({ ids: Array.from(selectedImages) });
       setSelectedImages(new Set());
       setShowDeleteModal(false);
       fetchHistory(page);
@@ -88,28 +89,29 @@ const ImageGallery = () => {
 
   const handleDownloadSelected = async () => {
     try {
-      // 下载选中的图片
-      for (const imageId of selectedImages) {
-        const image = images.find(img => img.id === imageId);
-        if (image) {
-          const blob = await historyAPI.downloadImage(imageId);
-          const url = window.URL.createObjectURL(blob);
-          const a = document.createElement('a');
-          a.href = url;
-          a.download = image.filename;
-          document.body.appendChild(a);
-          a.click();
-          window.URL.revokeObjectURL(url);
-          document.body.removeChild(a);
-          // 添加小延迟避免浏览器限制
-          await new Promise(resolve => setTimeout(resolve, 100));
-        }
-      }
+      // 将选中的图片打包为一个 ZIP 下载
+      const blob = await historyAPI.exportImages({ ids: Array.from(selectedImages) });
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `zimage_${selectedImages.size}_images.zip`;
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
     } catch (err) {
       alert('下载失败: ' + (err.response?.data?.detail || err.message));
     }
   };
 
+  const handleSearch = (e) => {
+    e.preventDefault();
+    const trimmed = search.trim();
+    setQuery(trimmed);
+    setSelectedImages(new Set());
+    fetchHistory(1, trimmed);
+  };
+
   const totalPages = Math.ceil(total / pageSize);
 
   if (loading && images.length === 0) {
@@ -164,8 +166,22 @@ const ImageGallery = () => {
         <Card.Body>
           {error && <Alert variant="danger">{error}</Alert>}
 
+          <Form onSubmit={handleSearch} className="d-flex mb-3">
+            <Form.Control
+              type="search"
+              size="sm"
+              placeholder="搜索提示词..."
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              className="me-2"
+            />
+            <Button type="submit" variant="outline-secondary" size="sm" className="text-nowrap">
+              搜索
+            </Button>
+          </Form>
+
           {images.length === 0 && !loading ? (
-            <Alert variant="info">还没有生成任何图片</Alert>
+            <Alert variant="info">{query ? '没有匹配的图片' : '还没有生成任何图片'}</Alert>
           ) : (
             <>
               <Row className="g-3 mb-3">
@@ -182,7 +198,7 @@ const ImageGallery = () => {
                                       </div>
                                       <Card.Img
                                         variant="top"
-                                        src={`http://localhost:15000/static/images/${image.filename}`}
+                                        src={historyAPI.thumbnailUrl(image, 256)}
                                         alt={image.prompt}
                                         style={{ height: '200px', objectFit: 'cover' }}
                                       />
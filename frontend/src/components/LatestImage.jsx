@@ -37,7 +37,7 @@ const LatestImage = () => {
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = image.filename;
+      a.download = historyAPI.downloadName(image);
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);
@@ -75,7 +75,7 @@ const LatestImage = () => {
       <Card.Body>
         <div className="text-center mb-3 img-container">
           <img
-            src={`http://localhost:15000/static/images/${image.filename}`}
+            src={historyAPI.thumbnailUrl(image, 512)}
             alt={image.prompt}
             style={{ maxWidth: '100%', maxHeight: '400px', objectFit: 'contain', borderRadius: '12px' }}
           />
@@ -36,6 +36,11 @@ const SystemMonitor = () => {
     return <div>加载中...</div>;
   }
 
+  const gpuAvailable = Boolean(systemStatus.gpu?.available);
+  // Utilization is unknown when the server reads GPUs through torch.cuda only
+  const gpuUsage = gpuAvailable ? systemStatus.gpu.usage_percent : null;
+  const gpus = systemStatus.gpus?.length ? systemStatus.gpus : (gpuAvailable ? [systemStatus.gpu] : []);
+
   return (
     <Card className="h-100">
       <Card.Header as="h5">📊 系统监控</Card.Header>
@@ -80,21 +85,21 @@ const SystemMonitor = () => {
             <div className="monitor-item">
               <div className="mb-2">
                 <strong>🎮 GPU</strong>
-                {systemStatus.gpu && systemStatus.gpu.available ? (
+                {gpuAvailable ? (
                   <small className="d-block text-muted">
-                    {systemStatus.gpu.name}<br />
-                    使用率: {systemStatus.gpu.usage_percent.toFixed(1)}%
+                    {systemStatus.gpu.name}{gpus.length > 1 ? ` 等 ${gpus.length} 块` : ''}<br />
+                    使用率: {gpuUsage != null ? `${gpuUsage.toFixed(1)}%` : 'N/A'}
                   </small>
                 ) : (
                   <small className="d-block text-muted">不可用</small>
                 )}
               </div>
               <ProgressBar
-                now={systemStatus.gpu && systemStatus.gpu.available ? systemStatus.gpu.usage_percent : 0}
-                label={systemStatus.gpu && systemStatus.gpu.available ? `${systemStatus.gpu.usage_percent.toFixed(1)}%` : 'N/A'}
+                now={gpuUsage ?? 0}
+                label={gpuUsage != null ? `${gpuUsage.toFixed(1)}%` : 'N/A'}
                 variant={
-                  !systemStatus.gpu?.available ? 'secondary' :
-                  systemStatus.gpu.usage_percent > 80 ? 'warning' :
+                  gpuUsage == null ? 'secondary' :
+                  gpuUsage > 80 ? 'warning' :
                   'primary'
                 }
               />
@@ -103,23 +108,31 @@ const SystemMonitor = () => {
         </Row>
 
         {/* GPU 显存详细监控 */}
-        {systemStatus.gpu && systemStatus.gpu.available && (
+        {gpus.length > 0 && (
           <Row className="g-3 mt-3">
-            <Col xs={12}>
-              <div className="monitor-item">
-                <div className="mb-2">
-                  <strong>💾 GPU 显存</strong>
-                  <small className="d-block text-muted">
-                    {systemStatus.gpu.memory_used_gb?.toFixed(1) || 0} GB / {systemStatus.gpu.memory_total_gb?.toFixed(1) || 0} GB
-                  </small>
-                </div>
-                <ProgressBar
-                  now={(systemStatus.gpu.memory_used_gb / systemStatus.gpu.memory_total_gb) * 100}
-                  label={`${((systemStatus.gpu.memory_used_gb / systemStatus.gpu.memory_total_gb) * 100).toFixed(1)}%`}
-                  variant={(systemStatus.gpu.memory_used_gb / systemStatus.gpu.memory_total_gb) > 0.9 ? 'danger' : 'info'}
-                />
-              </div>
-            </Col>
+            {gpus.map((gpu, idx) => {
+              const memoryRatio = (gpu.memory_used_gb || 0) / (gpu.memory_total_gb || 1);
+              return (
+                <Col xs={12} md={gpus.length > 1 ? 6 : 12} key={gpu.index ?? idx}>
+                  <div className="monitor-item">
+                    <div className="mb-2">
+                      <strong>💾 GPU {gpus.length > 1 ? `${gpu.index ?? idx} ` : ''}显存</strong>
+                      <small className="d-block text-muted">
+                        {gpu.memory_used_gb?.toFixed(1) || 0} GB / {gpu.memory_total_gb?.toFixed(1) || 0} GB
+                        {gpu.process_reserved_gb != null && (
+                          <> · 本进程 {gpu.process_allocated_gb.toFixed(1)} / {gpu.process_reserved_gb.toFixed(1)} GB（峰值 {gpu.process_peak_gb.toFixed(1)} GB）</>
+                        )}
+                      </small>
+                    </div>
+                    <ProgressBar
+                      now={memoryRatio * 100}
+                      label={`${(memoryRatio * 100).toFixed(1)}%`}
+                      variant={memoryRatio > 0.9 ? 'danger' : 'info'}
+                    />
+                  </div>
+                </Col>
+              );
+            })}
           </Row>
         )}
 
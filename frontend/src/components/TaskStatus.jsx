@@ -13,6 +13,7 @@ const TaskStatus = ({ taskId }) => {
     if (!taskId) return;
 
     let intervalId;
+    let finished = false;
 
     const fetchStatus = async () => {
       try {
@@ -28,10 +29,24 @@ const TaskStatus = ({ taskId }) => {
       }
     };
 
-    fetchStatus();
-    intervalId = setInterval(fetchStatus, 2000);
+    // Prefer pushed updates, fall back to polling if the stream is unavailable
+    const closeStream = generateAPI.subscribeTaskEvents(
+      taskId,
+      (data) => {
+        setStatus(data);
+        finished = data.status === 'completed' || data.status === 'failed';
+      },
+      () => {
+        if (finished) return;
+        fetchStatus();
+        intervalId = setInterval(fetchStatus, 2000);
+      }
+    );
 
-    return () => clearInterval(intervalId);
+    return () => {
+      closeStream();
+      clearInterval(intervalId);
+    };
   }, [taskId]);
 
   if (!taskId) return null;
@@ -77,6 +92,16 @@ const TaskStatus = ({ taskId }) => {
         <div className="mb-2">
           <strong>消息:</strong> {status.message}
         </div>
+        {status.total_images > 1 && (
+          <div className="mb-2">
+            <strong>图片:</strong> {status.results.length} / {status.total_images} 张
+          </div>
+        )}
+        {status.status === 'pending' && status.queue_position && (
+          <div className="mb-2">
+            <strong>排队位置:</strong> 第 {status.queue_position} 位
+          </div>
+        )}
 
         {status.error && (
           <Alert variant="danger" className="mt-3">
@@ -31,6 +31,26 @@ export const generateAPI = {
     const response = await api.get(`/generate/${taskId}`);
     return response.data;
   },
+
+  /**
+   * Subscribe to task status updates (Server-Sent Events).
+   * Returns a function that closes the stream.
+   */
+  subscribeTaskEvents: (taskId, onUpdate, onError) => {
+    const source = new EventSource(`${API_BASE_URL}/generate/${taskId}/events`);
+    source.addEventListener('progress', (event) => {
+      const data = JSON.parse(event.data);
+      onUpdate(data);
+      if (data.status === 'completed' || data.status === 'failed') {
+        source.close();
+      }
+    });
+    source.onerror = (event) => {
+      source.close();
+      onError(event);
+    };
+    return () => source.close();
+  },
 };
 
 /**
@@ -40,9 +60,9 @@ export const historyAPI = {
   /**
    * Get image history
    */
-  getHistory: async (page = 1, pageSize = 20) => {
+  getHistory: async (page = 1, pageSize = 20, filters = {}) => {
     const response = await api.get('/history', {
-      params: { page, page_size: pageSize }
+      params: { page, page_size: pageSize, ...filters }
     });
     return response.data;
   },
@@ -57,6 +77,20 @@ export const historyAPI = {
     return response.data;
   },
 
+  /**
+   * Download images as a ZIP archive, by ID list or history filters
+   */
+  exportImages: async ({ ids = null, filters = null, includeManifest = true } = {}) => {
+    const response = await api.post('/history/export', {
+      ids,
+      filters,
+      include_manifest: includeManifest,
+    }, {
+      responseType: 'blob'
+    });
+    return response.data;
+  },
+
   /**
    * Get latest image
    */
@@ -65,6 +99,28 @@ export const historyAPI = {
     return response.data;
   },
 
+  /**
+   * Get the URL of the smallest thumbnail at least minSize pixels wide,
+   * falling back to the largest thumbnail, then to the original image
+   */
+  thumbnailUrl: (image, minSize) => {
+    const sizes = Object.keys(image.thumbnail_urls || {}).map(Number).sort((a, b) => a - b);
+    if (sizes.length === 0) {
+      return `http://localhost:15000/static/images/${image.filename}`;
+    }
+    const size = sizes.find((s) => s >= minSize) ?? sizes[sizes.length - 1];
+    return `http://localhost:15000${image.thumbnail_urls[size]}`;
+  },
+
+  /**
+   * Get the file name an image is saved as, stored files are named by content hash
+   */
+  downloadName: (image) => {
+    const extension = image.filename.split('.').pop();
+    const timestamp = image.created_at.slice(0, 19).replace(/-|:/g, '').replace('T', '_');
+    return `${timestamp}_${image.id}.${extension}`;
+  },
+
   /**
    * Delete image
    */
@@ -72,6 +128,24 @@ export const historyAPI = {
     const response = await api.delete(`/images/${imageId}`);
     return response.data;
   },
+
+  /**
+   * Delete many images at once, by ID list or history filters.
+   * Deleting the whole history takes all: true.
+   * Returns a job whose progress can be polled with getDeleteJob.
+   */
+  deleteImages: async ({ ids = null, filters = null, all = false } = {}) => {
+    const response = await api.post('/history/delete', { ids, filters, all });
+    return response.data;
+  },
+
+  /**
+   * Get the progress of a bulk delete
+   */
+  getDeleteJob: async (jobId) => {
+    const response = await api.get(`/history/delete/${jobId}`);
+    return response.data;
+  },
 };
 
 /**
@@ -85,6 +159,16 @@ export const systemAPI = {
     const response = await api.get('/system/status');
     return response.data;
   },
+
+  /**
+   * Get the recent system usage time series, optionally only the last `seconds`
+   */
+  getStatusHistory: async (seconds) => {
+    const response = await api.get('/system/status/history', {
+      params: seconds ? { seconds } : {},
+    });
+    return response.data;
+  },
 };
 
 export default api;
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Shared test setup.
+
+Runs the synthetic generator, so the suite needs neither torch nor a GPU,
+and points the configuration at a temporary data directory before any
+service module creates its singleton.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("GENERATOR_BACKEND", "synthetic")
+os.environ.setdefault("SYNTHETIC_STEP_MS", "0")
+os.environ.setdefault("SYNTHETIC_JITTER", "0")
+os.environ.setdefault("PRELOAD_MODE", "off")
+os.environ.setdefault("GPU_TELEMETRY", "off")
+# The pool fixture serves GPUs that do not exist, there is no CUDA queue to wait for
+os.environ.setdefault("TRACE_CUDA_SYNC", "false")
+
+from backend.models.config import Config  # noqa: E402
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix="zimage-tests-"))
+Config.DATA_DIR = DATA_DIR
+Config.IMAGES_DIR = DATA_DIR / "images"
+Config.INCOMING_DIR = DATA_DIR / "incoming"
+Config.THUMBNAILS_DIR = DATA_DIR / "thumbnails"
+Config.TRACES_DIR = DATA_DIR / "traces"
+Config.HISTORY_FILE = DATA_DIR / "history.json"
+Config.HISTORY_DB = DATA_DIR / "history.db"
+Config.HISTORY_JOURNAL = DATA_DIR / "history.journal"
+Config.ensure_directories()
+
+import pytest  # noqa: E402
+
+from backend.services import history_store as history_store_module  # noqa: E402
+from backend.services import image_store as image_store_module  # noqa: E402
+from backend.services import task_manager as task_manager_module  # noqa: E402
+from backend.services import thumbnails as thumbnails_module  # noqa: E402
+from backend.services.device_pool import DevicePool, DeviceSlot  # noqa: E402
+from backend.services.encoder import get_encoder  # noqa: E402
+from backend.services.task_manager import TaskManager  # noqa: E402
+from tests.support import RecordingGenerator  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def encoder():
+    """Stop the encoding processes once the suite is done."""
+    yield get_encoder()
+    get_encoder().shutdown()
+
+
+@pytest.fixture
+def pool():
+    """A device pool serving two GPUs, whether or not the machine has any."""
+    pool = DevicePool()
+    pool.gpu_slots = [DeviceSlot("cuda:0", 0), DeviceSlot("cuda:1", 1)]
+    return pool
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """A synthetic generator without latency that records its pipeline calls."""
+    generator = RecordingGenerator()
+    monkeypatch.setattr(task_manager_module, "get_generator", lambda: generator)
+    return generator
+
+
+@pytest.fixture
+def manager(pool, generator, monkeypatch):
+    """A task manager dispatching to the pool."""
+    monkeypatch.setattr(task_manager_module, "get_device_pool", lambda: pool)
+    manager = TaskManager()
+    yield manager
+    manager._executor.shutdown(wait=False)
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """An empty history store in place of the global one."""
+    store = history_store_module.SQLiteHistoryStore(tmp_path / "history.db")
+    monkeypatch.setattr(history_store_module, "_history_store", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def images(tmp_path, history, monkeypatch):
+    """An empty image store in place of the global one, over the history fixture."""
+    store = image_store_module.ImageStore(directory=tmp_path / "images", incoming_dir=tmp_path / "incoming")
+    monkeypatch.setattr(image_store_module, "_image_store", store)
+    return store
+
+
+@pytest.fixture
+def thumbnails(tmp_path, monkeypatch):
+    """An empty thumbnail cache of two small sizes in place of the global one."""
+    cache = thumbnails_module.ThumbnailCache(directory=tmp_path / "thumbnails", sizes=[64, 32], quality=80)
+    monkeypatch.setattr(thumbnails_module, "_thumbnail_cache", cache)
+    return cache
@@ -0,0 +1,74 @@
+"""Helpers shared by the tests."""
+import asyncio
+import hashlib
+import io
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+
+from PIL import Image
+
+from backend.models.schemas import ImageInfo, TaskResponse, TaskStatus
+from backend.services.image_store import ImageStore, content_filename
+from backend.services.synthetic_generator import SyntheticGenerator
+
+
+class RecordingGenerator(SyntheticGenerator):
+    """Synthetic generator without latency that records the prompts of every pipeline call."""
+
+    def __init__(self):
+        super().__init__(load_ms=0, step_ms=0, jitter=0, failure_rate=0, seed=0)
+        self.batches: List[List[str]] = []
+
+    def generate_batch(self, prompts, *args, **kwargs):
+        self.batches.append(list(prompts))
+        return super().generate_batch(prompts, *args, **kwargs)
+
+
+async def wait_for_task(manager, task_id: str, timeout: float = 30) -> TaskResponse:
+    """Wait until a task completed or failed."""
+    deadline = time.monotonic() + timeout
+    while manager.tasks[task_id].status not in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Task {task_id} did not finish: {manager.tasks[task_id].message}")
+        await asyncio.sleep(0.01)
+    return manager.tasks[task_id]
+
+
+def api_client() -> httpx.AsyncClient:
+    """Client of the app, without running its lifespan."""
+    from backend.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def stored_image(
+    images: ImageStore,
+    color: int,
+    created_at: Optional[datetime] = None,
+    prompt: str = "a stored image",
+    size: int = 64
+) -> ImageInfo:
+    """Write a PNG of one color to its content address and build a record pointing to it."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (color % 256, color // 256 % 256, 128)).save(buffer, format="PNG")
+    data = buffer.getvalue()
+    filename = content_filename(hashlib.sha256(data).hexdigest(), "png")
+    path = images.path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return ImageInfo(
+        id=str(uuid.uuid4()),
+        filename=filename,
+        prompt=prompt,
+        width=size,
+        height=size,
+        num_inference_steps=9,
+        use_gpu=False,
+        seed=color,
+        guidance_scale=0.0,
+        size_bytes=len(data),
+        created_at=created_at or datetime.now(),
+    )
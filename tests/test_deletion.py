@@ -0,0 +1,76 @@
+"""Tests of bulk deletes."""
+import asyncio
+
+from backend.models.schemas import TaskStatus
+from tests.support import api_client, stored_image
+
+
+def bulk_delete(body: dict):
+    """Post a bulk delete and poll its job until the files are removed."""
+    async def run():
+        async with api_client() as client:
+            response = await client.post("/api/history/delete", json=body)
+            if response.status_code != 202:
+                return response
+            job_id = response.json()["job_id"]
+            for _ in range(200):
+                response = await client.get(f"/api/history/delete/{job_id}")
+                if response.json()["status"] != TaskStatus.PROCESSING.value:
+                    break
+                await asyncio.sleep(0.01)
+            return response
+
+    return asyncio.run(run())
+
+
+def test_delete_by_ids(images, history, thumbnails):
+    saved = [stored_image(images, color) for color in (50, 51, 52)]
+    history.add(saved)
+    images.open()
+
+    response = bulk_delete({"ids": [saved[0].id, saved[1].id, "unknown"]})
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == TaskStatus.COMPLETED.value
+    assert job["deleted_records"] == 2
+    assert job["files_removed"] == 2
+    assert job["bytes_freed"] == saved[0].size_bytes + saved[1].size_bytes
+    assert [image.id for image in history.all_images()] == [saved[2].id]
+    assert not images.path(saved[0].filename).exists()
+    assert images.path(saved[2].filename).exists()
+
+
+def test_delete_by_filters(images, history, thumbnails):
+    cat = stored_image(images, 60, prompt="a cat on a sofa")
+    dog = stored_image(images, 61, prompt="a dog in the park")
+    history.add([cat, dog])
+    images.open()
+
+    response = bulk_delete({"filters": {"q": "cat"}})
+
+    assert response.json()["deleted_records"] == 1
+    assert [image.id for image in history.all_images()] == [dog.id]
+
+
+def test_delete_all_must_be_explicit(images, history, thumbnails):
+    history.add([stored_image(images, color) for color in (70, 71)])
+    images.open()
+
+    assert bulk_delete({}).status_code == 400
+    assert bulk_delete({"filters": {}}).status_code == 400
+    assert bulk_delete({"filters": {"q": None}}).status_code == 400
+    assert bulk_delete({"ids": ["x"], "all": True}).status_code == 400
+    assert history.count() == 2
+
+    response = bulk_delete({"filters": {}, "all": True})
+    assert response.json()["deleted_records"] == 2
+    assert history.count() == 0
+
+
+def test_unknown_job():
+    async def run():
+        async with api_client() as client:
+            return await client.get("/api/history/delete/unknown")
+
+    assert asyncio.run(run()).status_code == 404
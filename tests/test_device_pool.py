@@ -0,0 +1,80 @@
+"""Tests of the device pool and per-replica rendering."""
+import threading
+import time
+
+import pytest
+
+from backend.services.device_pool import DevicePool
+from backend.services.synthetic_generator import SyntheticGenerator
+
+
+def test_select_least_loaded_gpu(pool):
+    first, second = pool.gpu_slots
+    assert pool.select() is first
+
+    first.active_images = 2
+    assert pool.select() is second
+    # Images assigned to a device but not queued yet count as load
+    assert pool.select(assigned={"cuda:1": 3}) is first
+
+
+def test_select_pinned_and_cpu(pool):
+    assert pool.select(gpu_id=1) is pool.gpu_slots[1]
+    assert pool.select(use_gpu=False) is pool.cpu_slot
+    with pytest.raises(ValueError):
+        pool.select(gpu_id=7)
+
+
+def test_select_without_gpus():
+    pool = DevicePool()
+    pool.gpu_slots = []
+    assert pool.select() is pool.cpu_slot
+    assert pool.select(gpu_id=0) is pool.cpu_slot
+
+
+def test_status_and_utilization(pool):
+    slot = pool.gpu_slots[0]
+    slot.batch_started(2)
+    time.sleep(0.01)
+    slot.batch_finished(2, completed=True)
+
+    status = {device.device: device for device in pool.get_status(loaded_devices=["cuda:0"])}
+    assert list(status) == ["cuda:0", "cuda:1", "cpu"]
+    assert status["cuda:0"].completed_images == 2
+    assert status["cuda:0"].replica_loaded and not status["cuda:1"].replica_loaded
+    assert status["cuda:0"].utilization_percent > 0
+    assert status["cuda:1"].utilization_percent == 0
+
+
+def test_renders_take_turns_on_a_replica():
+    generator = SyntheticGenerator(load_ms=0, step_ms=20, jitter=0, failure_rate=0, seed=0)
+    running = {"cuda:0": 0, "cuda:1": 0}
+    overlap = {"cuda:0": 0, "cuda:1": 0}
+    lock = threading.Lock()
+
+    def progress(device):
+        def callback(message, progress, current_step=None):
+            with lock:
+                if message.startswith("Denoising step 1/"):
+                    running[device] += 1
+                    overlap[device] = max(overlap[device], running[device])
+                elif message.endswith("generated successfully"):
+                    running[device] -= 1
+        return callback
+
+    threads = [
+        threading.Thread(target=generator.generate_batch, kwargs=dict(
+            prompts=["a"], negative_prompts=[None], seeds=[idx], height=1024, width=1024,
+            num_inference_steps=3, progress_callback=progress(device), device=device
+        ))
+        for idx, device in enumerate(["cuda:0", "cuda:0", "cuda:0", "cuda:1"])
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One batch at a time per replica, replicas in parallel
+    assert overlap == {"cuda:0": 1, "cuda:1": 1}
+    assert time.monotonic() - start < 4 * 3 * 0.02 + 0.5
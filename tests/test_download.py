@@ -0,0 +1,139 @@
+"""Tests of conditional and Range requests of image downloads."""
+import asyncio
+import uuid
+from pathlib import PurePosixPath
+
+import httpx
+import pytest
+
+from backend.utils.http_cache import ImmutableStaticFiles, address_etag, parse_range
+from tests.support import api_client, stored_image
+
+
+@pytest.fixture
+def image(images, history):
+    """A saved image and the bytes of its file."""
+    info = stored_image(images, 90)
+    history.add([info])
+    return info, images.path(info.filename).read_bytes()
+
+
+def get(path: str, headers: dict = None) -> httpx.Response:
+    async def run():
+        async with api_client() as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(run())
+
+
+def test_full_download(image):
+    info, data = image
+    response = get(f"/api/download/{info.id}")
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+    # The content address is the ETag, the file is not hashed again
+    assert response.headers["etag"] == f'"{PurePosixPath(info.filename).stem}"'
+
+
+def test_unknown_image(image):
+    assert get(f"/api/download/{uuid.uuid4()}").status_code == 404
+
+
+def test_not_modified(image):
+    info, _ = image
+    etag = get(f"/api/download/{info.id}").headers["etag"]
+
+    response = get(f"/api/download/{info.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert get(f"/api/download/{info.id}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert get(f"/api/download/{info.id}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_range(image):
+    info, data = image
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == data[:10]
+    assert response.headers["content-range"] == f"bytes 0-9/{len(data)}"
+
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == data[-5:]
+
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=10-"})
+    assert response.status_code == 206
+    assert response.content == data[10:]
+
+
+def test_unsatisfiable_range(image):
+    info, data = image
+    response = get(f"/api/download/{info.id}", headers={"Range": f"bytes={len(data)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(data)}"
+
+
+def test_reversed_range_is_ignored(image):
+    info, data = image
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=5-3"})
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_if_range(image):
+    info, data = image
+    etag = get(f"/api/download/{info.id}").headers["etag"]
+
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    # A stale validator gets the whole file
+    response = get(f"/api/download/{info.id}", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_static_files_etag(images, tmp_path):
+    info = stored_image(images, 91)
+    other = tmp_path / "other" / "image.png"
+    other.parent.mkdir()
+    other.write_bytes(images.path(info.filename).read_bytes())
+
+    async def run(app, path):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    addressed = ImmutableStaticFiles(directory=str(images.directory), content_addressed=True)
+    response = asyncio.run(run(addressed, f"/{info.filename}"))
+    assert response.status_code == 200
+    assert response.headers["etag"] == address_etag(info.filename)
+
+    # Files not named by their content are hashed
+    hashed = ImmutableStaticFiles(directory=str(other.parent))
+    response = asyncio.run(run(hashed, "/image.png"))
+    assert response.status_code == 200
+    assert response.headers["etag"] not in (None, address_etag(info.filename))
+
+
+def test_address_etag():
+    digest = "ab" * 32
+    assert address_etag(f"ab/{digest}.png") == f'"{digest}"'
+    assert address_etag(f"{digest}.webp") == f'"{digest}"'
+    assert address_etag("0f3a.png") is None
+    assert address_etag(f"{uuid.uuid4()}.png") is None
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-200", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    # Unknown units, multipart and invalid ranges are served whole
+    assert parse_range("items=0-9", 100) is None
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=9-0", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
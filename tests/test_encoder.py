@@ -0,0 +1,84 @@
+"""Tests of the image encoding pool."""
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from backend.models.schemas import ImageFormat, OutputOptions
+from backend.services.encoder import get_encoder, save_image
+from backend.services.image_store import get_image_store
+
+
+def noise(size: int = 96) -> Image.Image:
+    return Image.merge("RGB", [Image.effect_noise((size, size), 60 + 10 * band) for band in range(3)])
+
+
+def save(image: Image.Image, options: OutputOptions):
+    return asyncio.run(get_encoder().save(image, options))
+
+
+@pytest.mark.parametrize("output_format, pil_format", [
+    (ImageFormat.PNG, "PNG"),
+    (ImageFormat.WEBP, "WEBP"),
+    (ImageFormat.JPEG, "JPEG"),
+])
+def test_save_formats(output_format, pil_format):
+    image = noise()
+    image_id, filename, size_bytes, encode_time = save(image, OutputOptions(output_format=output_format))
+
+    path = get_image_store().path(filename)
+    data = path.read_bytes()
+    assert image_id
+    assert len(data) == size_bytes
+    assert encode_time > 0
+    # Files are stored under the SHA-256 of their content
+    assert Path(filename).stem == hashlib.sha256(data).hexdigest()
+    with Image.open(path) as saved:
+        assert saved.format == pil_format
+        assert saved.size == image.size
+
+
+def test_lossless_formats_round_trip():
+    image = noise()
+    for options in (OutputOptions(), OutputOptions(output_format=ImageFormat.WEBP, webp_lossless=True)):
+        _, filename, _, _ = save(image, options)
+        with Image.open(get_image_store().path(filename)) as saved:
+            assert saved.convert("RGB").tobytes() == image.tobytes()
+
+
+def test_compression_settings():
+    image = noise(128)
+    sizes = {
+        quality: save(image, OutputOptions(output_format=ImageFormat.JPEG, quality=quality))[2]
+        for quality in (20, 95)
+    }
+    assert sizes[20] < sizes[95]
+
+    gradient = Image.linear_gradient("L").convert("RGB")
+    fast = save(gradient, OutputOptions(png_compress_level=0))[2]
+    small = save(gradient, OutputOptions(png_compress_level=9))[2]
+    assert small < fast
+
+
+def test_encodes_in_another_process():
+    async def run():
+        return await get_encoder().run(os.getpid)
+
+    assert asyncio.run(run()) != os.getpid()
+
+
+def test_identical_content_shares_a_file():
+    image = noise()
+    first = save(image, OutputOptions())
+    second = save(image, OutputOptions())
+    assert first[0] != second[0]
+    assert first[1] == second[1]
+    assert not any(get_image_store().incoming_dir.iterdir())
+
+
+def test_save_in_process():
+    filename, size_bytes, _ = save_image(noise(), OutputOptions(output_format=ImageFormat.WEBP, webp_lossless=False))
+    assert get_image_store().path(filename).stat().st_size == size_bytes
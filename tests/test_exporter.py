@@ -0,0 +1,81 @@
+"""Tests of the streamed ZIP export."""
+import asyncio
+import io
+import json
+import uuid
+import zipfile
+
+from backend.models.config import Config
+from backend.services.exporter import MANIFEST_NAME, stream_zip
+from backend.services.image_store import download_name
+from tests.support import api_client, stored_image
+
+
+def export(body: dict):
+    async def run():
+        async with api_client() as client:
+            return await client.post("/api/history/export", json=body)
+
+    return asyncio.run(run())
+
+
+def test_stream_zip(images):
+    saved = [stored_image(images, color) for color in (10, 11)]
+    gone = stored_image(images, 12)
+    images.path(gone.filename).unlink()
+
+    data = b"".join(stream_zip([saved[0], gone, saved[1]]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert names == [download_name(saved[0]), download_name(saved[1]), MANIFEST_NAME]
+        for image in saved:
+            info = archive.getinfo(download_name(image))
+            # Images are already compressed, they are stored as they are
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert archive.read(info) == images.path(image.filename).read_bytes()
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+
+    assert manifest["count"] == 2
+    assert manifest["missing"] == [gone.id]
+    assert [entry["id"] for entry in manifest["images"]] == [image.id for image in saved]
+
+
+def test_stream_zip_without_manifest(images):
+    image = stored_image(images, 13)
+    data = b"".join(stream_zip([image], include_manifest=False))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == [download_name(image)]
+
+
+def test_export_by_ids(images, history):
+    saved = [stored_image(images, color) for color in (20, 21, 22)]
+    history.add(saved)
+
+    response = export({"ids": [saved[2].id, saved[0].id, saved[2].id]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert "attachment" in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [download_name(saved[2]), download_name(saved[0]), MANIFEST_NAME]
+
+
+def test_export_by_filters(images, history):
+    cat = stored_image(images, 30, prompt="a cat on a sofa")
+    history.add([cat, stored_image(images, 31, prompt="a dog in the park")])
+
+    response = export({"filters": {"q": "cat"}, "include_manifest": False})
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [download_name(cat)]
+
+
+def test_export_errors(images, history, monkeypatch):
+    assert export({"ids": [str(uuid.uuid4())]}).status_code == 404
+
+    history.add([stored_image(images, color) for color in (40, 41, 42)])
+    monkeypatch.setattr(Config, "MAX_EXPORT_IMAGES", 2)
+    assert export({}).status_code == 400
@@ -0,0 +1,86 @@
+"""Tests of the GPU telemetry providers."""
+import sys
+import types
+
+from backend.services.gpu_telemetry import GB, GPUProvider, NVMLProvider, create_gpu_provider
+from backend.services.monitor import SystemMonitor
+
+
+class FailingProvider(GPUProvider):
+    name = "failing"
+
+    def devices(self):
+        raise RuntimeError("driver gone")
+
+
+def fake_nvml() -> types.ModuleType:
+    """Bindings of an NVML with two devices, the second without utilization counters."""
+    nvml = types.ModuleType("pynvml")
+
+    class NVMLError(Exception):
+        pass
+
+    def utilization(handle):
+        if handle == 1:
+            raise NVMLError("not supported")
+        return types.SimpleNamespace(gpu=40)
+
+    nvml.NVMLError = NVMLError
+    nvml.NVML_TEMPERATURE_GPU = 0
+    nvml.calls = []
+    nvml.nvmlInit = lambda: nvml.calls.append("init")
+    nvml.nvmlShutdown = lambda: nvml.calls.append("shutdown")
+    nvml.nvmlDeviceGetCount = lambda: 2
+    nvml.nvmlDeviceGetHandleByIndex = lambda idx: idx
+    nvml.nvmlDeviceGetName = lambda handle: f"Fake GPU {handle}".encode()
+    nvml.nvmlDeviceGetUUID = lambda handle: f"GPU-{handle}"
+    nvml.nvmlDeviceGetMemoryInfo = lambda handle: types.SimpleNamespace(total=24 * GB, used=(handle + 1) * GB)
+    nvml.nvmlDeviceGetUtilizationRates = utilization
+    nvml.nvmlDeviceGetTemperature = lambda handle, sensor: 60 + handle
+    return nvml
+
+
+def test_provider_off():
+    provider = create_gpu_provider("off")
+    assert type(provider) is GPUProvider
+    assert provider.name == "none"
+    assert provider.devices() == []
+
+
+def test_unavailable_providers_fall_back_to_none(monkeypatch):
+    # Neither the NVML bindings nor a CUDA build of torch can be imported
+    monkeypatch.setitem(sys.modules, "pynvml", None)
+    monkeypatch.setitem(sys.modules, "torch", None)
+    assert type(create_gpu_provider("auto")) is GPUProvider
+    assert type(create_gpu_provider("torch")) is GPUProvider
+
+
+def test_nvml_provider(monkeypatch):
+    nvml = fake_nvml()
+    monkeypatch.setitem(sys.modules, "pynvml", nvml)
+
+    provider = create_gpu_provider("auto")
+    assert isinstance(provider, NVMLProvider)
+    first, second = provider.devices()
+    assert (first.index, first.name, first.memory_total_gb, first.memory_used_gb) == (0, "Fake GPU 0", 24, 1)
+    assert (first.usage_percent, first.temperature) == (40, 60)
+    # Counters a device does not support are left unset
+    assert (second.usage_percent, second.temperature) == (None, 61)
+    # Memory of this process is unknown while CUDA is not initialized
+    assert first.process_reserved_gb is None
+
+    provider.close()
+    assert nvml.calls == ["init", "shutdown"]
+
+
+def test_monitor_reports_no_gpus_on_provider_errors():
+    monitor = SystemMonitor(interval=1, history_size=10, gpu_provider=FailingProvider())
+    assert monitor.sample().gpus == []
+
+
+def test_monitor_without_gpus():
+    monitor = SystemMonitor(interval=1, history_size=10, gpu_provider=GPUProvider())
+    status = monitor.sample()
+    assert status.gpu.available is False
+    assert status.gpus == []
+    assert monitor.history()[-1].gpu_percent is None
@@ -0,0 +1,333 @@
+"""Tests of the history store implementations."""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models.schemas import HistoryFilter, ImageInfo
+from backend.services.history_store import (
+    JournalHistoryStore,
+    JSONHistoryStore,
+    SQLiteHistoryStore,
+    decode_cursor,
+    encode_cursor,
+)
+from tests.support import api_client
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def open_store(kind: str, directory, compact_entries: int = 1000):
+    if kind == "json":
+        return JSONHistoryStore(directory / "history.json")
+    if kind == "sqlite":
+        return SQLiteHistoryStore(directory / "history.db")
+    return JournalHistoryStore(
+        directory / "history.json",
+        directory / "history.journal",
+        compact_interval=3600,
+        compact_entries=compact_entries
+    )
+
+
+@pytest.fixture(params=["json", "sqlite", "journal"])
+def store(request, tmp_path):
+    store = open_store(request.param, tmp_path)
+    yield store
+    store.close()
+
+
+def make_image(idx: int, prompt: str = None, width: int = 1024) -> ImageInfo:
+    return ImageInfo(
+        id=str(uuid.uuid4()),
+        filename=f"{idx:02x}/{idx:064x}.png",
+        prompt=prompt or f"prompt number {idx}",
+        width=width,
+        height=1024,
+        num_inference_steps=9,
+        use_gpu=True,
+        seed=idx,
+        guidance_scale=0.0,
+        size_bytes=100 + idx,
+        created_at=START + timedelta(minutes=idx),
+    )
+
+
+def test_add_get_and_newest_first(store):
+    images = [make_image(idx) for idx in range(5)]
+    store.add(images)
+
+    assert store.get(images[2].id) == images[2]
+    assert store.get("missing") is None
+    assert [image.id for image in store.get_many([images[3].id, "missing", images[0].id])] == [
+        images[3].id, images[0].id
+    ]
+    assert store.latest().id == images[4].id
+    assert [image.id for image in store.list_images(limit=3)] == [image.id for image in images[:1:-1]]
+    assert [image.id for image in store.all_images()] == [image.id for image in images]
+    assert store.count() == 5
+    assert store.total_bytes() == sum(image.size_bytes for image in images)
+
+
+def test_add_replaces_same_id(store):
+    image = make_image(0)
+    store.add([image])
+    store.add([image.model_copy(update={"prompt": "renamed"})])
+
+    assert store.count() == 1
+    assert store.get(image.id).prompt == "renamed"
+
+
+def test_delete(store):
+    images = [make_image(idx) for idx in range(3)]
+    store.add(images)
+
+    deleted = store.delete([images[0].id, "missing", images[2].id])
+    assert {image.id for image in deleted} == {images[0].id, images[2].id}
+    assert [image.id for image in store.all_images()] == [images[1].id]
+    assert store.total_bytes() == images[1].size_bytes
+    assert store.delete([images[0].id]) == []
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite", "journal"])
+def test_persists_across_reopen(kind, tmp_path):
+    images = [make_image(idx) for idx in range(3)]
+    store = open_store(kind, tmp_path)
+    store.add(images)
+    store.delete([images[0].id])
+    store.close()
+
+    store = open_store(kind, tmp_path)
+    assert [image.id for image in store.all_images()] == [images[1].id, images[2].id]
+    store.close()
+
+
+def test_sqlite_migrates_legacy_json_once(tmp_path):
+    images = [make_image(idx) for idx in range(3)]
+    records = [image.model_dump(mode="json") for image in images] + [{"id": "broken"}]
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({"images": records}), encoding="utf-8")
+
+    store = SQLiteHistoryStore(tmp_path / "history.db", legacy_json=legacy)
+    # Unreadable records are skipped
+    assert [image.id for image in store.all_images()] == [image.id for image in images]
+    store.close()
+    assert not legacy.exists()
+    assert (tmp_path / "history.json.migrated").exists()
+
+    # A history.json appearing later is not imported over existing records
+    legacy.write_text(json.dumps({"images": [make_image(9).model_dump(mode="json")]}), encoding="utf-8")
+    store = SQLiteHistoryStore(tmp_path / "history.db", legacy_json=legacy)
+    assert store.count() == 3
+    store.close()
+
+
+def test_sqlite_uses_wal(tmp_path):
+    store = SQLiteHistoryStore(tmp_path / "history.db")
+    assert store._query("PRAGMA journal_mode") == [("wal",)]
+    store.close()
+
+
+def test_journal_replays_without_compaction(tmp_path):
+    images = [make_image(idx) for idx in range(3)]
+    store = open_store("journal", tmp_path)
+    store.add(images)
+    store.delete([images[1].id])
+
+    # As after a crash: the journal holds every change, no snapshot was written
+    assert not (tmp_path / "history.json").exists()
+    replayed = open_store("journal", tmp_path)
+    assert [image.id for image in replayed.all_images()] == [images[0].id, images[2].id]
+    replayed.close()
+    store.close()
+
+
+def test_journal_skips_torn_line(tmp_path):
+    images = [make_image(idx) for idx in range(2)]
+    store = open_store("journal", tmp_path)
+    store.add(images)
+    with open(tmp_path / "history.journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "ima')
+
+    replayed = open_store("journal", tmp_path)
+    assert replayed.count() == 2
+    replayed.close()
+    store.close()
+
+
+def test_journal_compaction(tmp_path):
+    images = [make_image(idx) for idx in range(4)]
+    store = open_store("journal", tmp_path)
+    store.add(images)
+    store.delete([images[0].id])
+    store.compact()
+
+    assert (tmp_path / "history.journal").read_text(encoding="utf-8") == ""
+    snapshot = json.loads((tmp_path / "history.json").read_text(encoding="utf-8"))
+    assert [record["id"] for record in snapshot["images"]] == [image.id for image in images[1:]]
+
+    # Changes after the compaction go to the journal again, on top of the snapshot
+    store.delete([images[1].id])
+    reopened = open_store("journal", tmp_path)
+    assert [image.id for image in reopened.all_images()] == [image.id for image in images[2:]]
+    reopened.close()
+    store.close()
+
+
+def test_journal_compacts_when_full(tmp_path):
+    store = open_store("journal", tmp_path, compact_entries=3)
+    for idx in range(3):
+        store.add([make_image(idx)])
+
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "history.json").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    store.close()
+    snapshot = json.loads((tmp_path / "history.json").read_text(encoding="utf-8"))
+    assert len(snapshot["images"]) == 3
+
+
+def test_offset_pagination(store):
+    images = [make_image(idx) for idx in range(7)]
+    store.add(images)
+    newest_first = [image.id for image in reversed(images)]
+
+    pages = [[image.id for image in store.query(limit=3, offset=offset)] for offset in (0, 3, 6)]
+    assert pages == [newest_first[:3], newest_first[3:6], newest_first[6:]]
+
+
+def test_cursor_pagination(store):
+    images = [make_image(idx) for idx in range(7)]
+    store.add(images)
+
+    seen = []
+    cursor = None
+    while True:
+        page = store.query(limit=3, cursor=cursor)
+        seen.extend(image.id for image in page)
+        if len(page) < 3:
+            break
+        cursor = decode_cursor(encode_cursor(page[-1]))
+    assert seen == [image.id for image in reversed(images)]
+
+
+def test_cursor_pages_do_not_shift(store):
+    images = [make_image(idx) for idx in range(4)]
+    store.add(images)
+    first_page = store.query(limit=2)
+
+    # A newer record must not shift the next page
+    store.add([make_image(10)])
+    second_page = store.query(limit=2, cursor=decode_cursor(encode_cursor(first_page[-1])))
+    assert [image.id for image in second_page] == [images[1].id, images[0].id]
+
+
+def test_cursor_breaks_ties_by_id(store):
+    images = [make_image(0).model_copy(update={"id": f"id-{idx}"}) for idx in range(5)]
+    store.add(images)
+
+    first_page = store.query(limit=2)
+    rest = store.query(limit=10, cursor=decode_cursor(encode_cursor(first_page[-1])))
+    assert sorted(image.id for image in first_page + rest) == [image.id for image in images]
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_search(store):
+    store.add([
+        make_image(0, prompt="A red fox in the snow"),
+        make_image(1, prompt="a blue fox at night"),
+        make_image(2, prompt="Red car"),
+    ])
+
+    assert [image.seed for image in store.query(HistoryFilter(q="fox"))] == [1, 0]
+    assert [image.seed for image in store.query(HistoryFilter(q="red fox"))] == [0]
+    assert [image.seed for image in store.query(HistoryFilter(q="RED"))] == [2, 0]
+    # Words match inside longer words, and short words too
+    assert [image.seed for image in store.query(HistoryFilter(q="nigh"))] == [1]
+    assert [image.seed for image in store.query(HistoryFilter(q="a"))] == [2, 1, 0]
+    assert store.count(HistoryFilter(q="fox")) == 2
+    assert store.query(HistoryFilter(q="zebra")) == []
+
+
+def test_field_and_date_filters(store):
+    store.add([make_image(idx, width=512 if idx % 2 else 1024) for idx in range(6)])
+
+    assert [image.seed for image in store.query(HistoryFilter(width=512))] == [5, 3, 1]
+    assert [image.seed for image in store.query(HistoryFilter(seed=4))] == [4]
+    assert [image.seed for image in store.query(HistoryFilter(width=512), limit=1, offset=1)] == [3]
+    created = HistoryFilter(
+        created_after=START + timedelta(minutes=2),
+        created_before=START + timedelta(minutes=4)
+    )
+    # created_after is inclusive, created_before exclusive
+    assert [image.seed for image in store.query(created)] == [3, 2]
+    assert store.count(created) == 2
+
+
+def test_history_endpoint_pages(history):
+    history.add([make_image(idx, prompt="a fox" if idx % 2 else "a hen") for idx in range(5)])
+
+    async def run():
+        async with api_client() as client:
+            first = (await client.get("/api/history", params={"page_size": 2, "q": "hen"})).json()
+            second = (await client.get(
+                "/api/history", params={"page_size": 2, "q": "hen", "cursor": first["next_cursor"]}
+            )).json()
+            invalid = await client.get("/api/history", params={"cursor": "garbage"})
+            return first, second, invalid
+
+    first, second, invalid = asyncio.run(run())
+    assert [image["seed"] for image in first["images"]] == [4, 2]
+    assert first["total"] == 3
+    assert [image["seed"] for image in second["images"]] == [0]
+    assert second["next_cursor"] is None
+    assert invalid.status_code == 400
+
+
+def test_expired(store):
+    images = [make_image(idx) for idx in range(5)]
+    store.add(images)
+
+    # Older than the cutoff, or beyond the newest `keep`, oldest first
+    expired = store.expired(cutoff=START + timedelta(minutes=1, seconds=30), keep=10)
+    assert [image.seed for image in expired] == [0, 1]
+    assert [image.seed for image in store.expired(cutoff=START, keep=3)] == [0, 1]
+    assert store.expired(cutoff=START, keep=10) == []
+
+
+def test_expired_byte_budget(store):
+    images = [make_image(idx) for idx in range(4)]
+    store.add(images)
+    newest_two = images[2].size_bytes + images[3].size_bytes
+
+    assert [image.seed for image in store.expired(START, keep=10, max_bytes=newest_two)] == [0, 1]
+    assert [image.seed for image in store.expired(START, keep=10, max_bytes=newest_two - 1)] == [0, 1, 2]
+
+
+def test_shared_files_count_once(store):
+    images = [make_image(idx) for idx in range(3)]
+    # Two newer records with the content of the oldest image share its file
+    copies = [
+        images[0].model_copy(update={"id": f"copy-{idx}", "created_at": START + timedelta(hours=1, minutes=idx)})
+        for idx in range(2)
+    ]
+    store.add(images + copies)
+    files_bytes = sum(image.size_bytes for image in images)
+    assert store.total_bytes() == files_bytes
+
+    assert store.expired(START, keep=10, max_bytes=files_bytes) == []
+    # Without room for image 1, it and every older record expire
+    expired = store.expired(START, keep=10, max_bytes=files_bytes - images[1].size_bytes)
+    assert [image.id for image in expired] == [images[0].id, images[1].id]
+
+    store.delete([copy.id for copy in copies])
+    assert store.total_bytes() == files_bytes
+    store.delete([images[0].id])
+    assert store.total_bytes() == files_bytes - images[0].size_bytes
@@ -0,0 +1,83 @@
+"""Tests of the content-addressed image store."""
+import hashlib
+import os
+import time
+
+from backend.models.config import Config
+from backend.services.image_store import ORPHAN_GRACE_SECONDS, content_filename, get_image_store
+from tests.support import stored_image
+
+
+def write_incoming(images, data: bytes):
+    """Stage a file as an encoder would, returning its path and digest."""
+    incoming = images.incoming_path("png")
+    incoming.write_bytes(data)
+    return incoming, hashlib.sha256(data).hexdigest()
+
+
+def test_identical_images_share_a_file(images):
+    first = images.commit(*write_incoming(images, b"same content"), "png")
+    second = images.commit(*write_incoming(images, b"same content"), "png")
+    other = images.commit(*write_incoming(images, b"other content"), "png")
+
+    assert first == second == content_filename(hashlib.sha256(b"same content").hexdigest(), "png")
+    assert other != first
+    assert images.path(first).read_bytes() == b"same content"
+    assert not any(images.incoming_dir.iterdir())
+
+
+def test_release_removes_file_with_last_reference(images):
+    filename = images.commit(*write_incoming(images, b"shared"), "png")
+    images.commit(*write_incoming(images, b"shared"), "png")
+    record = stored_image(images, 1).model_copy(update={"filename": filename})
+
+    assert images.release([record]) == (0, 0)
+    assert images.path(filename).exists()
+
+    assert images.release([record]) == (1, len(b"shared"))
+    assert not images.path(filename).exists()
+
+
+def test_migrate_flat_layout(images, history):
+    image = stored_image(images, 2)
+    data = images.path(image.filename).read_bytes()
+    images.path(image.filename).unlink()
+    flat = image.model_copy(update={"filename": "20240101_120000_old.png"})
+    images.path(flat.filename).write_bytes(data)
+    history.add([flat])
+
+    images.migrate()
+
+    migrated = history.get(flat.id)
+    assert migrated.filename == content_filename(hashlib.sha256(data).hexdigest(), "png")
+    assert images.path(migrated.filename).read_bytes() == data
+    assert not images.path(flat.filename).exists()
+
+
+def test_open_removes_leftovers(images, history):
+    kept = stored_image(images, 3)
+    history.add([kept])
+    young = stored_image(images, 4)
+    old = stored_image(images, 5)
+    past = time.time() - ORPHAN_GRACE_SECONDS - 60
+    os.utime(images.path(old.filename), (past, past))
+    os.utime(images.path(kept.filename), (past, past))
+    interrupted, _ = write_incoming(images, b"half written")
+    legacy = images.directory / ".incoming"
+    legacy.mkdir()
+    (legacy / "stale.png").write_bytes(b"stale")
+
+    images.open()
+
+    assert images.path(kept.filename).exists()
+    # A young orphan may belong to a render that is not recorded yet
+    assert images.path(young.filename).exists()
+    assert not images.path(old.filename).exists()
+    assert not interrupted.exists()
+    assert not legacy.exists()
+
+
+def test_incoming_is_not_served():
+    incoming_dir = get_image_store().incoming_dir
+    assert not incoming_dir.resolve().is_relative_to(Config.IMAGES_DIR.resolve())
+    assert incoming_dir.resolve().parent == Config.DATA_DIR.resolve()
@@ -0,0 +1,96 @@
+"""Tests of the Prometheus metrics."""
+import asyncio
+
+import pytest
+
+from backend.services import device_pool as device_pool_module
+from backend.services import metrics as metrics_module
+from backend.services import task_manager as task_manager_module
+from backend.services.metrics import CONTENT_TYPE, Counter, Gauge, GenerationMetrics, Histogram, resolution_bucket
+from tests.support import api_client, wait_for_task
+
+
+def samples(text: str) -> dict:
+    """Map every sample line of an exposition to its value."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            values[name] = float(value)
+    return values
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """Empty metrics in place of the global ones."""
+    fresh = GenerationMetrics()
+    monkeypatch.setattr(metrics_module, "_metrics", fresh)
+    return fresh
+
+
+def test_resolution_bucket():
+    assert resolution_bucket(512, 512) == "512"
+    assert resolution_bucket(1024, 576) == "768"
+    assert resolution_bucket(1024, 1024) == "1024"
+    assert resolution_bucket(4096, 4096) == ">2048"
+
+
+def test_histogram():
+    histogram = Histogram("latency_seconds", "Latency", ("device",), buckets=(0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 20):
+        histogram.observe(value, device="cuda:0")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    values = samples("\n".join(lines))
+    # Buckets are cumulative and inclusive of their upper bound
+    assert values['latency_seconds_bucket{device="cuda:0",le="0.1"}'] == 2
+    assert values['latency_seconds_bucket{device="cuda:0",le="1"}'] == 3
+    assert values['latency_seconds_bucket{device="cuda:0",le="10"}'] == 3
+    assert values['latency_seconds_bucket{device="cuda:0",le="+Inf"}'] == 4
+    assert values['latency_seconds_count{device="cuda:0"}'] == 4
+    assert values['latency_seconds_sum{device="cuda:0"}'] == pytest.approx(20.65)
+
+
+def test_counter_escapes_labels():
+    counter = Counter("events_total", "Events", ("name",))
+    counter.inc(name='say "hi"\n')
+    counter.inc(2, name='say "hi"\n')
+    assert counter.render()[-1] == 'events_total{name="say \\"hi\\"\\n"} 3'
+
+
+def test_gauge_collect():
+    gauge = Gauge("depth", "Depth", ("device",), collect=lambda: {("cpu",): 4})
+    assert gauge.render()[-1] == 'depth{device="cpu"} 4'
+
+    def broken():
+        raise RuntimeError("gone")
+
+    # A failing collector drops its samples rather than the scrape
+    assert Gauge("depth", "Depth", ("device",), collect=broken).render()[2:] == []
+
+
+def test_metrics_endpoint(metrics, manager, pool, images, monkeypatch):
+    monkeypatch.setattr(task_manager_module, "get_task_manager", lambda: manager)
+    monkeypatch.setattr(device_pool_module, "get_device_pool", lambda: pool)
+
+    async def run():
+        task_id = await manager.create_task("a cat", width=256, height=256, batch_size=2, use_gpu=False)
+        await wait_for_task(manager, task_id)
+        async with api_client() as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    values = samples(response.text)
+    labels = 'resolution="256",steps="9",device="cpu"'
+    assert values[f"zimage_tasks_completed_total{{{labels}}}"] == 1
+    assert values[f"zimage_task_duration_seconds_count{{{labels}}}"] == 1
+    assert values[f'zimage_task_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 1
+    assert values[f"zimage_denoise_seconds_count{{{labels}}}"] >= 1
+    assert values['zimage_images_generated_total{device="cpu"}'] == 2
+    assert values['zimage_tasks{status="completed"}'] == 1
+    assert values['zimage_queue_depth{device="cpu"}'] == 0
+    assert values['zimage_queue_depth{device="cuda:0"}'] == 0
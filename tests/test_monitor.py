@@ -0,0 +1,116 @@
+"""Tests of the background system monitor."""
+import asyncio
+import logging
+import time
+
+from backend.api import system as system_api
+from backend.models.schemas import GPUInfo
+from backend.services.gpu_telemetry import GPUProvider
+from backend.services.monitor import SystemMonitor
+from tests.support import api_client
+
+
+class FakeProvider(GPUProvider):
+    """Provider reporting whatever the test sets."""
+
+    name = "fake"
+
+    def __init__(self, gpus):
+        self.gpus = gpus
+        self.closed = False
+
+    def devices(self):
+        return [gpu.model_copy() for gpu in self.gpus]
+
+    def close(self):
+        self.closed = True
+
+
+def gpu(index: int, temperature: float = 50.0, usage: float = 10.0) -> GPUInfo:
+    return GPUInfo(
+        available=True,
+        index=index,
+        name=f"Fake GPU {index}",
+        memory_total_gb=24.0,
+        memory_used_gb=4.0,
+        usage_percent=usage,
+        temperature=temperature,
+    )
+
+
+def test_sample_reports_every_gpu():
+    monitor = SystemMonitor(interval=1, history_size=10, gpu_provider=FakeProvider([gpu(0, usage=25.0), gpu(1)]))
+    status = monitor.sample()
+
+    assert [info.index for info in status.gpus] == [0, 1]
+    assert status.gpu.index == 0
+    assert monitor.latest() is status
+    point = monitor.history()[-1]
+    assert point.gpu_percent == 25.0
+    assert point.gpu_memory_used_gb == 4.0
+    assert point.gpu_temperature == 50.0
+
+
+def test_history_is_bounded():
+    monitor = SystemMonitor(interval=1, history_size=3, gpu_provider=GPUProvider())
+    for _ in range(5):
+        monitor.sample()
+    assert len(monitor.history()) == 3
+    assert len(monitor.history(seconds=3600)) == 3
+    assert monitor.history(seconds=1e-9) == []
+
+
+def test_alerts_are_edge_triggered(caplog):
+    provider = FakeProvider([gpu(0, temperature=90.0)])
+    monitor = SystemMonitor(interval=1, history_size=10, gpu_provider=provider)
+
+    def temperature_warnings():
+        return [record for record in caplog.records if "temperature high" in record.getMessage()]
+
+    with caplog.at_level(logging.WARNING, logger="backend.services.monitor"):
+        monitor.get_gpus_info()
+        monitor.get_gpus_info()
+        assert len(temperature_warnings()) == 1
+
+        # Cooling down clears the alert, so the next crossing warns again
+        provider.gpus = [gpu(0, temperature=60.0)]
+        monitor.get_gpus_info()
+        provider.gpus = [gpu(0, temperature=85.0)]
+        monitor.get_gpus_info()
+        assert len(temperature_warnings()) == 2
+
+
+def test_sampler_thread():
+    provider = FakeProvider([gpu(0)])
+    monitor = SystemMonitor(interval=0.01, history_size=100, gpu_provider=provider)
+    monitor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(monitor.history()) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(monitor.history()) >= 3
+    finally:
+        monitor.stop()
+
+    # Stopping joins the sampler and closes the provider
+    samples = len(monitor.history())
+    time.sleep(0.05)
+    assert len(monitor.history()) == samples
+    assert provider.closed
+
+
+def test_status_endpoints(monkeypatch):
+    monitor = SystemMonitor(interval=2, history_size=10, gpu_provider=FakeProvider([gpu(0)]))
+    monkeypatch.setattr(system_api, "get_monitor", lambda: monitor)
+
+    async def run():
+        async with api_client() as client:
+            status = await client.get("/api/system/status")
+            history = await client.get("/api/system/status/history")
+            return status.json(), history.json()
+
+    status, history = asyncio.run(run())
+    # Without a background sample the status is measured on request
+    assert status["gpus"][0]["name"] == "Fake GPU 0"
+    assert history["interval_seconds"] == 2
+    assert len(history["samples"]) == 1
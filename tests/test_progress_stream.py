@@ -0,0 +1,89 @@
+"""Tests of the task progress stream."""
+import asyncio
+import json
+
+import pytest
+
+from backend.api import generate
+from backend.models.config import Config
+from backend.models.schemas import TaskResponse, TaskStatus
+from tests.support import api_client
+
+
+@pytest.fixture
+def api_manager(manager, monkeypatch):
+    """The task manager behind the generation routes."""
+    monkeypatch.setattr(generate, "get_task_manager", lambda: manager)
+    return manager
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.split("\n\n"):
+        lines = block.splitlines()
+        if lines and lines[0] == "event: progress":
+            events.append(TaskResponse(**json.loads(lines[1].removeprefix("data: "))))
+    return events
+
+
+def test_stream_until_completed(api_manager):
+    async def run():
+        async with api_client() as client:
+            response = await client.post("/api/generate", json={
+                "prompt": "a lighthouse", "width": 256, "height": 256, "num_inference_steps": 4, "use_gpu": False
+            })
+            task_id = response.json()["task_id"]
+            response = await client.get(f"/api/generate/{task_id}/events")
+            return response, task_id
+
+    response, task_id = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    assert events[0].status == TaskStatus.PENDING
+    assert events[-1].status == TaskStatus.COMPLETED
+    assert events[-1].result is not None
+    # Every denoising step is reported, and progress never goes back
+    assert {event.current_step for event in events} >= {1, 2, 3, 4}
+    progress = [event.progress for event in events]
+    assert progress == sorted(progress)
+    assert task_id not in api_manager._subscribers
+
+
+def test_stream_of_finished_task_ends_at_once(api_manager):
+    async def run():
+        task_id = await api_manager.create_task("a lighthouse", width=256, height=256, use_gpu=False)
+        while api_manager.tasks[task_id].status != TaskStatus.COMPLETED:
+            await asyncio.sleep(0.01)
+        async with api_client() as client:
+            return await client.get(f"/api/generate/{task_id}/events")
+
+    events = parse_events(asyncio.run(run()).text)
+    assert [event.status for event in events] == [TaskStatus.COMPLETED]
+
+
+def test_stream_of_unknown_task(api_manager):
+    async def run():
+        async with api_client() as client:
+            return await client.get("/api/generate/missing/events")
+
+    assert asyncio.run(run()).status_code == 404
+
+
+def test_slow_subscriber_keeps_latest_updates(api_manager, monkeypatch):
+    monkeypatch.setattr(Config, "TASK_EVENT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(api_manager, "_ensure_workers", lambda slot: None)
+
+    async def run():
+        task_id = await api_manager.create_task("a lighthouse", use_gpu=False)
+        queue = api_manager.subscribe(task_id)
+        for step in range(1, 6):
+            api_manager._apply_update(task_id, current_step=step)
+        updates = [queue.get_nowait().current_step for _ in range(queue.qsize())]
+        api_manager.unsubscribe(task_id, queue)
+        return task_id, updates
+
+    task_id, updates = asyncio.run(run())
+    assert updates == [4, 5]
+    assert task_id not in api_manager._subscribers
@@ -0,0 +1,94 @@
+"""Tests of the prompt embedding cache."""
+from backend.services.prompt_cache import PromptEmbeddingCache
+
+
+class FakeTensor:
+    """Just enough of a tensor for the cache: a size and a device."""
+
+    def __init__(self, nbytes: int, device: str = "cuda:0"):
+        self.nbytes = nbytes
+        self.device = device
+
+    def numel(self) -> int:
+        return self.nbytes // 2
+
+    def element_size(self) -> int:
+        return 2
+
+    def to(self, device: str) -> "FakeTensor":
+        return FakeTensor(self.nbytes, device)
+
+
+def test_hit_and_miss():
+    cache = PromptEmbeddingCache(device_budget_bytes=1000, cpu_budget_bytes=1000)
+    tensor = FakeTensor(100)
+    cache.put("a", tensor)
+
+    assert cache.get("a", "cuda:0") is tensor
+    assert cache.get("a", "cuda:1").device == "cuda:1"
+    assert cache.get("b", "cuda:0") is None
+
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.device_entries, stats.device_bytes) == (2, 1, 1, 100)
+    assert stats.hit_rate == 2 / 3
+
+
+def test_spill_to_cpu_and_promote():
+    cache = PromptEmbeddingCache(device_budget_bytes=250, cpu_budget_bytes=1000)
+    for key in "abc":
+        cache.put(key, FakeTensor(100))
+
+    # The least recently used entry no longer fits on the device
+    stats = cache.get_stats()
+    assert (stats.device_entries, stats.device_bytes, stats.cpu_entries, stats.cpu_bytes) == (2, 200, 1, 100)
+    assert cache._cpu_entries["a"].device == "cpu"
+
+    # A hit on a spilled entry moves it back, spilling the next oldest
+    assert cache.get("a", "cuda:0").device == "cuda:0"
+    assert list(cache._device_entries) == ["c", "a"]
+    assert list(cache._cpu_entries) == ["b"]
+    assert cache.get_stats().evictions == 0
+
+
+def test_recent_use_protects_entries():
+    cache = PromptEmbeddingCache(device_budget_bytes=200, cpu_budget_bytes=0)
+    cache.put("a", FakeTensor(100))
+    cache.put("b", FakeTensor(100))
+    cache.get("a", "cuda:0")
+    cache.put("c", FakeTensor(100))
+
+    assert list(cache._device_entries) == ["a", "c"]
+    assert cache.get_stats().evictions == 1
+
+
+def test_evict_beyond_cpu_budget():
+    cache = PromptEmbeddingCache(device_budget_bytes=100, cpu_budget_bytes=200)
+    for key in "abcde":
+        cache.put(key, FakeTensor(100))
+
+    assert list(cache._device_entries) == ["e"]
+    assert list(cache._cpu_entries) == ["c", "d"]
+    stats = cache.get_stats()
+    assert (stats.evictions, stats.cpu_bytes) == (2, 200)
+    assert cache.get("a", "cuda:0") is None
+
+
+def test_put_keeps_existing_entry():
+    cache = PromptEmbeddingCache(device_budget_bytes=1000, cpu_budget_bytes=1000)
+    first = FakeTensor(100)
+    cache.put("a", first)
+    cache.put("a", FakeTensor(100))
+
+    assert cache.get("a", "cuda:0") is first
+    assert cache.get_stats().device_bytes == 100
+
+
+def test_disabled_and_clear():
+    assert not PromptEmbeddingCache(device_budget_bytes=0, cpu_budget_bytes=0).enabled
+
+    cache = PromptEmbeddingCache(device_budget_bytes=1000, cpu_budget_bytes=1000)
+    cache.put("a", FakeTensor(100))
+    cache.get("a", "cuda:0")
+    cache.clear()
+    stats = cache.get_stats()
+    assert (stats.hits, stats.device_entries, stats.device_bytes) == (0, 0, 0)
@@ -0,0 +1,207 @@
+"""Tests of the result cache."""
+import asyncio
+import uuid
+from datetime import datetime
+
+from backend.models.schemas import ImageFormat, ImageInfo, OutputOptions, TaskStatus
+from backend.services import result_cache
+from backend.services.result_cache import ResultCache, get_result_cache, image_key, result_key
+from tests.support import wait_for_task
+
+
+def key(**overrides):
+    params = dict(
+        prompt="a cat",
+        negative_prompt=None,
+        seed=42,
+        width=1024,
+        height=1024,
+        num_inference_steps=9,
+        guidance_scale=0.0,
+        use_gpu=True,
+        output_format=ImageFormat.PNG,
+        quality=None,
+        webp_lossless=None,
+        model="synthetic",
+        precision="synthetic",
+    )
+    params.update(overrides)
+    return result_key(**params)
+
+
+def test_quality_distinguishes_lossy_formats():
+    for output_format in (ImageFormat.JPEG, ImageFormat.WEBP):
+        assert key(output_format=output_format, quality=90) == key(output_format=output_format, quality=90)
+        assert key(output_format=output_format, quality=90) != key(output_format=output_format, quality=50)
+
+
+def test_quality_ignored_for_lossless_formats():
+    assert key(quality=90) == key(quality=50)
+    assert key(output_format=ImageFormat.WEBP, webp_lossless=True, quality=90) == key(
+        output_format=ImageFormat.WEBP, webp_lossless=True, quality=50
+    )
+    assert key(output_format=ImageFormat.WEBP, webp_lossless=True) != key(
+        output_format=ImageFormat.WEBP, webp_lossless=False, quality=90
+    )
+
+
+def test_webp_lossless_ignored_for_other_formats():
+    assert key(webp_lossless=True) == key(webp_lossless=False)
+    assert key(output_format=ImageFormat.JPEG, quality=90, webp_lossless=True) == key(
+        output_format=ImageFormat.JPEG, quality=90, webp_lossless=None
+    )
+
+
+def test_negative_prompt_only_matters_with_guidance():
+    assert key(negative_prompt="blurry") == key(negative_prompt=None)
+    assert key(negative_prompt="blurry", guidance_scale=4.0) != key(negative_prompt=None, guidance_scale=4.0)
+
+
+def test_device_model_and_precision_distinguish_keys():
+    assert key(use_gpu=True) != key(use_gpu=False)
+    assert key(model="Tongyi-MAI/Z-Image-Turbo") != key(model="tiny-random")
+    assert key(precision="bfloat16") != key(precision="int8")
+
+
+def test_image_key_matches_result_key():
+    image = ImageInfo(
+        id="1",
+        filename="ab/ab.jpeg",
+        prompt="a cat",
+        width=1024,
+        height=1024,
+        num_inference_steps=9,
+        use_gpu=True,
+        seed=42,
+        guidance_scale=0.0,
+        size_bytes=1,
+        format=ImageFormat.JPEG,
+        created_at=datetime.now(),
+        quality=90,
+        webp_lossless=False,
+        model="synthetic",
+        precision="synthetic",
+    )
+    assert image_key(image) == key(output_format=ImageFormat.JPEG, quality=90)
+
+    # Records saved before the model and precision were stored are never reused
+    assert image_key(image.model_copy(update={"model": None})) is None
+    assert image_key(image.model_copy(update={"precision": None})) is None
+    assert image_key(image.model_copy(update={"seed": None})) is None
+
+
+def saved_image(seed: int, **overrides) -> ImageInfo:
+    params = dict(
+        id=str(uuid.uuid4()),
+        filename=f"{seed:02x}/{seed:064x}.png",
+        prompt="a cat",
+        width=1024,
+        height=1024,
+        num_inference_steps=9,
+        use_gpu=True,
+        seed=seed,
+        guidance_scale=0.0,
+        size_bytes=1,
+        created_at=datetime.now(),
+        model="synthetic",
+        precision="synthetic",
+    )
+    params.update(overrides)
+    return ImageInfo(**params)
+
+
+class FakeHistory:
+    def __init__(self, images, fail: bool = False):
+        self.images = images
+        self.fail = fail
+        self.reads = 0
+
+    def all_images(self):
+        self.reads += 1
+        if self.fail:
+            raise OSError("history unavailable")
+        return list(self.images)
+
+
+def test_lookup_after_load(monkeypatch):
+    image = saved_image(42)
+    monkeypatch.setattr(result_cache, "get_history_store", lambda: FakeHistory([image, saved_image(42, model=None)]))
+    cache = ResultCache(enabled=True)
+
+    asyncio.run(cache.load())
+    assert cache.lookup([key(seed=42)]) == [image]
+    assert cache.lookup([key(seed=42), key(seed=43)]) is None
+    stats = cache.get_stats()
+    assert (stats.entries, stats.hits, stats.misses) == (1, 1, 1)
+
+
+def test_failed_load_is_retried(monkeypatch):
+    history = FakeHistory([saved_image(42)], fail=True)
+    monkeypatch.setattr(result_cache, "get_history_store", lambda: history)
+    cache = ResultCache(enabled=True)
+
+    async def run():
+        await cache.load()
+        assert cache.lookup([key(seed=42)]) is None
+        history.fail = False
+        # Lookups miss until the index is built, and build it in the background
+        assert cache.lookup([key(seed=42)]) is None
+        await cache._loading
+        return cache.lookup([key(seed=42)])
+
+    assert asyncio.run(run()) is not None
+    assert history.reads == 2
+
+
+def test_images_saved_during_load_are_kept(monkeypatch):
+    old = saved_image(42)
+    monkeypatch.setattr(result_cache, "get_history_store", lambda: FakeHistory([old]))
+    cache = ResultCache(enabled=True)
+    new = saved_image(42)
+    cache.add([new])
+
+    asyncio.run(cache.load())
+    assert cache.lookup([key(seed=42)]) == [new]
+
+
+def test_discard(monkeypatch):
+    monkeypatch.setattr(result_cache, "get_history_store", lambda: FakeHistory([]))
+    cache = ResultCache(enabled=True)
+    asyncio.run(cache.load())
+    first, second = saved_image(42), saved_image(42)
+    cache.add([first, second])
+
+    # Only the indexed image of a key removes it
+    cache.discard([first])
+    assert cache.lookup([key(seed=42)]) == [second]
+    cache.discard([second])
+    assert cache.lookup([key(seed=42)]) is None
+
+
+def test_disabled_cache_never_hits(monkeypatch):
+    history = FakeHistory([saved_image(42)])
+    monkeypatch.setattr(result_cache, "get_history_store", lambda: history)
+    cache = ResultCache(enabled=False)
+    asyncio.run(cache.load())
+    cache.add([saved_image(42)])
+    assert cache.lookup([key(seed=42)]) is None
+    assert history.reads == 0
+
+
+def test_identical_seeded_requests_render_once(manager, generator):
+    async def run():
+        await get_result_cache().load()
+        params = dict(prompt="a seeded owl", seed=7, width=256, height=256, use_gpu=False)
+        concurrent = [await manager.create_task(**params) for _ in range(3)]
+        tasks = [await wait_for_task(manager, task_id) for task_id in concurrent]
+        # Once saved, the image is reused without rendering
+        tasks.append(await wait_for_task(manager, await manager.create_task(**params)))
+        different = await manager.create_task(**{**params, "output": OutputOptions(output_format=ImageFormat.JPEG)})
+        tasks.append(await wait_for_task(manager, different))
+        return tasks
+
+    tasks = asyncio.run(run())
+    assert all(task.status == TaskStatus.COMPLETED for task in tasks)
+    assert len({task.result.id for task in tasks[:4]}) == 1
+    assert tasks[4].result.id != tasks[0].result.id
+    assert generator.batches == [["a seeded owl"], ["a seeded owl"]]
@@ -0,0 +1,99 @@
+"""Tests of the history retention engine."""
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.services.retention import RetentionEngine
+from tests.support import stored_image
+
+
+def engine(max_images: int = 100, max_days: int = 30, max_bytes: int = 0) -> RetentionEngine:
+    return RetentionEngine(max_images=max_images, max_days=max_days, max_bytes=max_bytes, interval=3600, batch_size=2)
+
+
+def sweep(retention: RetentionEngine, images):
+    """Count file references as at startup, then sweep."""
+    images.open()
+    return asyncio.run(retention.sweep("manual"))
+
+
+def add_images(history, images, count: int, start: datetime = None):
+    start = start or datetime.now() - timedelta(hours=1)
+    records = [stored_image(images, idx, created_at=start + timedelta(minutes=idx)) for idx in range(count)]
+    history.add(records)
+    return records
+
+
+def test_sweep_enforces_count(history, images):
+    records = add_images(history, images, 5)
+    retention = engine(max_images=2)
+
+    report = sweep(retention, images)
+
+    assert (report.deleted_records, report.deleted_files, report.remaining_records) == (3, 3, 2)
+    assert report.reclaimed_bytes == sum(record.size_bytes for record in records[:3])
+    assert [image.id for image in history.all_images()] == [record.id for record in records[3:]]
+    assert not any(images.path(record.filename).exists() for record in records[:3])
+    assert all(images.path(record.filename).exists() for record in records[3:])
+
+    status = retention.get_status()
+    assert (status.sweeps, status.total_deleted_records, status.last_sweep.trigger) == (1, 3, "manual")
+
+
+def test_sweep_enforces_age(history, images):
+    old = add_images(history, images, 2, start=datetime.now() - timedelta(days=10))
+    recent = [stored_image(images, 100 + idx) for idx in range(2)]
+    history.add(recent)
+
+    report = sweep(engine(max_days=7), images)
+    assert report.deleted_records == 2
+    assert {image.id for image in history.all_images()} == {record.id for record in recent}
+    assert not any(images.path(record.filename).exists() for record in old)
+
+
+def test_sweep_enforces_byte_budget(history, images):
+    records = add_images(history, images, 4)
+    budget = sum(record.size_bytes for record in records[2:])
+
+    report = sweep(engine(max_bytes=budget), images)
+    assert report.deleted_records == 2
+    assert report.remaining_bytes == budget
+
+
+def test_shared_files_count_once_towards_the_budget(history, images):
+    records = add_images(history, images, 2)
+    # Two more records of identical content share the newest file
+    shared = [
+        records[1].model_copy(update={"id": f"copy-{idx}", "created_at": records[1].created_at + timedelta(minutes=idx + 1)})
+        for idx in range(2)
+    ]
+    history.add(shared)
+    assert history.total_bytes() == records[0].size_bytes + records[1].size_bytes
+
+    report = sweep(engine(max_bytes=records[0].size_bytes + records[1].size_bytes), images)
+    assert report.deleted_records == 0
+    assert history.count() == 4
+
+    # Only dropping the oldest file brings the history within a smaller budget
+    report = sweep(engine(max_bytes=records[1].size_bytes), images)
+    assert (report.deleted_records, report.deleted_files) == (1, 1)
+    assert images.path(records[1].filename).exists()
+
+
+def test_shared_file_outlives_expired_record(history, images):
+    records = add_images(history, images, 1)
+    copy = records[0].model_copy(update={"id": "copy", "created_at": datetime.now()})
+    history.add([copy])
+
+    report = sweep(engine(max_images=1), images)
+    assert (report.deleted_records, report.deleted_files, report.reclaimed_bytes) == (1, 0, 0)
+    assert images.path(copy.filename).exists()
+
+
+def test_saved_images_wake_the_job(history, images):
+    retention = engine(max_images=3)
+    sweep(retention, images)
+
+    retention.notify_saved(add_images(history, images, 3))
+    assert not retention._wake.is_set()
+    retention.notify_saved([stored_image(images, 50)])
+    assert retention._wake.is_set()
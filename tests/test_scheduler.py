@@ -0,0 +1,110 @@
+"""Tests of the micro-batching scheduler."""
+import asyncio
+import time
+
+from backend.models.config import Config
+from backend.models.schemas import TaskStatus
+from backend.services.device_pool import DeviceSlot
+from backend.services.task_manager import _PendingTask
+from tests.support import wait_for_task
+
+
+def item(task_id: str, batch_size: int = 1, width: int = 1024, steps: int = 9) -> _PendingTask:
+    return _PendingTask(
+        task_id=task_id,
+        prompt=f"prompt of {task_id}",
+        negative_prompt=None,
+        seed=None,
+        batch_size=batch_size,
+        height=1024,
+        width=width,
+        num_inference_steps=steps,
+        guidance_scale=0.0,
+    )
+
+
+def test_take_batch_coalesces_compatible_items(manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_BATCH_SIZE", 4)
+    slot = DeviceSlot("cpu")
+    slot.pending.extend([
+        item("a"),
+        item("b", width=768),
+        item("c", batch_size=2),
+        item("d", batch_size=2),
+        item("e", steps=4),
+    ])
+
+    batch = manager._take_batch(slot)
+
+    # d is compatible but does not fit in the batch anymore
+    assert [task.task_id for task in batch] == ["a", "c"]
+    assert [task.task_id for task in slot.pending] == ["b", "d", "e"]
+
+
+def test_take_batch_updates_queue_positions(manager, monkeypatch):
+    monkeypatch.setattr(manager, "_ensure_workers", lambda slot: None)
+
+    async def run():
+        task_ids = [
+            await manager.create_task(f"prompt {idx}", width=512 + 64 * idx, use_gpu=False)
+            for idx in range(3)
+        ]
+        manager._take_batch(manager._device_pool.cpu_slot)
+        return [manager.tasks[task_id].queue_position for task_id in task_ids[1:]]
+
+    # The tasks left behind moved up the queue
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_batch_window_waits_for_compatible_items(manager, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_WINDOW_MS", 50)
+    monkeypatch.setattr(Config, "MAX_BATCH_SIZE", 4)
+
+    async def run():
+        slot = DeviceSlot("cpu")
+        slot.pending.append(item("a"))
+        start = time.monotonic()
+        await manager._wait_for_batch_window(slot)
+        return time.monotonic() - start
+
+    assert 0.03 < asyncio.run(run()) < 1
+
+
+def test_batch_window_ends_when_batch_is_full(manager, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_WINDOW_MS", 10000)
+    monkeypatch.setattr(Config, "MAX_BATCH_SIZE", 4)
+
+    async def run():
+        slot = DeviceSlot("cpu")
+        slot.pending.extend([item("a"), item("b", width=768, batch_size=4)])
+
+        async def fill():
+            await asyncio.sleep(0.05)
+            slot.pending.append(item("c", batch_size=3))
+            slot.pending_event.set()
+
+        start = time.monotonic()
+        await asyncio.gather(manager._wait_for_batch_window(slot), fill())
+        return time.monotonic() - start
+
+    # Incompatible images do not count towards the batch
+    assert asyncio.run(run()) < 5
+
+
+def test_compatible_tasks_share_a_pipeline_call(manager, generator, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_WINDOW_MS", 200)
+    monkeypatch.setattr(Config, "MAX_BATCH_SIZE", 4)
+
+    async def run():
+        task_ids = [
+            await manager.create_task("a red fox", width=256, height=256, use_gpu=False),
+            await manager.create_task("a blue fox", width=256, height=256, use_gpu=False, batch_size=2),
+            await manager.create_task("a green fox", width=256, height=256, use_gpu=False, num_inference_steps=4),
+        ]
+        return [await wait_for_task(manager, task_id) for task_id in task_ids]
+
+    tasks = asyncio.run(run())
+
+    assert [task.status for task in tasks] == [TaskStatus.COMPLETED] * 3
+    assert [len(task.results) for task in tasks] == [1, 2, 1]
+    assert sorted(generator.batches) == [["a green fox"], ["a red fox", "a blue fox", "a blue fox"]]
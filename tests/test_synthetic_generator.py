@@ -0,0 +1,46 @@
+"""Tests of the synthetic generator backend."""
+import io
+
+import pytest
+
+from backend.services.synthetic_generator import SyntheticGenerator, noise_image
+
+
+def render(generator, prompts, seeds, size=256):
+    return generator.generate_batch(
+        prompts, [None] * len(prompts), seeds, height=size, width=size, num_inference_steps=2, device="cpu"
+    )
+
+
+@pytest.fixture
+def generator():
+    return SyntheticGenerator(load_ms=0, step_ms=0, jitter=0, failure_rate=0, seed=0)
+
+
+def test_images_follow_seed_and_prompt(generator):
+    cat, dog, cat_again, other_seed = render(generator, ["a cat", "a dog", "a cat", "a cat"], [7, 7, 7, 8])
+
+    assert cat.image.tobytes() == cat_again.image.tobytes()
+    assert cat.image.tobytes() != dog.image.tobytes()
+    assert cat.image.tobytes() != other_seed.image.tobytes()
+    assert (cat.image.mode, cat.image.size, cat.seed) == ("RGB", (256, 256), 7)
+
+
+def test_images_encode_to_a_realistic_size():
+    buffer = io.BytesIO()
+    noise_image(1, "a cat", 512, 768).save(buffer, format="PNG")
+    # Far from the few hundred bytes of a solid color, short of raw pixels
+    assert 512 * 768 < len(buffer.getvalue()) < 512 * 768 * 3
+
+
+def test_progress_and_failures(generator):
+    steps = []
+    generator.generate_batch(
+        ["a cat"], [None], [1], height=64, width=64, num_inference_steps=3, device="cpu",
+        progress_callback=lambda message, progress, step=None: steps.append(step)
+    )
+    assert [step for step in steps if step is not None] == [1, 2, 3]
+
+    failing = SyntheticGenerator(load_ms=0, step_ms=0, jitter=0, failure_rate=1, seed=0)
+    with pytest.raises(RuntimeError, match="synthetic failure"):
+        render(failing, ["a cat"], [1])
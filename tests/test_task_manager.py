@@ -0,0 +1,141 @@
+"""Tests of task queueing and device dispatch."""
+import asyncio
+
+import pytest
+
+from backend.models.config import Config
+from backend.models.schemas import TaskStatus
+from backend.services.task_manager import QueueFullError
+from tests.support import wait_for_task
+
+
+@pytest.fixture
+def idle_manager(manager, monkeypatch):
+    """The task manager with its workers never started, so tasks stay queued."""
+    monkeypatch.setattr(manager, "_ensure_workers", lambda slot: None)
+    return manager
+
+
+def test_queue_position(idle_manager):
+    async def run():
+        first = await idle_manager.create_task("a cat", use_gpu=False)
+        second = await idle_manager.create_task("a dog", use_gpu=False)
+        return idle_manager.tasks[first], idle_manager.tasks[second]
+
+    first, second = asyncio.run(run())
+    assert (first.status, first.queue_position, first.device) == (TaskStatus.PENDING, 1, "cpu")
+    assert (second.queue_position, second.device) == (2, "cpu")
+    assert idle_manager.pending_count() == 2
+
+
+def test_queue_full(idle_manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_QUEUE_SIZE", 2)
+
+    async def run():
+        for idx in range(2):
+            await idle_manager.create_task(f"prompt {idx}", use_gpu=False)
+        with pytest.raises(QueueFullError):
+            await idle_manager.create_task("one too many", use_gpu=False)
+
+    asyncio.run(run())
+    assert idle_manager.pending_count() == 2
+    assert len(idle_manager.tasks) == 2
+
+
+def test_queue_drains(manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_QUEUE_SIZE", 2)
+
+    async def run():
+        for wave in range(3):
+            task_ids = [
+                await manager.create_task(f"prompt {wave} {idx}", width=256, height=256, use_gpu=False)
+                for idx in range(2)
+            ]
+            for task_id in task_ids:
+                await wait_for_task(manager, task_id)
+        return manager.status_counts()
+
+    # Finished tasks free their place in the queue
+    counts = asyncio.run(run())
+    assert counts[TaskStatus.COMPLETED] == 6
+    assert manager.pending_count() == 0
+
+
+def test_tasks_dispatch_to_least_loaded_gpu(idle_manager):
+    async def run():
+        task_ids = [await idle_manager.create_task(f"prompt {idx}") for idx in range(3)]
+        task_ids.append(await idle_manager.create_task("pinned", gpu_id=1))
+        return [idle_manager.tasks[task_id].device for task_id in task_ids]
+
+    assert asyncio.run(run()) == ["cuda:0", "cuda:1", "cuda:0", "cuda:1"]
+
+
+def test_unserved_gpu(idle_manager):
+    with pytest.raises(ValueError):
+        asyncio.run(idle_manager.create_task("a cat", gpu_id=7))
+    assert not idle_manager.tasks
+
+
+def test_queue_is_bounded_in_images(idle_manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_QUEUE_SIZE", 4)
+
+    async def run():
+        await idle_manager.create_batch_task(["a", "b", "c"], use_gpu=False)
+        assert idle_manager.queued_images() == 3
+        # A task fits only with all its images
+        with pytest.raises(QueueFullError):
+            await idle_manager.create_task("two images", batch_size=2, use_gpu=False)
+        await idle_manager.create_task("one image", use_gpu=False)
+        with pytest.raises(QueueFullError):
+            await idle_manager.create_task("one too many", use_gpu=False)
+
+    asyncio.run(run())
+    assert idle_manager.queued_images() == 4
+    assert len(idle_manager.tasks) == 2
+
+
+def test_task_larger_than_the_queue(idle_manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_QUEUE_SIZE", 4)
+    # Retrying would not help, so this is not a QueueFullError
+    with pytest.raises(ValueError):
+        asyncio.run(idle_manager.create_batch_task(["a", "b", "c"], seeds=[1, 2]))
+    assert idle_manager.queued_images() == 0
+
+
+def test_batch_job_spreads_over_gpus(idle_manager, pool):
+    asyncio.run(idle_manager.create_batch_task(["a", "b", "c", "d"], images_per_prompt=2))
+    assert [sum(item.batch_size for item in slot.pending) for slot in pool.gpu_slots] == [4, 4]
+    assert not pool.cpu_slot.pending
+
+
+def test_batch_job_pinned_gpu(idle_manager, pool):
+    asyncio.run(idle_manager.create_batch_task(["a", "b", "c"], gpu_id=1))
+    assert [len(slot.pending) for slot in pool.gpu_slots] == [0, 3]
+
+
+def test_batch_job_unserved_gpu_queues_nothing(idle_manager, pool):
+    with pytest.raises(ValueError):
+        asyncio.run(idle_manager.create_batch_task(["a", "b"], gpu_id=7))
+    assert not idle_manager.tasks
+    assert not any(slot.pending for slot in pool.slots)
+
+
+def test_batch_job_size_limit(idle_manager, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_BATCH_JOB_IMAGES", 4)
+    with pytest.raises(ValueError):
+        asyncio.run(idle_manager.create_batch_task(["a", "b", "c"], seeds=[1, 2]))
+
+
+def test_batch_job_returns_every_image(manager):
+    async def run():
+        task_id = await manager.create_batch_task(
+            ["a fox", "a hen"], seeds=[1, 2, 3], width=256, height=256, use_gpu=False
+        )
+        return await wait_for_task(manager, task_id)
+
+    task = asyncio.run(run())
+    assert task.status == TaskStatus.COMPLETED
+    assert task.total_images == 6
+    assert sorted((image.prompt, image.seed) for image in task.results) == [
+        (prompt, seed) for prompt in ("a fox", "a hen") for seed in (1, 2, 3)
+    ]
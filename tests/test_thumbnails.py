@@ -0,0 +1,99 @@
+"""Tests of the thumbnail cache."""
+import asyncio
+
+from PIL import Image
+
+from backend.services import thumbnails as thumbnails_module
+from backend.services.encoder import get_encoder
+from backend.services.thumbnails import render_thumbnails
+from tests.support import api_client, stored_image
+
+
+class CountingEncoder:
+    """The encoder, counting the jobs it runs."""
+
+    def __init__(self):
+        self.runs = 0
+
+    async def run(self, func, *args):
+        self.runs += 1
+        return await get_encoder().run(func, *args)
+
+
+def test_render_thumbnails(tmp_path):
+    source = Image.new("RGB", (400, 200), (10, 20, 30))
+    targets = [(64, str(tmp_path / "64.webp")), (128, str(tmp_path / "128.webp"))]
+
+    written = render_thumbnails(source, targets, quality=80)
+
+    assert written == sum((tmp_path / name).stat().st_size for name in ("64.webp", "128.webp"))
+    for size, path in targets:
+        with Image.open(path) as thumbnail:
+            assert thumbnail.format == "WEBP"
+            # Fit in the square, keeping the aspect ratio
+            assert thumbnail.size == (size, size // 2)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_first_request_renders_every_size_once(images, thumbnails, monkeypatch):
+    encoder = CountingEncoder()
+    monkeypatch.setattr(thumbnails_module, "get_encoder", lambda: encoder)
+    image = stored_image(images, 1, size=256)
+
+    async def run():
+        return await asyncio.gather(*(thumbnails.get(image, size) for size in (32, 64, 32)))
+
+    paths = asyncio.run(run())
+    assert encoder.runs == 1
+    for path, size in zip(paths, (32, 64, 32)):
+        with Image.open(path) as thumbnail:
+            assert thumbnail.size == (size, size)
+
+    # Cached thumbnails are not rendered again
+    asyncio.run(thumbnails.get(image, 64))
+    assert encoder.runs == 1
+
+
+def test_schedule_uses_rendered_image(images, thumbnails):
+    image = stored_image(images, 2, size=128)
+    images.path(image.filename).unlink()
+
+    async def run():
+        thumbnails.schedule([(image, Image.new("RGB", (128, 128)))])
+        await asyncio.gather(*thumbnails._jobs)
+
+    asyncio.run(run())
+    assert thumbnails.path(image.id, 64).exists() and thumbnails.path(image.id, 32).exists()
+
+
+def test_remove(images, thumbnails):
+    image = stored_image(images, 3, size=128)
+    asyncio.run(thumbnails.get(image, 32))
+
+    thumbnails.remove([image.id, "missing"])
+    assert not thumbnails.path(image.id, 32).exists()
+    assert not thumbnails.path(image.id, 64).exists()
+
+
+def test_thumbnail_endpoint(history, images, thumbnails):
+    image = stored_image(images, 4, size=256)
+    history.add([image])
+
+    async def run():
+        async with api_client() as client:
+            return (
+                await client.get(f"/api/thumbnails/{image.id}", params={"size": 64}),
+                await client.get(f"/api/thumbnails/{image.id}", params={"size": 100}),
+                await client.get("/api/thumbnails/missing", params={"size": 64}),
+            )
+
+    thumbnail, bad_size, missing = asyncio.run(run())
+    assert thumbnail.status_code == 200
+    assert thumbnail.headers["content-type"] == "image/webp"
+    assert thumbnail.headers["etag"]
+    assert bad_size.status_code == 400
+    assert missing.status_code == 404
+    assert thumbnails.urls(image.id) == {
+        32: f"/api/thumbnails/{image.id}?size=32",
+        64: f"/api/thumbnails/{image.id}?size=64",
+    }
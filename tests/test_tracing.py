@@ -0,0 +1,128 @@
+"""Tests of generation tracing."""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from backend.models.config import Config
+from backend.services import tracing
+from backend.services.tracing import Trace, prune_traces
+from tests.support import wait_for_task
+
+
+def test_stages():
+    trace = Trace("cpu", sampled=True)
+    trace.add("text_encode", 0.0, 0.010)
+    trace.add("step", 0.010, 0.030, step=1)
+    trace.add("step", 0.030, 0.040, step=2)
+    trace.add("denoise", 0.010, 0.040)
+
+    stages = trace.stages()
+    assert stages.text_encode_ms == pytest.approx(10)
+    assert stages.step_ms == pytest.approx([20, 10])
+    assert stages.denoise_ms == pytest.approx(30)
+    assert stages.vae_decode_ms is None
+    assert stages.trace_id == trace.trace_id
+    # Traces that are not dumped have no file to point to
+    assert Trace("cpu").stages().trace_id is None
+
+
+def test_span_records_only_on_active_trace():
+    with tracing.span("ignored"):
+        pass
+
+    trace = Trace("cpu")
+    with tracing.activate(trace):
+        assert tracing.current_trace() is trace
+        with tracing.span("text_encode", tokens=3):
+            pass
+    assert tracing.current_trace() is None
+
+    assert [span.name for span in trace.spans] == ["text_encode"]
+    assert trace.spans[0].args == {"tokens": 3}
+    assert trace.spans[0].end >= trace.spans[0].start
+
+
+def test_instrument():
+    class Decoder:
+        def decode(self, value):
+            return value * 2
+
+    decoder = Decoder()
+    tracing.instrument(decoder, "decode", "vae_decode")
+    # Instrumenting twice does not nest spans
+    tracing.instrument(decoder, "decode", "vae_decode")
+
+    assert decoder.decode(2) == 4
+    trace = Trace("cpu")
+    with tracing.activate(trace):
+        assert decoder.decode(3) == 6
+    assert [span.name for span in trace.spans] == ["vae_decode"]
+
+
+def test_to_chrome_trace():
+    trace = Trace("cuda:1")
+    trace.add("denoise", 10.0, 10.5, steps=9)
+    trace.add("save", 10.5, 10.6)
+
+    chrome = trace.to_chrome_trace()
+    assert chrome["otherData"] == {"trace_id": trace.trace_id, "device": "cuda:1"}
+    metadata = [event for event in chrome["traceEvents"] if event["ph"] == "M"]
+    assert metadata[0]["tid"] == threading.get_ident()
+    denoise, save = [event for event in chrome["traceEvents"] if event["ph"] == "X"]
+    # Timestamps are microseconds from the first span
+    assert (denoise["name"], denoise["ts"], denoise["dur"]) == ("denoise", 0, pytest.approx(5e5))
+    assert denoise["args"] == {"steps": 9}
+    assert save["ts"] == pytest.approx(5e5)
+
+
+def test_dump_and_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TRACE_MAX_FILES", 2)
+    paths = []
+    for idx in range(3):
+        trace = Trace("cpu", sampled=True)
+        trace.add("step", 0.0, 0.1)
+        paths.append(trace.dump(tmp_path))
+        os.utime(paths[-1], (idx, idx))
+    prune_traces(tmp_path, 2)
+
+    assert sorted(tmp_path.iterdir()) == sorted(paths[1:])
+    with open(paths[-1], encoding="utf-8") as f:
+        assert json.load(f)["traceEvents"][-1]["name"] == "step"
+
+
+def test_sampling(monkeypatch):
+    monkeypatch.setattr(Config, "TRACE_SAMPLE_RATE", 0)
+    assert not tracing.new_trace("cpu").sampled
+    monkeypatch.setattr(Config, "TRACE_SAMPLE_RATE", 1)
+    trace = tracing.new_trace("cpu")
+    assert trace.sampled
+    # Only CUDA devices have a queue to synchronize with
+    assert not trace.synchronize
+
+
+def test_sampled_render_is_dumped(manager, images, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "TRACE_SAMPLE_RATE", 1)
+    monkeypatch.setattr(Config, "TRACES_DIR", tmp_path / "traces")
+
+    async def run():
+        task_id = await manager.create_task("a cat", width=256, height=256, num_inference_steps=3, use_gpu=False)
+        task = await wait_for_task(manager, task_id)
+        # The trace is written after the images are saved
+        path = tmp_path / "traces" / f"{task.stages.trace_id}.json"
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return task, path
+
+    task, path = asyncio.run(run())
+
+    stages = task.stages
+    assert len(stages.step_ms) == 3
+    assert stages.queue_wait_ms is not None and stages.save_ms is not None
+    with open(path, encoding="utf-8") as f:
+        names = {event["name"] for event in json.load(f)["traceEvents"]}
+    assert {"queue_wait", "step", "denoise", "save"} <= names